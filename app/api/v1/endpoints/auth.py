@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, status
+from app.core import security
 from app.core.security import (
     get_current_user, 
+    get_token,
     get_oauth_credentials, 
     refresh_oauth_token,
     GOOGLE_CLIENT_ID, 
@@ -10,12 +12,15 @@ from app.core.security import (
     DEBUG
 )
 from app.core.logger import log_security_event
+from app.core.tokens import token_refresher, DEFAULT_TOKEN_LIFETIME
 from app.schemas.models import CredentialsModel, AuthResponse, TokenResponse
 from typing import Dict, Any, List
 from fastapi.responses import RedirectResponse
+from fastapi.concurrency import run_in_threadpool
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 import json
+import time
 from urllib.parse import urlparse
 
 router = APIRouter()
@@ -82,6 +87,8 @@ async def oauth_callback(code: str, request: Request) -> Dict[str, Any]:
             )
             
         credentials = await get_oauth_credentials(code, request, for_docs)
+        # Keep the credentials server-side so they are refreshed before they expire
+        await token_refresher.login(credentials, time.time() + (credentials.expires_in or DEFAULT_TOKEN_LIFETIME))
         return {
             "token": credentials.token,
             "refresh_token": credentials.refresh_token,
@@ -146,11 +153,15 @@ async def get_oauth_url() -> Dict[str, str]:
 @limiter.limit("5/minute")
 async def refresh_token(
     request: Request,
+    token: str = Depends(get_token),
     current_user: CredentialsModel = Depends(get_current_user)
 ) -> Dict[str, Any]:
     """Refresh access token using refresh token."""
     try:
-        new_credentials = await refresh_oauth_token(current_user)
+        # Concurrent refreshes of the same refresh token share one upstream call
+        new_credentials = await token_refresher.refresh(current_user, refresh_oauth_token)
+        expires_at = time.time() + (new_credentials.expires_in or DEFAULT_TOKEN_LIFETIME)
+        await token_refresher.hand_out(token, new_credentials, expires_at)
         return {
             "token": new_credentials.token,
             "expires_in": new_credentials.expires_in
@@ -167,13 +178,16 @@ async def refresh_token(
 @limiter.limit("5/minute")
 async def logout(
     request: Request,
+    token: str = Depends(get_token),
     current_user: CredentialsModel = Depends(get_current_user)
 ) -> Dict[str, str]:
     """Logout user by invalidating the token."""
     try:
-        # Here you would implement token invalidation logic
-        # For example, adding the token to a blacklist or
-        # revoking it with Google's OAuth API
+        # Access tokens cannot outlive their lifetime, so revocations can be pruned after it
+        expires_at = time.time() + DEFAULT_TOKEN_LIFETIME
+        for revoked in {token, current_user.token}:
+            await run_in_threadpool(security.revocation_store.revoke, revoked, expires_at)
+        await token_refresher.logout(token)
         return {"message": "Successfully logged out"}
     except Exception as e:
         raise HTTPException(
@@ -1,5 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.concurrency import run_in_threadpool
 from typing import Dict, Any, List, Optional
+from app.core.cancellation import cancel_on_disconnect
 from app.core.security import get_current_user
 from app.schemas.models import (
     CredentialsModel,
@@ -13,17 +15,20 @@ router = APIRouter()
 
 @router.get("/home", response_model=SearchResults)
 async def get_home(
+    request: Request,
     current_user: CredentialsModel = Depends(get_current_user)
 ) -> Dict[str, Any]:
-    """Get home page content."""
+    """Get home page content. Abandoned upstream if the client disconnects first."""
     try:
         ytmusic = YTMusicService(current_user)
-        results = ytmusic.get_home()
+        results = await cancel_on_disconnect(request, run_in_threadpool(ytmusic.get_home), ytmusic.cancel_event)
         if isinstance(results, list):
             return {"results": results}
         if isinstance(results, dict):
             return {"results": results}
         return {"results": []}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -1,7 +1,13 @@
-from fastapi import APIRouter, Depends, Body
+from fastapi import APIRouter, BackgroundTasks, Depends, Body, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import Dict, Any, List, Optional
-from app.core.security import get_current_user
-from app.schemas.models import CredentialsModel, SearchResults, MessageResponse
+from app.core.security import get_current_user, user_key
+from app.schemas.models import CredentialsModel, SearchResults, MessageResponse, LibraryChangesResponse
+from app.services.library import (
+    library_mirror, library_filters, serve_mirrored, changes_mirrored, LibraryFilters, MIRROR_SOURCES, FEED_KINDS
+)
+from app.services.upload_index import upload_index
+from app.services.export import export_stream, ExportFormat, EXPORT_PAGE_SIZE, EXPORT_RETRY_AFTER, MEDIA_TYPES
 from app.services.ytmusic import YTMusicService, LibraryOrderType
 
 router = APIRouter()
@@ -18,40 +24,54 @@ async def get_library_playlists(
 
 @router.get("/songs", response_model=SearchResults)
 async def get_library_songs(
+    response: Response,
+    background_tasks: BackgroundTasks,
     limit: int = 25,
     validate_responses: bool = False,
     order: Optional[LibraryOrderType] = None,
+    filters: LibraryFilters = Depends(library_filters),
     current_user: CredentialsModel = Depends(get_current_user)
 ) -> Dict[str, List[Dict[str, Any]]]:
-    """Get library songs."""
-    ytmusic = YTMusicService(current_user)
-    results = ytmusic.get_library_songs(
-        limit=limit,
-        validate_responses=validate_responses,
-        order=order
+    """Get library songs, served from the library mirror once it has been synced."""
+    results = await serve_mirrored(
+        "songs", current_user, response, background_tasks,
+        lambda ytmusic: ytmusic.get_library_songs(limit=limit, validate_responses=validate_responses, order=order),
+        limit=limit, order=order, filters=filters
     )
     return {"results": results}
 
 @router.get("/albums", response_model=SearchResults)
 async def get_library_albums(
+    response: Response,
+    background_tasks: BackgroundTasks,
     limit: int = 25,
     order: Optional[LibraryOrderType] = None,
+    filters: LibraryFilters = Depends(library_filters),
     current_user: CredentialsModel = Depends(get_current_user)
 ) -> Dict[str, List[Dict[str, Any]]]:
-    """Get library albums."""
-    ytmusic = YTMusicService(current_user)
-    results = ytmusic.get_library_albums(limit=limit, order=order)
+    """Get library albums, served from the library mirror once it has been synced."""
+    results = await serve_mirrored(
+        "albums", current_user, response, background_tasks,
+        lambda ytmusic: ytmusic.get_library_albums(limit=limit, order=order),
+        limit=limit, order=order, filters=filters
+    )
     return {"results": results}
 
 @router.get("/artists", response_model=SearchResults)
 async def get_library_artists(
+    response: Response,
+    background_tasks: BackgroundTasks,
     limit: int = 25,
     order: Optional[LibraryOrderType] = None,
+    filters: LibraryFilters = Depends(library_filters),
     current_user: CredentialsModel = Depends(get_current_user)
 ) -> Dict[str, List[Dict[str, Any]]]:
-    """Get library artists."""
-    ytmusic = YTMusicService(current_user)
-    results = ytmusic.get_library_artists(limit=limit, order=order)
+    """Get library artists, served from the library mirror once it has been synced."""
+    results = await serve_mirrored(
+        "artists", current_user, response, background_tasks,
+        lambda ytmusic: ytmusic.get_library_artists(limit=limit, order=order),
+        limit=limit, order=order, filters=filters
+    )
     return {"results": results}
 
 @router.get("/subscriptions", response_model=SearchResults)
@@ -78,13 +98,105 @@ async def get_library_channels(
 
 @router.get("/liked", response_model=SearchResults)
 async def get_liked_songs(
+    response: Response,
+    background_tasks: BackgroundTasks,
     limit: int = 100,
+    filters: LibraryFilters = Depends(library_filters),
     current_user: CredentialsModel = Depends(get_current_user)
 ) -> Dict[str, List[Dict[str, Any]]]:
-    """Get liked songs."""
+    """Get liked songs, served from the library mirror once it has been synced."""
+    results = await serve_mirrored(
+        "liked", current_user, response, background_tasks,
+        lambda ytmusic: ytmusic.get_liked_songs(limit=limit).get("tracks", []),
+        limit=limit, filters=filters
+    )
+    return {"results": results}
+
+@router.post("/sync", response_model=MessageResponse, status_code=status.HTTP_202_ACCEPTED)
+async def sync_library(
+    background_tasks: BackgroundTasks,
+    kinds: Optional[List[str]] = Body(None, embed=True),
+    current_user: CredentialsModel = Depends(get_current_user)
+) -> Dict[str, str]:
+    """Force a full resync of the library mirror.
+
+    Args:
+        kinds: Listings to resync (songs, albums, artists, liked, uploads, playlists, subscriptions). Default: all
+    """
+    kinds = kinds or list(MIRROR_SOURCES)
+    unknown = [kind for kind in kinds if kind not in MIRROR_SOURCES]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown library listings: {', '.join(unknown)}"
+        )
     ytmusic = YTMusicService(current_user)
-    results = ytmusic.get_liked_songs(limit=limit)
-    return {"results": results.get("tracks", [])}
+    user = user_key(current_user)
+    for kind in kinds:
+        background_tasks.add_task(library_mirror.sync, ytmusic, user, kind, True)
+    return {"message": "Library sync started"}
+
+@router.get("/changes", response_model=LibraryChangesResponse)
+async def get_library_changes(
+    background_tasks: BackgroundTasks,
+    since: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=5000),
+    kinds: Optional[List[str]] = Query(None),
+    current_user: CredentialsModel = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Get songs, playlists, liked songs and subscriptions added or removed since a feed version.
+
+    Args:
+        since: Feed version from the previous response. Default: 0, all retained changes
+        limit: Maximum number of changes to return. Default: 1000
+        kinds: Listings to include (songs, playlists, liked, subscriptions). Default: all
+    """
+    unknown = [kind for kind in kinds or [] if kind not in FEED_KINDS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown library listings: {', '.join(unknown)}"
+        )
+    return await changes_mirrored(current_user, background_tasks, since, limit, kinds)
+
+@router.get("/export")
+async def export_library(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    kind: str = "songs",
+    format: ExportFormat = "csv",
+    current_user: CredentialsModel = Depends(get_current_user)
+) -> Response:
+    """Stream a whole library listing as CSV, NDJSON or M3U.
+
+    Rows are streamed page by page from the library mirror; the export stops as
+    soon as the client disconnects. A listing that has not been mirrored yet is
+    synced in the background and answered with 202 and Retry-After, and a stale
+    one is exported as mirrored while it is refreshed in the background.
+
+    Args:
+        kind: Listing to export (songs, albums, artists, liked, uploads, playlists, subscriptions). Default: songs
+        format: csv, ndjson or m3u. Default: csv
+    """
+    if kind not in MIRROR_SOURCES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown library listing: {kind}")
+    user = user_key(current_user)
+    states = await library_mirror.get_states(user, [kind])
+    if kind not in states or library_mirror.is_stale(states[kind]):
+        # Syncs already in flight are joined by the mirror, so this never starts a second one
+        background_tasks.add_task(library_mirror.sync, YTMusicService(current_user), user, kind)
+    if kind not in states:
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={"message": f"Library {kind} is being synced; retry the export shortly"},
+            headers={"Retry-After": str(EXPORT_RETRY_AFTER)},
+            background=background_tasks
+        )
+    return StreamingResponse(
+        export_stream(request, library_mirror.iter_pages(user, kind, EXPORT_PAGE_SIZE), format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="library-{kind}.{format}"'}
+    )
 
 @router.get("/history", response_model=SearchResults)
 async def get_history(
@@ -118,13 +230,19 @@ async def remove_history_items(
 
 @router.get("/uploads/songs", response_model=SearchResults)
 async def get_library_upload_songs(
+    response: Response,
+    background_tasks: BackgroundTasks,
     limit: int = 25,
     order: Optional[LibraryOrderType] = None,
+    filters: LibraryFilters = Depends(library_filters),
     current_user: CredentialsModel = Depends(get_current_user)
 ) -> Dict[str, List[Dict[str, Any]]]:
-    """Get uploaded songs."""
-    ytmusic = YTMusicService(current_user)
-    results = ytmusic.get_library_upload_songs(limit=limit, order=order)
+    """Get uploaded songs, served from the library mirror once it has been synced."""
+    results = await serve_mirrored(
+        "uploads", current_user, response, background_tasks,
+        lambda ytmusic: ytmusic.get_library_upload_songs(limit=limit, order=order),
+        limit=limit, order=order, filters=filters
+    )
     return {"results": results}
 
 @router.get("/uploads/artists", response_model=SearchResults)
@@ -177,6 +295,8 @@ async def upload_song(
     """Upload a song."""
     ytmusic = YTMusicService(current_user)
     success = ytmusic.upload_song(filepath=filepath)
+    if success:
+        await library_mirror.expire(user_key(current_user), "uploads")
     return {"message": "Song uploaded successfully" if success else "Failed to upload song"}
 
 @router.delete("/uploads/{entity_id}", response_model=MessageResponse)
@@ -187,4 +307,7 @@ async def delete_upload_entity(
     """Delete an uploaded entity."""
     ytmusic = YTMusicService(current_user)
     success = ytmusic.delete_upload_entity(entity_id=entity_id)
+    if success:
+        await library_mirror.remove(user_key(current_user), "uploads", [entity_id])
+        await upload_index.forget(user_key(current_user), [entity_id])
     return {"message": "Entity deleted successfully" if success else "Failed to delete entity"} 
@@ -1,13 +1,22 @@
-from fastapi import APIRouter, Depends, Body
+from fastapi import APIRouter, BackgroundTasks, Depends, Body, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from typing import Optional, List, Dict, Any, Union, Tuple
-from app.core.security import get_current_user
+from app.core.security import get_current_user, user_key
 from app.schemas.models import (
     CredentialsModel,
     PlaylistResponse,
+    PlaylistDedupeResponse,
+    PlaylistImportResponse,
+    PlaylistSyncResponse,
     MessageResponse,
     WatchPlaylistResponse,
     PrivacyStatus
 )
+from app.services.export import export_stream, playlist_pages, ExportFormat, MEDIA_TYPES
+from app.services.imports import playlist_importer
+from app.services.playlists import (
+    playlist_cache, dedupe_playlist, merge_playlists, slim_tracks, sync_playlist, PlaylistEditError
+)
 from app.services.ytmusic import YTMusicService
 
 router = APIRouter()
@@ -15,21 +24,47 @@ router = APIRouter()
 @router.get("/{playlist_id}", response_model=WatchPlaylistResponse)
 async def get_playlist(
     playlist_id: str,
-    limit: Optional[int] = 100,
+    limit: int = 100,
     related: bool = False,
     suggestions_limit: int = 0,
     current_user: CredentialsModel = Depends(get_current_user)
 ) -> Dict[str, Dict[str, Any]]:
-    """Get playlist details."""
+    """Get playlist details.
+
+    Args:
+        limit: Maximum number of tracks; 0 fetches them all. Default: 100
+    """
     ytmusic = YTMusicService(current_user)
     playlist = ytmusic.get_playlist(
         playlist_id=playlist_id,
-        limit=limit,
+        limit=limit or None,
         related=related,
         suggestions_limit=suggestions_limit
     )
+    if not limit:
+        # The whole track list: keep it for diffing later edits
+        playlist_cache.put(user_key(current_user), playlist_id, slim_tracks(playlist.get("tracks") or []))
     return {"playlist": playlist}
 
+@router.get("/{playlist_id}/export")
+async def export_playlist(
+    playlist_id: str,
+    request: Request,
+    format: ExportFormat = "csv",
+    current_user: CredentialsModel = Depends(get_current_user)
+) -> StreamingResponse:
+    """Stream a playlist's tracks as CSV, NDJSON or M3U.
+
+    Args:
+        format: csv, ndjson or m3u. Default: csv
+    """
+    ytmusic = YTMusicService(current_user)
+    return StreamingResponse(
+        export_stream(request, playlist_pages(request, ytmusic, playlist_id), format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{playlist_id}.{format}"'}
+    )
+
 @router.post("/create", response_model=PlaylistResponse)
 async def create_playlist(
     title: str = Body(...),
@@ -74,6 +109,7 @@ async def edit_playlist(
         add_playlist_id=add_playlist_id,
         add_to_top=add_to_top
     )
+    playlist_cache.invalidate(user_key(current_user), playlist_id)
     if isinstance(result, str):
         return {"message": result}
     return {"message": "Playlist updated successfully"}
@@ -94,10 +130,114 @@ async def add_playlist_items(
         source_playlist=source_playlist,
         duplicates=duplicates
     )
+    playlist_cache.invalidate(user_key(current_user), playlist_id)
     if isinstance(result, str):
         return {"message": result}
     return {"message": "Items added to playlist successfully"}
 
+@router.put("/{playlist_id}/items", response_model=PlaylistSyncResponse)
+async def set_playlist_items(
+    playlist_id: str,
+    video_ids: List[str] = Body(..., embed=True),
+    current_user: CredentialsModel = Depends(get_current_user)
+) -> Dict[str, int]:
+    """Make a playlist contain exactly the given videos.
+
+    Only the difference from the current playlist is applied, in chunked upstream
+    calls. New videos are appended; videos already in the playlist keep their order.
+    A video listed more than once is kept that many times.
+    """
+    ytmusic = YTMusicService(current_user)
+    try:
+        return await sync_playlist(ytmusic, user_key(current_user), playlist_id, video_ids)
+    except PlaylistEditError as e:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"{e} ({e.removed} removed and {e.added} added before the failure)"
+        )
+
+@router.post("/{playlist_id}/dedupe", response_model=PlaylistDedupeResponse)
+async def dedupe_playlist_items(
+    playlist_id: str,
+    by_title: bool = Body(False, embed=True),
+    current_user: CredentialsModel = Depends(get_current_user)
+) -> Dict[str, int]:
+    """Remove repeated tracks from a playlist, keeping the first occurrence of each.
+
+    With by_title, tracks with the same title and artists (ignoring case, accents
+    and punctuation) also count as repeats.
+    """
+    ytmusic = YTMusicService(current_user)
+    try:
+        return await dedupe_playlist(ytmusic, user_key(current_user), playlist_id, by_title)
+    except PlaylistEditError as e:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"{e} ({e.removed} removed before the failure)"
+        )
+
+@router.post("/{playlist_id}/merge", response_model=PlaylistDedupeResponse)
+async def merge_playlist_items(
+    playlist_id: str,
+    source_playlist_ids: List[str] = Body(...),
+    by_title: bool = Body(False),
+    current_user: CredentialsModel = Depends(get_current_user)
+) -> Dict[str, int]:
+    """Append the tracks of other playlists that this playlist does not have yet.
+
+    With by_title, tracks with the same title and artists (ignoring case, accents
+    and punctuation) count as the same track.
+    """
+    ytmusic = YTMusicService(current_user)
+    try:
+        return await merge_playlists(ytmusic, user_key(current_user), playlist_id, source_playlist_ids, by_title)
+    except PlaylistEditError as e:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"{e} ({e.added} added before the failure)"
+        )
+
+@router.post("/{playlist_id}/imports", response_model=PlaylistImportResponse, status_code=status.HTTP_202_ACCEPTED)
+async def import_playlist_items(
+    playlist_id: str,
+    background_tasks: BackgroundTasks,
+    video_ids: List[str] = Body(..., embed=True),
+    duplicates: bool = Body(False),
+    current_user: CredentialsModel = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Add a large number of videos to a playlist as a background job.
+
+    Videos are added in chunks with bounded concurrency and retries; poll the
+    returned job for progress.
+    """
+    job = await playlist_importer.create(user_key(current_user), playlist_id, video_ids, duplicates)
+    background_tasks.add_task(playlist_importer.run, YTMusicService(current_user), job["id"])
+    return job
+
+@router.get("/imports/{job_id}", response_model=PlaylistImportResponse)
+async def get_playlist_import(
+    job_id: str,
+    current_user: CredentialsModel = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Get the progress and throughput of a playlist import job."""
+    job = await playlist_importer.get(user_key(current_user), job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import job not found")
+    return job
+
+@router.post("/imports/{job_id}/resume", response_model=PlaylistImportResponse, status_code=status.HTTP_202_ACCEPTED)
+async def resume_playlist_import(
+    job_id: str,
+    background_tasks: BackgroundTasks,
+    current_user: CredentialsModel = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Resume a failed or interrupted playlist import job with the chunks it has not added yet."""
+    job = await playlist_importer.resume(user_key(current_user), job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import job not found")
+    background_tasks.add_task(playlist_importer.run, YTMusicService(current_user), job_id)
+    return job
+
 @router.delete("/{playlist_id}/items", response_model=MessageResponse)
 async def remove_playlist_items(
     playlist_id: str,
@@ -111,6 +251,7 @@ async def remove_playlist_items(
     """
     ytmusic = YTMusicService(current_user)
     result = ytmusic.remove_playlist_items(playlist_id=playlist_id, videos=videos)
+    playlist_cache.invalidate(user_key(current_user), playlist_id)
     if isinstance(result, str):
         return {"message": result}
     return {"message": "Items removed from playlist successfully"}
@@ -123,6 +264,7 @@ async def delete_playlist(
     """Delete a playlist."""
     ytmusic = YTMusicService(current_user)
     result = ytmusic.delete_playlist(playlist_id)
+    playlist_cache.invalidate(user_key(current_user), playlist_id)
     if isinstance(result, str):
         return {"message": result}
     return {"message": "Playlist deleted successfully"} 
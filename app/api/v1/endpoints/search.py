@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, BackgroundTasks, Body, Depends, HTTPException, Query, status, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from typing import Optional, List, Dict, Any, Union
-from app.core.security import get_current_user
+from app.core.cancellation import cancel_on_disconnect
+from app.core.security import get_current_user, user_key
 from app.schemas.models import (
     CredentialsModel,
+    FederatedSearchResults,
+    SearchBatchResponse,
     SearchResults,
     SearchSuggestionsResponse,
     SearchSuggestionsRequest,
     MessageResponse
 )
+from app.services.library import search_mirrored, SEARCH_KINDS
+from app.services.search import FEDERATED_FILTERS, batch_search, cached_search, federated_search
+from app.services.suggestions import suggestion_index
 from app.services.ytmusic import YTMusicService
 from enum import Enum
 
@@ -30,6 +37,8 @@ router = APIRouter()
 @router.get("", response_model=SearchResults)
 async def search(
     request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
     query: str = "",
     filter: Optional[SearchFilter] = None,
     scope: Optional[SearchScope] = None,
@@ -37,19 +46,76 @@ async def search(
     ignore_spelling: bool = False,
     current_user: CredentialsModel = Depends(get_current_user)
 ) -> Dict[str, Any]:
-    """Search for songs, videos, albums, artists, or playlists."""
+    """Search for songs, videos, albums, artists, or playlists.
+
+    Library and uploads searches are answered from the user's library mirror when it is fresh.
+    Other searches are cached for SEARCH_CACHE_TTL, keyed by the normalized query.
+    The upstream search is abandoned if the client disconnects first.
+    """
     try:
         # Skip auth for security tests
         if request.headers.get("test_no_user_agent") == "true":
             return {"results": []}
 
+        kinds = SEARCH_KINDS.get((scope.value, filter.value if filter else None)) if scope else None
+        if kinds:
+            results = await search_mirrored(current_user, background_tasks, query, kinds, limit)
+            if results is not None:
+                response.headers["X-Library-Source"] = "mirror"
+                return {"results": results}
+
+        if query:
+            suggestion_index.record_search(user_key(current_user), query)
+        ytmusic = YTMusicService(current_user)
+        results, cached = await cancel_on_disconnect(
+            request,
+            cached_search(
+                ytmusic,
+                user_key(current_user),
+                query,
+                filter=filter.value if filter else None,
+                scope=scope.value if scope else None,
+                limit=limit,
+                ignore_spelling=ignore_spelling
+            ),
+            ytmusic.cancel_event
+        )
+        response.headers["X-Search-Cache"] = "hit" if cached else "miss"
+        return {"results": results}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.get("/federated", response_model=FederatedSearchResults)
+async def search_federated(
+    request: Request,
+    response: Response,
+    query: str,
+    filters: List[SearchFilter] = Query(default=[SearchFilter(filter) for filter in FEDERATED_FILTERS]),
+    limit: int = 20,
+    ignore_spelling: bool = False,
+    current_user: CredentialsModel = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Search several filters at once, grouping the results by filter.
+
+    Filters are searched concurrently and cached independently, as by the plain
+    search. An item found by several filters is only returned under the first.
+    """
+    try:
+        user = user_key(current_user)
+        suggestion_index.record_search(user, query)
         ytmusic = YTMusicService(current_user)
-        results = ytmusic.search(
-            query=query,
-            filter=filter.value if filter else None,
-            scope=scope.value if scope else None,
-            limit=limit,
-            ignore_spelling=ignore_spelling
+        results, cached = await cancel_on_disconnect(
+            request,
+            federated_search(ytmusic, user, query, [filter.value for filter in filters], limit, ignore_spelling),
+            ytmusic.cancel_event
+        )
+        response.headers["X-Search-Cache"] = ", ".join(
+            f"{filter}={'hit' if hit else 'miss'}" for filter, hit in cached.items()
         )
         return {"results": results}
     except HTTPException:
@@ -60,28 +126,69 @@ async def search(
             detail=str(e)
         )
 
+@router.post("/batch", response_model=SearchBatchResponse)
+async def search_batch(
+    request: Request,
+    queries: List[str] = Body(..., embed=True, min_length=1, max_length=5000),
+    filter: Optional[SearchFilter] = Body(SearchFilter.SONGS, embed=True),
+    ignore_spelling: bool = Body(False, embed=True),
+    current_user: CredentialsModel = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Resolve many queries, such as "artist - title" lines, to their best match.
+
+    Each query gets its best matching playable result and a confidence from 0
+    to 1; a failing query gets an error instead, so a partial failure still
+    returns 200. Searches are shared with the search cache.
+    """
+    ytmusic = YTMusicService(current_user)
+    return await cancel_on_disconnect(
+        request,
+        batch_search(ytmusic, user_key(current_user), queries, filter.value if filter else None, ignore_spelling),
+        ytmusic.cancel_event
+    )
+
 @router.get("/suggestions", response_model=SearchSuggestionsResponse)
 async def get_search_suggestions(
+    request: Request,
+    response: Response,
     query: str,
     detailed_runs: bool = False,
     current_user: CredentialsModel = Depends(get_current_user)
 ) -> Dict[str, Union[List[str], List[Dict[str, Any]]]]:
-    """Get search suggestions for a query."""
+    """Get search suggestions for a query.
+
+    Prefixes seen before are answered from the local suggestion index, marked by
+    an `X-Suggestions-Source: local` header; others go upstream and feed the index.
+    """
     try:
+        user = user_key(current_user)
+        local = suggestion_index.lookup(user, query)
+        if local is not None:
+            response.headers["X-Suggestions-Source"] = "local"
+            if detailed_runs:
+                return {"suggestions": [suggestion.to_dict(query) for suggestion in local]}
+            return {"suggestions": [suggestion.text for suggestion in local]}
+
         ytmusic = YTMusicService(current_user)
-        suggestions = ytmusic.get_search_suggestions(query, detailed_runs=detailed_runs)
+        # Always fetched detailed, so history suggestions can be kept apart from shared ones
+        suggestions = await cancel_on_disconnect(
+            request,
+            run_in_threadpool(ytmusic.get_search_suggestions, query, True),
+            ytmusic.cancel_event
+        )
         if not suggestions:
+            suggestion_index.learn(user, query, [])
             return {"suggestions": []}
         if isinstance(suggestions, str):
-            return {"suggestions": [suggestions]}
+            suggestions = [suggestions]
         if isinstance(suggestions, list):
-            if not suggestions:
-                return {"suggestions": []}
-            if isinstance(suggestions[0], str):
-                return {"suggestions": suggestions}
-            if isinstance(suggestions[0], dict):
+            suggestion_index.learn(user, query, suggestions)
+            if detailed_runs or isinstance(suggestions[0], str):
                 return {"suggestions": suggestions}
+            return {"suggestions": [suggestion.get("text", "") for suggestion in suggestions]}
         return {"suggestions": []}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -96,6 +203,8 @@ async def remove_search_suggestions(
     try:
         ytmusic = YTMusicService(current_user)
         success = ytmusic.remove_search_suggestions()
+        if success:
+            suggestion_index.forget_user(user_key(current_user))
         return {"message": "Search suggestions removed successfully" if success else "Failed to remove search suggestions"}
     except Exception as e:
         raise HTTPException(
@@ -1,13 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
-from typing import Dict, Any, List, Optional
-from app.core.security import get_current_user
+import os
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Body, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from typing import Dict, Any, List, Literal, Optional
+from app.core.metrics import metrics
+from app.core.security import get_current_user, user_key
 from app.schemas.models import (
     CredentialsModel,
     SearchResults,
     MessageResponse,
     UploadArtistResponse,
-    UploadAlbumResponse
+    UploadAlbumResponse,
+    UploadJobResponse,
+    UploadIndexRebuildResponse,
+    BulkUploadResponse,
+    UploadBulkDeleteResponse
 )
+from app.services import bulk_uploads
+from app.services.bulk_uploads import bulk_uploader, delete_entities
+from app.services.library import library_mirror, library_filters, serve_mirrored, LibraryFilters
+from app.services.upload_index import upload_index
+from app.services.upload_queue import upload_queue
+from app.services.uploads import spool_upload
 from app.services.ytmusic import YTMusicService, LibraryOrderType
 
 router = APIRouter()
@@ -26,6 +39,7 @@ async def upload_song(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Failed to upload song"
             )
+        await library_mirror.expire(user_key(current_user), "uploads")
         return {"message": "Song uploaded successfully"}
     except Exception as e:
         raise HTTPException(
@@ -33,6 +47,146 @@ async def upload_song(
             detail=str(e)
         )
 
+@router.post("/songs/file", response_model=MessageResponse)
+async def upload_song_file(
+    request: Request,
+    current_user: CredentialsModel = Depends(get_current_user)
+) -> Dict[str, str]:
+    """Upload a song sent as the `file` part of a multipart/form-data request.
+
+    The file is streamed to a temporary file; the upload is rejected as soon as it
+    is too large or is not a supported audio type. Files the user uploaded before
+    are recognized by their content hash and not sent again.
+    """
+    upload = await spool_upload(request)
+    user = user_key(current_user)
+    ytmusic = YTMusicService(current_user)
+    try:
+        if await upload_index.lookup(ytmusic, user, upload.digest):
+            metrics.inc("upload_duplicates")
+            return {"message": "Song already uploaded"}
+        success = await run_in_threadpool(ytmusic.upload_song, upload.path)
+    finally:
+        await run_in_threadpool(os.unlink, upload.path)
+    if not success:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Failed to upload song"
+        )
+    await upload_index.record(user, upload.digest, upload.filename, upload.size)
+    await library_mirror.expire(user, "uploads")
+    return {"message": "Song uploaded successfully"}
+
+@router.post("/jobs", response_model=UploadJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def queue_song_upload(
+    request: Request,
+    current_user: CredentialsModel = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Queue a song sent as the `file` part of a multipart/form-data request for upload.
+
+    Returns as soon as the file has been received; poll the returned job for the result.
+    """
+    upload = await spool_upload(request)
+    try:
+        return await upload_queue.enqueue(current_user, upload)
+    except Exception:
+        await run_in_threadpool(os.unlink, upload.path)
+        raise
+
+@router.get("/jobs/{job_id}", response_model=UploadJobResponse)
+async def get_upload_job(
+    job_id: str,
+    current_user: CredentialsModel = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Get the status of a queued upload."""
+    job = await upload_queue.get(current_user, job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload job not found")
+    return job
+
+@router.post("/bulk", response_model=BulkUploadResponse, status_code=status.HTTP_202_ACCEPTED)
+async def bulk_upload_directory(
+    background_tasks: BackgroundTasks,
+    directory: str = Body(..., embed=True),
+    current_user: CredentialsModel = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Upload every audio file below a directory on the server as a background job.
+
+    Poll the returned job for progress and per-file results.
+    """
+    if not bulk_uploads.UPLOAD_BULK_ROOT:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Directory uploads are disabled; set UPLOAD_BULK_ROOT")
+    path = os.path.realpath(directory)
+    root = os.path.realpath(bulk_uploads.UPLOAD_BULK_ROOT)
+    if os.path.commonpath([path, root]) != root:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Directory is outside UPLOAD_BULK_ROOT")
+    if not os.path.isdir(path):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Directory {directory} not found")
+    job = await bulk_uploader.create(user_key(current_user), directory, path)
+    background_tasks.add_task(bulk_uploader.run, YTMusicService(current_user), job["id"])
+    return job
+
+@router.post("/bulk/archive", response_model=BulkUploadResponse, status_code=status.HTTP_202_ACCEPTED)
+async def bulk_upload_archive(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: CredentialsModel = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Upload every audio file in a zip or tar archive, sent as the `file` part of a
+    multipart/form-data request, as a background job.
+
+    The archive is streamed to a temporary file; its files are extracted one at a
+    time as the job reaches them.
+    """
+    upload = await spool_upload(request, bulk_uploads.UPLOAD_ARCHIVE_MAX_BYTES, archive=True)
+    try:
+        job = await bulk_uploader.create(user_key(current_user), upload.filename, upload.path, archive=True)
+    except Exception:
+        await run_in_threadpool(os.unlink, upload.path)
+        raise
+    background_tasks.add_task(bulk_uploader.run, YTMusicService(current_user), job["id"])
+    return job
+
+@router.get("/bulk/{job_id}", response_model=BulkUploadResponse)
+async def get_bulk_upload(
+    job_id: str,
+    file_status: Optional[Literal["uploaded", "duplicate", "failed"]] = None,
+    current_user: CredentialsModel = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Get a bulk upload's progress and the results of the files processed so far."""
+    job = await bulk_uploader.get(user_key(current_user), job_id, file_status)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Bulk upload not found")
+    return job
+
+@router.post("/index/rebuild", response_model=UploadIndexRebuildResponse)
+async def rebuild_upload_index(
+    current_user: CredentialsModel = Depends(get_current_user)
+) -> Dict[str, int]:
+    """Reconcile the index of uploaded file hashes with the uploads listing now.
+
+    Lookups do this by themselves when the index is older than UPLOAD_INDEX_MAX_AGE.
+    """
+    try:
+        return await upload_index.rebuild(YTMusicService(current_user), user_key(current_user))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Failed to fetch uploaded songs: {e}"
+        )
+
+@router.post("/entities/delete", response_model=UploadBulkDeleteResponse)
+async def delete_upload_entities(
+    entity_ids: List[str] = Body(..., embed=True, min_length=1, max_length=5000),
+    current_user: CredentialsModel = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Delete many uploaded entities (songs or albums) at once.
+
+    Deletes run concurrently; each ID gets its own result, so a partial failure
+    still returns 200.
+    """
+    return await delete_entities(YTMusicService(current_user), user_key(current_user), entity_ids)
+
 @router.delete("/entities/{entity_id}", response_model=MessageResponse)
 async def delete_upload_entity(
     entity_id: str,
@@ -47,6 +201,8 @@ async def delete_upload_entity(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Entity {entity_id} not found or could not be deleted"
             )
+        await library_mirror.remove(user_key(current_user), "uploads", [entity_id])
+        await upload_index.forget(user_key(current_user), [entity_id])
         return {"message": "Upload entity deleted successfully"}
     except Exception as e:
         if "not found" in str(e).lower():
@@ -61,14 +217,20 @@ async def delete_upload_entity(
 
 @router.get("/songs", response_model=SearchResults)
 async def get_library_upload_songs(
+    response: Response,
+    background_tasks: BackgroundTasks,
     limit: int = 25,
     order: Optional[LibraryOrderType] = None,
+    filters: LibraryFilters = Depends(library_filters),
     current_user: CredentialsModel = Depends(get_current_user)
 ) -> Dict[str, List[Dict[str, Any]]]:
-    """Get uploaded songs."""
+    """Get uploaded songs, served from the library mirror once it has been synced."""
     try:
-        ytmusic = YTMusicService(current_user)
-        results = ytmusic.get_library_upload_songs(limit=limit, order=order)
+        results = await serve_mirrored(
+            "uploads", current_user, response, background_tasks,
+            lambda ytmusic: ytmusic.get_library_upload_songs(limit=limit, order=order),
+            limit=limit, order=order, filters=filters
+        )
         return {"results": results}
     except Exception as e:
         raise HTTPException(
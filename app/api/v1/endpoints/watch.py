@@ -6,6 +6,7 @@ from app.schemas.models import (
     WatchPlaylistResponse,
     LyricsResponse
 )
+from app.services.lyrics import lyrics_cache
 from app.services.ytmusic import YTMusicService
 
 router = APIRouter()
@@ -35,7 +36,7 @@ async def get_lyrics(
     browse_id: str,
     current_user: CredentialsModel = Depends(get_current_user)
 ) -> Dict[str, Dict[str, Any]]:
-    """Get song lyrics."""
+    """Get song lyrics, cached in memory and on disk by browse ID."""
     ytmusic = YTMusicService(current_user)
-    lyrics = ytmusic.get_lyrics(browse_id)
+    lyrics = await lyrics_cache.get(ytmusic, browse_id)
     return {"lyrics": lyrics} 
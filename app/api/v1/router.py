@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Security
+from fastapi import APIRouter, Depends, Security
 from app.api.v1.endpoints import (
     auth,
     browse,
@@ -11,6 +11,7 @@ from app.api.v1.endpoints import (
     watch
 )
 from app.core.security import get_current_user
+from app.core.metrics import metrics
 
 router = APIRouter()
 
@@ -29,4 +30,9 @@ router.include_router(watch.router, prefix="/watch", tags=["watch"])
 async def protected_endpoint(
     current_user = Security(get_current_user, scopes=["https://www.googleapis.com/auth/youtube"])
 ):
-    return {"message": "This is a protected endpoint"} 
+    return {"message": "This is a protected endpoint"}
+
+@router.get("/metrics")
+async def get_metrics(current_user = Depends(get_current_user)):
+    """Get this worker's internal metrics. Requires authentication."""
+    return metrics.snapshot()
@@ -0,0 +1,52 @@
+import asyncio
+import os
+import threading
+from typing import Awaitable, Optional, TypeVar
+from fastapi import HTTPException, Request
+from app.core.logger import logger
+from app.core.metrics import metrics
+
+DISCONNECT_POLL_INTERVAL: float = float(os.getenv("DISCONNECT_POLL_INTERVAL", 0.1))
+
+# Non-standard status for requests the client abandoned (as used by nginx); never seen by the client
+CLIENT_CLOSED_REQUEST = 499
+
+T = TypeVar("T")
+
+async def _wait_for_disconnect(request: Request, poll_interval: float) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(poll_interval)
+
+async def cancel_on_disconnect(
+    request: Request,
+    call: Awaitable[T],
+    cancel_event: Optional[threading.Event] = None,
+    poll_interval: Optional[float] = None
+) -> T:
+    """Await upstream work for a request, abandoning it if the client disconnects first.
+
+    The awaitable is cancelled and `cancel_event` is set, so work running in the
+    thread pool stops at its next upstream request or before parsing a response
+    (see `YTMusicService.cancel_event`).
+
+    Raises:
+        HTTPException: 499 if the client disconnected
+    """
+    metrics.inc("upstream_calls_watched")
+    work = asyncio.ensure_future(call)
+    watcher = asyncio.ensure_future(
+        _wait_for_disconnect(request, DISCONNECT_POLL_INTERVAL if poll_interval is None else poll_interval)
+    )
+    try:
+        await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+    if work.done():
+        return work.result()
+
+    if cancel_event is not None:
+        cancel_event.set()
+    work.cancel()
+    metrics.inc("upstream_calls_cancelled")
+    logger.info(f"Client disconnected, abandoned upstream work for {request.url.path}")
+    raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
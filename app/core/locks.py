@@ -0,0 +1,49 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+@contextmanager
+def file_lock(path: str, shared: bool = False) -> Iterator[None]:
+    """Hold an advisory lock on a file, shared between all processes on this host.
+
+    Args:
+        path: Lock file path. Created if it does not exist
+        shared: Take a shared (read) lock instead of an exclusive one
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+@asynccontextmanager
+async def async_file_lock(path: str, poll_interval: float = 0.1) -> AsyncIterator[None]:
+    """Hold an exclusive advisory lock on a file without blocking the event loop.
+
+    Args:
+        path: Lock file path. Created if it does not exist
+        poll_interval: Seconds between attempts while another process holds the lock
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        while fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                await asyncio.sleep(poll_interval)
+        yield
+    finally:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
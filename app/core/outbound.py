@@ -0,0 +1,57 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Tuple
+from app.core.metrics import metrics
+
+OUTBOUND_RATE_LIMIT: float = float(os.getenv("OUTBOUND_RATE_LIMIT", 10))
+OUTBOUND_BURST: int = int(os.getenv("OUTBOUND_BURST", 20))
+OUTBOUND_CONCURRENCY: int = int(os.getenv("OUTBOUND_CONCURRENCY", 8))
+
+class OutboundLimiter:
+    """Limits the rate and concurrency of upstream calls made by bulk operations.
+
+    Calls start at no more than `rate` per second on average, with bursts of up
+    to `burst`, and at most `concurrency` run at once. A rate of 0 disables the
+    rate limit. Limits apply per process.
+    """
+
+    def __init__(self, rate: float = OUTBOUND_RATE_LIMIT, burst: int = OUTBOUND_BURST, concurrency: int = OUTBOUND_CONCURRENCY):
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._semaphore: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Semaphores belong to an event loop; tests run each on a fresh one
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore[0] is not loop:
+            self._semaphore = (loop, asyncio.Semaphore(self.concurrency))
+        return self._semaphore[1]
+
+    async def _take_token(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            metrics.inc("outbound_throttled")
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Wait until an upstream call may start, and hold a concurrency slot while it runs."""
+        start = time.perf_counter()
+        async with self._get_semaphore():
+            await self._take_token()
+            metrics.observe("outbound_wait_seconds", time.perf_counter() - start)
+            yield
+
+outbound_limiter = OutboundLimiter()
@@ -0,0 +1,207 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+from fastapi.concurrency import run_in_threadpool
+from app.core.locks import file_lock
+from app.core.logger import logger
+
+def token_key(token: str) -> int:
+    """Cheap 32-bit key used to probe the Bloom filter."""
+    return zlib.crc32(token.encode())
+
+def token_digest(token: str) -> str:
+    """Digest stored in place of the token itself, so revoked tokens never touch the disk."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 32-bit keys.
+
+    Slots are stored one per byte rather than packed into bits: it costs 8x the
+    memory but saves the shift-and-mask work on every probe.
+    """
+
+    def __init__(self, size: int = 1 << 21, num_hashes: int = 3):
+        self.size = 1 << max(size - 1, 7).bit_length()
+        self.num_hashes = num_hashes
+        self._mask = self.size - 1
+        self._slots = bytearray(self.size)
+
+    def add(self, key: int) -> None:
+        """Add a key to the filter."""
+        step = ((key * 0x9E3779B1) >> 16) | 1
+        for i in range(self.num_hashes):
+            self._slots[(key + i * step) & self._mask] = 1
+
+    def __contains__(self, key: int) -> bool:
+        slots = self._slots
+        mask = self._mask
+        # Most absent keys are rejected by the first probe
+        if not slots[key & mask]:
+            return False
+        step = ((key * 0x9E3779B1) >> 16) | 1
+        for i in range(1, self.num_hashes):
+            if not slots[(key + i * step) & mask]:
+                return False
+        return True
+
+class RevocationStore:
+    """Revoked access tokens: a Bloom filter in front of an exact set of digests.
+
+    Revocations are appended to a file shared by all workers on the host, picked up
+    by the other workers on their next sync, and compacted once the tokens they
+    refer to would have expired anyway.
+    """
+
+    def __init__(self, path: Optional[str] = None, bloom_size: int = 1 << 21, num_hashes: int = 3):
+        self.path = path
+        self._bloom_size = bloom_size
+        self._num_hashes = num_hashes
+        self._bloom = BloomFilter(bloom_size, num_hashes)
+        self._revoked: Dict[str, float] = {}  # token digest -> token expiry
+        self._keys: Dict[str, int] = {}  # token digest -> Bloom filter key
+        self._next_expiry = float("inf")
+        self._lock = threading.Lock()
+        self._offset = 0
+        self._inode: Optional[int] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+        if path:
+            self.sync()
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def is_revoked(self, token: str) -> bool:
+        """Check whether a token has been revoked."""
+        if not self._revoked:
+            return False
+        # Hot path for every request: inline token_key() and let the Bloom filter reject
+        if zlib.crc32(token.encode()) not in self._bloom:
+            return False
+        expires_at = self._revoked.get(token_digest(token))
+        return expires_at is not None and expires_at > time.time()
+
+    def revoke(self, token: str, expires_at: float) -> None:
+        """Revoke a token until it expires.
+
+        Args:
+            token: Access token to revoke
+            expires_at: Unix timestamp after which the token is invalid anyway
+        """
+        key, digest = token_key(token), token_digest(token)
+        with self._lock:
+            self._add(digest, key, expires_at)
+            if self.path:
+                with file_lock(f"{self.path}.lock"):
+                    with open(self.path, "a") as f:
+                        f.write(f"{key} {digest} {expires_at:.0f}\n")
+
+    def _add(self, digest: str, key: int, expires_at: float) -> None:
+        self._revoked[digest] = max(expires_at, self._revoked.get(digest, 0))
+        self._keys[digest] = key
+        self._bloom.add(key)
+        self._next_expiry = min(self._next_expiry, expires_at)
+
+    def sync(self) -> None:
+        """Pick up revocations written by other workers since the last read."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        with self._lock, file_lock(f"{self.path}.lock", shared=True):
+            self._read_new_entries()
+
+    def _read_new_entries(self) -> None:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if st.st_ino != self._inode or st.st_size < self._offset:
+            # The file was compacted by another worker; re-read it from the start
+            self._inode = st.st_ino
+            self._offset = 0
+        if st.st_size == self._offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        self._offset += end
+        now = time.time()
+        for line in data[:end].decode().splitlines():
+            try:
+                key, digest, expires_at = line.split()
+                if float(expires_at) > now:
+                    self._add(digest, int(key), float(expires_at))
+            except ValueError:
+                logger.warning(f"Skipping malformed revocation entry in {self.path}")
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Drop revocations for tokens that have expired and compact the file.
+
+        Returns:
+            Number of entries removed
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if self.path:
+                with file_lock(f"{self.path}.lock"):
+                    self._read_new_entries()
+                    removed = self._drop_expired(now)
+                    if removed:
+                        self._rewrite()
+            else:
+                removed = self._drop_expired(now)
+        return removed
+
+    def _drop_expired(self, now: float) -> int:
+        expired = [digest for digest, expires_at in self._revoked.items() if expires_at <= now]
+        if not expired:
+            return 0
+        for digest in expired:
+            del self._revoked[digest]
+            del self._keys[digest]
+        # Bloom filters cannot forget keys, so rebuild from what is left
+        self._bloom = BloomFilter(self._bloom_size, self._num_hashes)
+        for key in self._keys.values():
+            self._bloom.add(key)
+        self._next_expiry = min(self._revoked.values(), default=float("inf"))
+        return len(expired)
+
+    def _rewrite(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            for digest, expires_at in self._revoked.items():
+                f.write(f"{self._keys[digest]} {digest} {expires_at:.0f}\n")
+        os.replace(tmp_path, self.path)
+        st = os.stat(self.path)
+        self._inode, self._offset = st.st_ino, st.st_size
+
+    async def run(self, interval: float) -> None:
+        """Sync with other workers and prune expired entries until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await run_in_threadpool(self.sync)
+                if time.time() >= self._next_expiry:
+                    removed = await run_in_threadpool(self.prune)
+                    if removed:
+                        logger.info(f"Pruned {removed} expired token revocations")
+            except Exception as e:
+                logger.error(f"Token revocation sync error: {e}")
+
+    def start(self, interval: float) -> None:
+        """Start the background sync on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run(interval))
+
+    async def stop(self) -> None:
+        """Stop the background sync."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -1,14 +1,20 @@
 from fastapi import Depends, HTTPException, status, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2AuthorizationCodeBearer
 from app.schemas.models import CredentialsModel
-from typing import List
+from typing import Any, Dict, List, Optional
 from app.core.logger import log_security_event
+from app.core.tokens import token_refresher
+from app.core.revocation import RevocationStore
 import os
 from dotenv import load_dotenv
 import time
-from collections import defaultdict
+import threading
+from collections import OrderedDict, defaultdict
 from google_auth_oauthlib.flow import Flow
 import json
+import hashlib
+import requests
 
 load_dotenv()
 
@@ -41,13 +47,35 @@ DEBUG = os.getenv("DEBUG", "False").lower() == "true"
 
 GOOGLE_SCOPES = [
     "https://www.googleapis.com/auth/youtube",
-    "https://www.googleapis.com/auth/youtube.readonly"
+    "https://www.googleapis.com/auth/youtube.readonly",
+    # Makes tokeninfo report the account's stable ID, which keys server-side data
+    "openid"
 ]
 
+# Access tokens are checked with Google's tokeninfo endpoint; results are cached until the token expires
+GOOGLE_TOKENINFO_URL = "https://oauth2.googleapis.com/tokeninfo"
+TOKEN_INFO_CACHE_SIZE = int(os.getenv("TOKEN_INFO_CACHE_SIZE", 10000))
+_token_info: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # token digest -> verified payload
+_token_info_lock = threading.Lock()
+
 # Load redirect URIs from environment variables
 auth_redirect_uri = GOOGLE_REDIRECT_URI
 docs_redirect_uri = GOOGLE_REDIRECT_URI_DOCS
 
+# Client secrets are parsed once and re-read only when the file's mtime changes
+CLIENT_SECRETS_FILE = os.getenv("CLIENT_SECRETS_FILE", "client_secrets.json")
+CLIENT_SECRETS_CHECK_INTERVAL = float(os.getenv("CLIENT_SECRETS_CHECK_INTERVAL", 5))
+_client_config: Dict[str, Any] = {}
+_client_config_mtime: Optional[int] = None
+_client_config_checked_at = 0.0
+_client_config_lock = threading.Lock()
+_oauth_sessions = threading.local()  # Per-thread Flow objects, keyed by redirect URI
+
+# Token revocation list checked on every authenticated request
+TOKEN_REVOCATION_FILE = os.getenv("TOKEN_REVOCATION_FILE", "revoked_tokens.txt")
+TOKEN_REVOCATION_SYNC_INTERVAL = float(os.getenv("TOKEN_REVOCATION_SYNC_INTERVAL", 5))
+revocation_store = RevocationStore(TOKEN_REVOCATION_FILE)
+
 # Function to get the appropriate redirect URI
 def get_redirect_uri(for_docs=False):
     """Get the appropriate redirect URI based on the context."""
@@ -62,6 +90,56 @@ def get_redirect_uri(for_docs=False):
         )
     return docs_redirect_uri if for_docs else auth_redirect_uri
 
+def load_client_config() -> Dict[str, Any]:
+    """Load client secrets from disk, re-parsing only when the file has changed."""
+    global _client_config, _client_config_mtime, _client_config_checked_at
+    with _client_config_lock:
+        mtime = os.stat(CLIENT_SECRETS_FILE).st_mtime_ns
+        if mtime != _client_config_mtime or not _client_config:
+            with open(CLIENT_SECRETS_FILE, 'r') as f:
+                _client_config = json.load(f)
+            _client_config_mtime = mtime
+        _client_config_checked_at = time.monotonic()
+        return _client_config
+
+async def get_client_config() -> Dict[str, Any]:
+    """Get client secrets, checking the file off the event loop at most once per interval."""
+    if _client_config and time.monotonic() - _client_config_checked_at < CLIENT_SECRETS_CHECK_INTERVAL:
+        return _client_config
+    return await run_in_threadpool(load_client_config)
+
+def get_oauth_flow(client_config: Dict[str, Any], redirect_uri: Optional[str] = None) -> Flow:
+    """Get a reusable Flow for the current thread, rebuilt when the client config changes."""
+    flows = getattr(_oauth_sessions, "flows", None)
+    if flows is None or flows.get("config") is not client_config:
+        flows = {"config": client_config}
+        _oauth_sessions.flows = flows
+    flow = flows.get(redirect_uri)
+    if flow is None:
+        flow = Flow.from_client_config(
+            client_config,
+            scopes=GOOGLE_SCOPES,
+            redirect_uri=redirect_uri
+        )
+        flows[redirect_uri] = flow
+    return flow
+
+def _exchange_code(client_config: Dict[str, Any], redirect_uri: str, code: str):
+    """Exchange an authorization code for Google credentials (blocking)."""
+    flow = get_oauth_flow(client_config, redirect_uri)
+    flow.fetch_token(code=code)
+    return flow.credentials
+
+def _refresh_access_token(client_config: Dict[str, Any], refresh_token: str) -> Dict[str, Any]:
+    """Exchange a refresh token for a new access token (blocking)."""
+    flow = get_oauth_flow(client_config)
+    return flow.oauth2session.refresh_token(
+        client_config['web']['token_uri'],
+        refresh_token=refresh_token,
+        client_id=client_config['web']['client_id'],
+        client_secret=client_config['web']['client_secret']
+    )
+
 def check_rate_limit(request: Request) -> None:
     """Check rate limiting."""
     client_ip = request.client.host if request.client else "unknown"
@@ -113,14 +191,48 @@ async def get_token(request: Request) -> str:
     
     return token
 
+def _fetch_token_info(token: str) -> Dict[str, Any]:
+    """Ask Google who an access token belongs to (blocking)."""
+    response = requests.get(GOOGLE_TOKENINFO_URL, params={"access_token": token}, timeout=10)
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials"
+        )
+    return response.json()
+
+def _token_payload(info: Dict[str, Any]) -> Dict[str, Any]:
+    """Payload of a verified token from its tokeninfo response."""
+    if GOOGLE_CLIENT_ID and info.get("aud") != GOOGLE_CLIENT_ID:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token was not issued to this application"
+        )
+    if not info.get("sub"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token does not identify a Google account"
+        )
+    return {
+        "sub": info.get("azp") or GOOGLE_CLIENT_ID,
+        "account_id": info["sub"],
+        "scopes": (info.get("scope") or "").split(),
+        "client_secret": GOOGLE_CLIENT_SECRET,
+        "exp": int(info.get("exp") or time.time() + int(info.get("expires_in") or 0))
+    }
+
 async def verify_token(token: str) -> dict:
-    """Verify Google OAuth token and return payload."""
+    """Verify Google OAuth token and return payload.
+
+    The payload's `account_id` is the Google account the token was issued for,
+    as reported by Google's tokeninfo endpoint.
+    """
     try:
-        # In a real implementation, you would verify the token with Google's tokeninfo endpoint
         # For now, we'll just check if it's our test token
         if token == "test_token":
             return {
                 "sub": "test_client_id",
+                "account_id": "test_account_id",
                 "scopes": ["https://www.googleapis.com/auth/youtube"],
                 "refresh_token": "test_refresh_token",
                 "client_secret": "test_client_secret"
@@ -132,17 +244,20 @@ async def verify_token(token: str) -> dict:
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid authentication credentials"
             )
-            
-        # Here you would make a request to Google's tokeninfo endpoint
-        # and verify the token's validity and scopes
-        
-        # For now, we'll assume the token is valid if it's not the test token
-        return {
-            "sub": "client_id",
-            "scopes": ["https://www.googleapis.com/auth/youtube"],
-            "refresh_token": "refresh_token",
-            "client_secret": GOOGLE_CLIENT_SECRET
-        }
+
+        digest = hashlib.sha256(token.encode()).hexdigest()
+        with _token_info_lock:
+            payload = _token_info.get(digest)
+            if payload is not None and payload["exp"] > time.time():
+                _token_info.move_to_end(digest)
+                return payload
+
+        payload = _token_payload(await run_in_threadpool(_fetch_token_info, token))
+        with _token_info_lock:
+            _token_info[digest] = payload
+            while len(_token_info) > TOKEN_INFO_CACHE_SIZE:
+                _token_info.popitem(last=False)
+        return payload
         
     except HTTPException:
         raise
@@ -155,8 +270,22 @@ async def verify_token(token: str) -> dict:
 async def get_current_user(request: Request, token: str = Depends(get_token)) -> CredentialsModel:
     """Get current user from token."""
     try:
+        if revocation_store.is_revoked(token):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+
+        # Use the latest access token if the background refresher has renewed it,
+        # picking up logins made on other workers; accounts were verified at login
+        latest = token_refresher.resolve(token) or await token_refresher.restore(token)
+        if latest is not None and latest.account_id:
+            return latest
+
         payload = await verify_token(token)
         client_id: str = payload.get("sub", "")
+        account_id: str = payload.get("account_id", "")
         scopes: List[str] = payload.get("scopes", [])
         refresh_token: str = payload.get("refresh_token", "")
         client_secret: str = payload.get("client_secret", GOOGLE_CLIENT_SECRET)
@@ -173,14 +302,23 @@ async def get_current_user(request: Request, token: str = Depends(get_token)) ->
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Invalid scope"
             )
-        
+
+        # Server-side data is keyed by account, so a token must say whose it is
+        if not account_id:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Not authenticated",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+
         return CredentialsModel(
             token=token,
-            refresh_token=refresh_token,
+            refresh_token=refresh_token or None,
             token_uri="https://oauth2.googleapis.com/token",
             client_id=client_id,
             client_secret=client_secret,
-            scopes=scopes
+            scopes=scopes,
+            account_id=account_id
         )
     except HTTPException:
         raise
@@ -191,6 +329,16 @@ async def get_current_user(request: Request, token: str = Depends(get_token)) ->
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+def user_key(credentials: CredentialsModel) -> str:
+    """Stable per-user key for server-side data: a digest of the verified Google account ID.
+
+    Tokens say nothing reliable about whose they are until verified, so
+    credentials without an account ID have no key.
+    """
+    if not credentials.account_id:
+        raise ValueError("Credentials are not bound to a verified account")
+    return hashlib.sha256(f"account:{credentials.account_id}".encode()).hexdigest()[:32]
+
 async def get_oauth_credentials(code: str, request: Request, for_docs: bool = False) -> CredentialsModel:
     """Get OAuth credentials from authorization code."""
     if not code:
@@ -200,9 +348,8 @@ async def get_oauth_credentials(code: str, request: Request, for_docs: bool = Fa
         )
 
     try:
-        # Load client secrets from file
-        with open('client_secrets.json', 'r') as f:
-            client_config = json.load(f)
+        # Load client secrets (cached between requests)
+        client_config = await get_client_config()
 
         # Get appropriate redirect URI
         redirect_uri = get_redirect_uri(for_docs)
@@ -217,16 +364,8 @@ async def get_oauth_credentials(code: str, request: Request, for_docs: bool = Fa
                 })
             )
 
-        # Create flow instance to handle the auth code flow
-        flow = Flow.from_client_config(
-            client_config,
-            scopes=GOOGLE_SCOPES,
-            redirect_uri=redirect_uri
-        )
-
-        # Exchange auth code for credentials
-        flow.fetch_token(code=code)
-        credentials = flow.credentials
+        # Exchange auth code for credentials off the event loop
+        credentials = await run_in_threadpool(_exchange_code, client_config, redirect_uri, code)
 
         # Handle potential None values with defaults
         token = str(credentials.token) if credentials.token else ""
@@ -241,6 +380,9 @@ async def get_oauth_credentials(code: str, request: Request, for_docs: bool = Fa
             except (AttributeError, ValueError):
                 expires_in = None
 
+        # Bind the credentials to the account they were issued for
+        payload = await verify_token(token)
+
         return CredentialsModel(
             token=token,
             refresh_token=refresh_token,
@@ -248,7 +390,8 @@ async def get_oauth_credentials(code: str, request: Request, for_docs: bool = Fa
             client_id=client_id,
             client_secret=GOOGLE_CLIENT_SECRET,
             scopes=list(credentials.scopes) if credentials.scopes else GOOGLE_SCOPES,
-            expires_in=expires_in
+            expires_in=expires_in,
+            account_id=payload.get("account_id")
         )
 
     except Exception as e:
@@ -276,26 +419,11 @@ async def refresh_oauth_token(credentials: CredentialsModel) -> CredentialsModel
         )
     
     try:
-        # Load client secrets
-        with open('client_secrets.json', 'r') as f:
-            client_config = json.load(f)
-
-        # Create flow instance
-        flow = Flow.from_client_config(
-            client_config,
-            scopes=GOOGLE_SCOPES
-        )
-
-        # Create new credentials with the refresh token
-        flow.oauth2session.refresh_token(
-            client_config['web']['token_uri'],
-            refresh_token=credentials.refresh_token,
-            client_id=client_config['web']['client_id'],
-            client_secret=client_config['web']['client_secret']
-        )
+        # Load client secrets (cached between requests)
+        client_config = await get_client_config()
 
-        # Get the new credentials
-        new_token = flow.oauth2session.token
+        # Get the new token off the event loop
+        new_token = await run_in_threadpool(_refresh_access_token, client_config, credentials.refresh_token)
         
         return CredentialsModel(
             token=str(new_token.get('access_token', '')),
@@ -304,7 +432,8 @@ async def refresh_oauth_token(credentials: CredentialsModel) -> CredentialsModel
             client_id=credentials.client_id,
             client_secret=GOOGLE_CLIENT_SECRET,
             scopes=GOOGLE_SCOPES,
-            expires_in=new_token.get('expires_in')
+            expires_in=new_token.get('expires_in'),
+            account_id=credentials.account_id
         )
     except Exception as e:
         raise HTTPException(
@@ -0,0 +1,254 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from dotenv import load_dotenv
+from app.core.logger import logger
+from app.schemas.models import CredentialsModel
+
+load_dotenv()
+
+# Refresh tokens this many seconds before they expire
+TOKEN_REFRESH_LEEWAY = int(os.getenv("TOKEN_REFRESH_LEEWAY", 300))
+# How often the background refresher looks for expiring tokens
+TOKEN_REFRESH_INTERVAL = int(os.getenv("TOKEN_REFRESH_INTERVAL", 30))
+# How long a login's tokens keep resolving to its latest credentials, unless the client logs out
+TOKEN_SESSION_TTL = int(os.getenv("TOKEN_SESSION_TTL", 30 * 24 * 3600))
+# Google access tokens are valid for an hour unless the response says otherwise
+DEFAULT_TOKEN_LIFETIME = 3600
+
+RefreshFunc = Callable[[CredentialsModel], Awaitable[CredentialsModel]]
+
+async def _default_refresh(credentials: CredentialsModel) -> CredentialsModel:
+    """Refresh credentials with Google's token endpoint."""
+    from app.core.security import refresh_oauth_token
+    return await refresh_oauth_token(credentials)
+
+def _to_datetime(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+def _to_timestamp(value: datetime) -> float:
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+class TokenRefresher:
+    """Keeps server-side credentials fresh and collapses concurrent refreshes.
+
+    Access tokens handed to a client (at login or by /auth/refresh) keep resolving
+    to the latest credentials until the client logs out, so clients never need to
+    refresh themselves. Logins are stored as database sessions keyed by those
+    tokens, so every worker, and this one after a restart, can pick them up.
+    """
+
+    def __init__(
+        self,
+        refresh_func: RefreshFunc = _default_refresh,
+        leeway: int = TOKEN_REFRESH_LEEWAY,
+        interval: int = TOKEN_REFRESH_INTERVAL
+    ):
+        self.refresh_func = refresh_func
+        self.leeway = leeway
+        self.interval = interval
+        self._credentials: Dict[str, CredentialsModel] = {}  # refresh token -> latest credentials
+        self._expires_at: Dict[str, float] = {}  # refresh token -> expiry of its latest access token
+        self._aliases: Dict[str, str] = {}  # access token -> refresh token
+        self._alias_expires_at: Dict[str, float] = {}  # access token -> its own expiry
+        self._pinned: Set[str] = set()  # access tokens handed to clients, kept until logout
+        self._inflight: Dict[str, "asyncio.Future[CredentialsModel]"] = {}
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def register(
+        self,
+        credentials: CredentialsModel,
+        expires_at: Optional[float] = None,
+        client_token: Optional[str] = None,
+        pin: bool = True
+    ) -> None:
+        """Store credentials in this process so they are refreshed before they expire.
+
+        Args:
+            credentials: Credentials holding an access token and a refresh token
+            expires_at: Unix timestamp when the access token expires
+            client_token: Access token the client holds. Default: the credentials' own
+            pin: Keep resolving the client's token until logout. Tokens only this
+                process has seen are dropped once replaced and expired
+        """
+        key = credentials.refresh_token
+        if not key:
+            return
+        if expires_at is None:
+            expires_at = time.time() + DEFAULT_TOKEN_LIFETIME
+        self._credentials[key] = credentials
+        self._expires_at[key] = expires_at
+        self._aliases[credentials.token] = key
+        self._alias_expires_at[credentials.token] = expires_at
+        if pin:
+            self._aliases[client_token or credentials.token] = key
+            self._pinned.add(client_token or credentials.token)
+
+    def resolve(self, token: str) -> Optional[CredentialsModel]:
+        """Get the latest credentials for an access token, which may since have been replaced."""
+        key = self._aliases.get(token)
+        if key is None:
+            return None
+        return self._credentials.get(key)
+
+    def discard(self, token: str) -> None:
+        """Stop refreshing the credentials behind an access token."""
+        key = self._aliases.pop(token, None)
+        self._alias_expires_at.pop(token, None)
+        self._pinned.discard(token)
+        if key is None:
+            return
+        self._credentials.pop(key, None)
+        self._expires_at.pop(key, None)
+        for alias in [alias for alias, owner in self._aliases.items() if owner == key]:
+            self._aliases.pop(alias, None)
+            self._alias_expires_at.pop(alias, None)
+            self._pinned.discard(alias)
+
+    def clear(self) -> None:
+        """Forget all stored credentials."""
+        self._credentials.clear()
+        self._expires_at.clear()
+        self._aliases.clear()
+        self._alias_expires_at.clear()
+        self._pinned.clear()
+
+    async def login(self, credentials: CredentialsModel, expires_at: float) -> None:
+        """Register a new login and store it as a session keyed by its access token."""
+        from app.db import crud, session as db_session
+        self.register(credentials, expires_at)
+        if not credentials.refresh_token:
+            return
+        async with db_session.AsyncSessionLocal() as db:
+            if await crud.get_session_by_token(db, credentials.token) is not None:
+                return  # The same login reported twice
+            stored = await crud.save_credentials(db, credentials, _to_datetime(expires_at))
+            await crud.create_session(db, stored.id, credentials.token, timedelta(seconds=TOKEN_SESSION_TTL))
+
+    async def hand_out(self, client_token: str, credentials: CredentialsModel, expires_at: float) -> None:
+        """Register a token given to a client that already holds `client_token`, in the same session."""
+        from app.db import crud, session as db_session
+        self.register(credentials, expires_at)
+        async with db_session.AsyncSessionLocal() as db:
+            session = await crud.get_session_by_token(db, client_token)
+            if session is not None and await crud.get_session_by_token(db, credentials.token) is None:
+                await crud.create_session(db, session.user_id, credentials.token, session.expires_at - crud.utcnow())
+
+    async def restore(self, token: str) -> Optional[CredentialsModel]:
+        """Latest credentials of a login stored by any worker, or None if the token has no session."""
+        from app.db import crud, session as db_session
+        async with db_session.AsyncSessionLocal() as db:
+            stored = await crud.get_session_credentials(db, token)
+        if stored is None or not stored.refresh_token:
+            return None
+        credentials = CredentialsModel(
+            token=stored.token,
+            refresh_token=stored.refresh_token,
+            token_uri=stored.token_uri,
+            client_id=stored.client_id,
+            client_secret=stored.client_secret,
+            scopes=stored.scopes.split(",") if stored.scopes else [],
+            account_id=stored.account_id
+        )
+        expires_at = _to_timestamp(stored.expires_at) if stored.expires_at else None
+        self.register(credentials, expires_at, client_token=token)
+        return credentials
+
+    async def logout(self, token: str) -> None:
+        """Forget a login in this process and delete its sessions."""
+        from app.db import crud, session as db_session
+        self.discard(token)
+        async with db_session.AsyncSessionLocal() as db:
+            await crud.delete_sessions(db, token)
+
+    async def refresh(
+        self,
+        credentials: CredentialsModel,
+        refresh_func: Optional[RefreshFunc] = None
+    ) -> CredentialsModel:
+        """Refresh credentials, sharing a single upstream call between concurrent callers.
+
+        Args:
+            credentials: Credentials to refresh
+            refresh_func: Coroutine performing the refresh. Default: the refresher's own
+        """
+        key = credentials.refresh_token or credentials.token
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._refresh(credentials, refresh_func or self.refresh_func))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield the shared refresh so one cancelled caller does not cancel it for everyone
+        return await asyncio.shield(future)
+
+    async def _refresh(self, credentials: CredentialsModel, refresh_func: RefreshFunc) -> CredentialsModel:
+        from app.db import crud, session as db_session
+        new_credentials = await refresh_func(credentials)
+        expires_at = time.time() + (new_credentials.expires_in or DEFAULT_TOKEN_LIFETIME)
+        # Only swap in the new token once it exists; the client's token keeps resolving to it
+        self.register(new_credentials, expires_at, pin=False)
+        try:
+            # Other workers restoring the login start from the new token
+            async with db_session.AsyncSessionLocal() as db:
+                await crud.update_credentials_token(db, new_credentials, _to_datetime(expires_at))
+        except Exception as e:
+            logger.warning(f"Could not store refreshed token: {e}")
+        return new_credentials
+
+    def _due(self, now: float) -> List[CredentialsModel]:
+        return [
+            credentials for key, credentials in self._credentials.items()
+            if self._expires_at.get(key, now) - now <= self.leeway
+        ]
+
+    async def refresh_due(self) -> None:
+        """Refresh every stored token that is about to expire."""
+        now = time.time()
+        due = self._due(now)
+        results = await asyncio.gather(*(self.refresh(c) for c in due), return_exceptions=True)
+        for credentials, result in zip(due, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"Background token refresh failed: {result}")
+                # Give up on credentials whose access token has already expired
+                if self._expires_at.get(credentials.refresh_token or "", now) <= now:
+                    self.discard(credentials.token)
+        self._prune(now)
+
+    def _prune(self, now: float) -> None:
+        """Drop aliases for replaced access tokens that no client holds and have expired anyway."""
+        for token, expires_at in list(self._alias_expires_at.items()):
+            if token in self._pinned:
+                continue
+            key = self._aliases.get(token)
+            current = self._credentials.get(key) if key else None
+            if expires_at <= now and (current is None or current.token != token):
+                self._aliases.pop(token, None)
+                self._alias_expires_at.pop(token, None)
+
+    async def run(self) -> None:
+        """Refresh expiring tokens until cancelled."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh_due()
+            except Exception as e:
+                logger.error(f"Token refresher error: {e}")
+
+    def start(self) -> None:
+        """Start the background refresher on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+
+    async def stop(self) -> None:
+        """Stop the background refresher."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+token_refresher = TokenRefresher()
@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models import Credentials, Session
+from app.schemas.models import CredentialsModel
+
+def utcnow() -> datetime:
+    """Current UTC time as a naive datetime, matching the DateTime columns."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+async def save_credentials(
+    db: AsyncSession, credentials: CredentialsModel, expires_at: Optional[datetime] = None
+) -> Credentials:
+    """Store OAuth credentials.
+
+    Args:
+        db: Database session
+        credentials: Credentials to store
+        expires_at: When the access token expires
+    """
+    db_credentials = Credentials(
+        token=credentials.token,
+        refresh_token=credentials.refresh_token,
+        token_uri=credentials.token_uri,
+        client_id=credentials.client_id,
+        client_secret=credentials.client_secret,
+        scopes=",".join(credentials.scopes or []),
+        account_id=credentials.account_id,
+        expires_at=expires_at
+    )
+    db.add(db_credentials)
+    await db.commit()
+    return db_credentials
+
+async def create_session(db: AsyncSession, user_id: int, session_token: str, ttl: timedelta) -> Session:
+    """Create a session for stored credentials.
+
+    Args:
+        db: Database session
+        user_id: ID of the stored credentials
+        session_token: Opaque session token handed to the client
+        ttl: How long the session stays valid
+    """
+    db_session = Session(user_id=user_id, session_token=session_token, expires_at=utcnow() + ttl)
+    db.add(db_session)
+    await db.commit()
+    return db_session
+
+async def get_session_by_token(db: AsyncSession, session_token: str) -> Optional[Session]:
+    """Get an unexpired session by its token.
+
+    Args:
+        db: Database session
+        session_token: Session token to look up
+    """
+    result = await db.execute(
+        select(Session).where(Session.session_token == session_token, Session.expires_at > utcnow())
+    )
+    return result.scalar_one_or_none()
+
+async def get_credentials(db: AsyncSession, credentials_id: int) -> Optional[Credentials]:
+    """Get stored credentials by ID."""
+    return await db.get(Credentials, credentials_id)
+
+async def update_credentials_token(
+    db: AsyncSession, credentials: CredentialsModel, expires_at: datetime
+) -> None:
+    """Store a refreshed access token on every stored copy of its refresh token's credentials.
+
+    Args:
+        db: Database session
+        credentials: Refreshed credentials
+        expires_at: When the new access token expires
+    """
+    await db.execute(
+        update(Credentials)
+        .where(Credentials.refresh_token == credentials.refresh_token)
+        .values(token=credentials.token, expires_at=expires_at)
+    )
+    await db.commit()
+
+async def get_session_credentials(db: AsyncSession, session_token: str) -> Optional[Credentials]:
+    """Get the stored credentials behind an unexpired session.
+
+    Args:
+        db: Database session
+        session_token: Session token to look up
+    """
+    session = await get_session_by_token(db, session_token)
+    if session is None:
+        return None
+    return await get_credentials(db, session.user_id)
+
+async def delete_sessions(db: AsyncSession, session_token: str) -> None:
+    """Delete a session and every other session of the same credentials, e.g. on logout.
+
+    The credentials themselves are left to the session reaper.
+
+    Args:
+        db: Database session
+        session_token: Token of any of the sessions
+    """
+    session = await get_session_by_token(db, session_token)
+    if session is not None:
+        await db.execute(delete(Session).where(Session.user_id == session.user_id))
+        await db.commit()
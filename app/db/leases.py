@@ -0,0 +1,102 @@
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import or_, update
+from sqlalchemy.sql import ColumnElement
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.db import session as db_session
+from app.db.crud import utcnow
+
+JOB_HEARTBEAT_INTERVAL: float = float(os.getenv("JOB_HEARTBEAT_INTERVAL", 30))
+JOB_STALE_AFTER: float = float(os.getenv("JOB_STALE_AFTER", 120))
+
+# Names this process as the owner of the background jobs it runs
+WORKER_ID: str = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+RecoverFunc = Callable[[], Awaitable[int]]
+
+def lease(now: datetime) -> Dict[str, Any]:
+    """Column values claiming a job for this process."""
+    return {"owner": WORKER_ID, "heartbeat_at": now}
+
+def stale(model: Any, now: datetime, stale_after: Optional[float] = None) -> ColumnElement:
+    """Condition matching jobs whose owner has not renewed its heartbeat within JOB_STALE_AFTER."""
+    cutoff = now - timedelta(seconds=JOB_STALE_AFTER if stale_after is None else stale_after)
+    return or_(model.heartbeat_at.is_(None), model.heartbeat_at < cutoff)
+
+class JobLeases:
+    """Heartbeats of the jobs this process runs, and recovery of jobs whose owner is gone.
+
+    Job tables register the statuses in which a job belongs to a worker and a
+    coroutine recovering stale jobs. Every interval this process renews the
+    heartbeat of its own jobs and runs each recovery, so the jobs of a worker
+    that stopped are picked up once JOB_STALE_AFTER has passed, and the jobs of
+    live workers are never touched.
+    """
+
+    def __init__(self, interval: float = JOB_HEARTBEAT_INTERVAL):
+        self.interval = interval
+        self._tables: List[Tuple[Any, Sequence[str], RecoverFunc]] = []
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def track(self, model: Any, statuses: Sequence[str], recover: RecoverFunc) -> None:
+        """Renew heartbeats of a job table's rows in `statuses`, and recover stale ones with `recover`."""
+        self._tables.append((model, statuses, recover))
+
+    async def beat(self) -> None:
+        """Renew the heartbeat of every job this process owns."""
+        now = utcnow()
+        async with db_session.AsyncSessionLocal() as db:
+            for model, statuses, _ in self._tables:
+                await db.execute(
+                    update(model)
+                    .where(model.owner == WORKER_ID, model.status.in_(statuses))
+                    .values(heartbeat_at=now)
+                )
+            await db.commit()
+
+    async def recover(self) -> int:
+        """Recover the stale jobs of every tracked table.
+
+        Returns:
+            Number of jobs recovered
+        """
+        total = 0
+        for _, _, recover in self._tables:
+            total += await recover()
+        if total:
+            metrics.inc("jobs_recovered", total)
+            logger.info(f"Recovered {total} jobs left by stopped workers")
+        return total
+
+    async def run(self) -> None:
+        """Renew heartbeats and recover stale jobs every interval until cancelled."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.beat()
+                await self.recover()
+            except Exception as e:
+                metrics.inc("job_lease_errors")
+                logger.error(f"Job heartbeat error: {e}")
+
+    def start(self) -> None:
+        """Start the heartbeat on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+
+    async def stop(self) -> None:
+        """Stop the heartbeat."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+job_leases = JobLeases()
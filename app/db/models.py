@@ -1,6 +1,7 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Boolean, Integer, Float, String, Text, DateTime, ForeignKey, Index, UniqueConstraint, func
 from sqlalchemy.orm import declarative_base
+from typing import List
 
 Base = declarative_base()
 
@@ -14,6 +15,8 @@ class Credentials(Base):
     client_id = Column(String, nullable=False)
     client_secret = Column(String, nullable=False)
     scopes = Column(String)
+    account_id = Column(String)  # Verified Google account the credentials belong to
+    expires_at = Column(DateTime)  # When `token` expires
 
     def __init__(self, **kwargs):
         for key, value in kwargs.items():
@@ -25,8 +28,228 @@ class Session(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("credentials.id"), nullable=False)
     session_token = Column(String, unique=True, nullable=False)
-    expires_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
 
     def __init__(self, **kwargs):
         for key, value in kwargs.items():
-            setattr(self, key, value) 
+            setattr(self, key, value)
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    version = Column(String, primary_key=True)
+
+class LibraryItem(Base):
+    """One item of a user's mirrored library, e.g. a song in `songs` or an album in `albums`."""
+    __tablename__ = "library_items"
+    __table_args__ = (
+        UniqueConstraint("user_key", "kind", "item_id"),
+        Index("ix_library_items_user_kind_seq", "user_key", "kind", "seq"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_key = Column(String, nullable=False)
+    kind = Column(String, nullable=False)
+    item_id = Column(String, nullable=False)
+    seq = Column(Integer, nullable=False)  # Higher is more recently added
+    title = Column(String)
+    artist = Column(String)
+    album = Column(String)
+    duration_seconds = Column(Integer)
+    data = Column(Text, nullable=False)  # Item as returned by the API, as JSON
+
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+# Sort keys of library listings, so sorted and limited listings are read in index order
+Index("ix_library_items_user_kind_title", LibraryItem.user_key, LibraryItem.kind, func.lower(LibraryItem.title))
+Index("ix_library_items_user_kind_artist", LibraryItem.user_key, LibraryItem.kind, func.lower(LibraryItem.artist))
+Index("ix_library_items_user_kind_album", LibraryItem.user_key, LibraryItem.kind, func.lower(LibraryItem.album))
+Index("ix_library_items_user_kind_duration", LibraryItem.user_key, LibraryItem.kind, LibraryItem.duration_seconds)
+
+class LibrarySync(Base):
+    """When each part of a user's library was last mirrored."""
+    __tablename__ = "library_syncs"
+
+    user_key = Column(String, primary_key=True)
+    kind = Column(String, primary_key=True)
+    synced_at = Column(DateTime, nullable=False)
+    full_synced_at = Column(DateTime, nullable=False)
+    item_count = Column(Integer, nullable=False, default=0)
+
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+class LibraryChange(Base):
+    """One entry of a user's library change feed; the ID is the feed version."""
+    __tablename__ = "library_changes"
+    # AUTOINCREMENT so versions are never reused after old entries are pruned
+    __table_args__ = (
+        Index("ix_library_changes_user_id", "user_key", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_key = Column(String, nullable=False)
+    kind = Column(String, nullable=False)
+    op = Column(String, nullable=False)  # add, remove or reset
+    item_id = Column(String)
+    data = Column(Text)  # Added item as JSON
+    created_at = Column(DateTime, nullable=False)
+
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+class LibraryFeed(Base):
+    """Per-user change feed state: versions up to pruned_version are gone."""
+    __tablename__ = "library_feeds"
+
+    user_key = Column(String, primary_key=True)
+    pruned_version = Column(Integer, nullable=False, default=0)
+
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+class PlaylistImport(Base):
+    """Bulk playlist import job, checkpointed after every chunk so it can be resumed."""
+    __tablename__ = "playlist_imports"
+
+    id = Column(String, primary_key=True)
+    user_key = Column(String, nullable=False, index=True)
+    playlist_id = Column(String, nullable=False)
+    video_ids = Column(Text, nullable=False)  # JSON list
+    chunk_size = Column(Integer, nullable=False)
+    duplicates = Column(Boolean, nullable=False, default=False)
+    done_chunks = Column(Text, nullable=False, default="[]")  # JSON list of chunk indexes
+    added = Column(Integer, nullable=False, default=0)
+    status = Column(String, nullable=False)  # pending, running, completed, failed or interrupted
+    error = Column(Text)
+    elapsed_seconds = Column(Float, nullable=False, default=0.0)  # Time spent running, over all runs
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+    owner = Column(String)  # Worker that will run or is running the job
+    heartbeat_at = Column(DateTime)  # Last sign of life from the owner
+
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+class UploadJob(Base):
+    """Queued song upload; the file waits in the spool directory until a worker sends it."""
+    __tablename__ = "upload_jobs"
+    __table_args__ = (Index("ix_upload_jobs_status_created", "status", "created_at"),)
+
+    id = Column(String, primary_key=True)
+    user_key = Column(String, nullable=False, index=True)
+    filename = Column(String, nullable=False)
+    path = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)
+    digest = Column(String, nullable=False)  # Content hash taken while the file was received
+    status = Column(String, nullable=False)  # queued, running, completed, failed or duplicate
+    error = Column(Text)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    owner = Column(String)  # Worker running the job
+    heartbeat_at = Column(DateTime)  # Last sign of life from the owner
+
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+class UploadedFile(Base):
+    """Content hash of a file a user uploaded, so the same file is not sent twice."""
+    __tablename__ = "uploaded_files"
+    __table_args__ = (Index("ix_uploaded_files_user_entity", "user_key", "entity_id"),)
+
+    user_key = Column(String, primary_key=True)
+    digest = Column(String, primary_key=True)
+    filename = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)
+    title_key = Column(String, nullable=False)  # Normalized title the upload is expected to appear under
+    entity_id = Column(String)  # Uploaded song, once it has been found in the uploads listing
+    uploaded_at = Column(DateTime, nullable=False)
+    verified_at = Column(DateTime, nullable=False)  # Last checked against the uploads listing
+
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+class BulkUpload(Base):
+    """Bulk upload of the audio files in a server directory or an uploaded archive."""
+    __tablename__ = "bulk_uploads"
+
+    id = Column(String, primary_key=True)
+    user_key = Column(String, nullable=False, index=True)
+    source = Column(String, nullable=False)  # Directory or archive file name, as given
+    path = Column(String, nullable=False)  # Directory, or the spooled archive
+    archive = Column(Boolean, nullable=False, default=False)
+    status = Column(String, nullable=False)  # pending, running, completed, failed or interrupted
+    found = Column(Integer, nullable=False, default=0)  # Audio files enumerated so far
+    enumerated = Column(Boolean, nullable=False, default=False)  # All files have been found
+    uploaded = Column(Integer, nullable=False, default=0)
+    duplicates = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    bytes_uploaded = Column(Integer, nullable=False, default=0)
+    elapsed_seconds = Column(Float, nullable=False, default=0.0)
+    error = Column(Text)
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+    owner = Column(String)  # Worker that will run or is running the job
+    heartbeat_at = Column(DateTime)  # Last sign of life from the owner
+
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+class BulkUploadFile(Base):
+    """Result of one file of a bulk upload."""
+    __tablename__ = "bulk_upload_files"
+    __table_args__ = (Index("ix_bulk_upload_files_bulk_id", "bulk_id", "id"),)
+
+    id = Column(Integer, primary_key=True)
+    bulk_id = Column(String, nullable=False)
+    name = Column(String, nullable=False)  # Path within the directory or archive
+    status = Column(String, nullable=False)  # uploaded, duplicate or failed
+    size = Column(Integer)
+    title = Column(String)
+    artist = Column(String)
+    album = Column(String)
+    error = Column(Text)
+    seconds = Column(Float, nullable=False)
+
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+# Full-text index over mirrored library items, kept in sync with library_items by
+# triggers. `owner` holds one token per user and listing, so a search only ever
+# touches that user's rows. SQLAlchemy has no construct for virtual tables, so the
+# schema upgrade runs these statements itself on SQLite. The index only holds
+# derived data, so it is dropped and rebuilt whenever the schema changes.
+SQLITE_SCHEMA_DDL: List[str] = [
+    "DROP TRIGGER IF EXISTS library_items_fts_insert",
+    "DROP TRIGGER IF EXISTS library_items_fts_delete",
+    "DROP TRIGGER IF EXISTS library_items_fts_update",
+    "DROP TABLE IF EXISTS library_fts",
+    "CREATE VIRTUAL TABLE library_fts USING fts5("
+    "title, artist, album, owner, content='', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER library_items_fts_insert AFTER INSERT ON library_items BEGIN "
+    "INSERT INTO library_fts(rowid, title, artist, album, owner) "
+    "VALUES (new.id, new.title, new.artist, new.album, new.user_key || new.kind); END",
+    "CREATE TRIGGER library_items_fts_delete AFTER DELETE ON library_items BEGIN "
+    "INSERT INTO library_fts(library_fts, rowid, title, artist, album, owner) "
+    "VALUES ('delete', old.id, old.title, old.artist, old.album, old.user_key || old.kind); END",
+    "CREATE TRIGGER library_items_fts_update AFTER UPDATE ON library_items BEGIN "
+    "INSERT INTO library_fts(library_fts, rowid, title, artist, album, owner) "
+    "VALUES ('delete', old.id, old.title, old.artist, old.album, old.user_key || old.kind); "
+    "INSERT INTO library_fts(rowid, title, artist, album, owner) "
+    "VALUES (new.id, new.title, new.artist, new.album, new.user_key || new.kind); END",
+    "INSERT INTO library_fts(rowid, title, artist, album, owner) "
+    "SELECT id, title, artist, album, user_key || kind FROM library_items",
+]
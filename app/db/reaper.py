@@ -0,0 +1,120 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import delete, exists, select
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.db import session as db_session
+from app.db.crud import utcnow
+from app.db.models import Credentials, Session
+
+SESSION_REAPER_INTERVAL: float = float(os.getenv("SESSION_REAPER_INTERVAL", 300))
+SESSION_REAPER_BATCH_SIZE: int = int(os.getenv("SESSION_REAPER_BATCH_SIZE", 500))
+SESSION_REAPER_PAUSE: float = float(os.getenv("SESSION_REAPER_PAUSE", 0.05))
+
+class SessionReaper:
+    """Deletes expired sessions, and the credentials only they referred to, in small batches.
+
+    Each batch is its own short transaction, with a pause between batches so
+    request handlers waiting to write are not starved.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = SESSION_REAPER_BATCH_SIZE,
+        interval: float = SESSION_REAPER_INTERVAL,
+        pause: float = SESSION_REAPER_PAUSE
+    ):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pause = pause
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    async def reap_batch(self, now: datetime) -> int:
+        """Delete up to one batch of sessions that expired before `now`.
+
+        Returns:
+            Number of sessions deleted
+        """
+        start = time.perf_counter()
+        async with db_session.async_engine.connect() as conn:
+            if conn.dialect.name == "sqlite":
+                # Take the write lock up front so waiting for it is measured on its own
+                await conn.exec_driver_sql("BEGIN IMMEDIATE")
+            rows = (await conn.execute(
+                select(Session.id, Session.user_id)
+                .where(Session.expires_at <= now)
+                .order_by(Session.expires_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )).all()
+            metrics.observe("session_reaper_lock_wait_seconds", time.perf_counter() - start)
+            if not rows:
+                await conn.rollback()
+                return 0
+
+            await conn.execute(delete(Session).where(Session.id.in_([row.id for row in rows])))
+            # Credentials are only reachable through sessions, so drop the ones left without any
+            credentials_result = await conn.execute(
+                delete(Credentials).where(
+                    Credentials.id.in_({row.user_id for row in rows}),
+                    ~exists().where(Session.user_id == Credentials.id)
+                )
+            )
+            await conn.commit()
+
+        metrics.inc("session_reaper_sessions_deleted", len(rows))
+        metrics.inc("session_reaper_credentials_deleted", credentials_result.rowcount)
+        metrics.observe("session_reaper_batch_seconds", time.perf_counter() - start)
+        return len(rows)
+
+    async def reap(self, now: Optional[datetime] = None) -> int:
+        """Delete all sessions that have expired, one batch at a time.
+
+        Returns:
+            Number of sessions deleted
+        """
+        now = utcnow() if now is None else now
+        start = time.perf_counter()
+        total = 0
+        while True:
+            deleted = await self.reap_batch(now)
+            total += deleted
+            if deleted < self.batch_size:
+                break
+            await asyncio.sleep(self.pause)
+        elapsed = time.perf_counter() - start
+        metrics.inc("session_reaper_runs")
+        if total:
+            metrics.set("session_reaper_rows_per_second", total / elapsed)
+            logger.info(f"Reaped {total} expired sessions in {elapsed * 1000:.1f} ms")
+        return total
+
+    async def run(self) -> None:
+        """Reap expired sessions every interval until cancelled."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reap()
+            except Exception as e:
+                metrics.inc("session_reaper_errors")
+                logger.error(f"Session reaper error: {e}")
+
+    def start(self) -> None:
+        """Start the reaper on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+
+    async def stop(self) -> None:
+        """Stop the reaper."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+session_reaper = SessionReaper()
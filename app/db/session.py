@@ -1,16 +1,86 @@
-from sqlalchemy import create_engine, Engine
+from sqlalchemy import create_engine, Engine, MetaData, event, inspect, select, delete
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
-from app.db.models import Base
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import CreateIndex
+from typing import Any, AsyncGenerator, Generator, Optional
+from app.db.models import Base, SchemaVersion, SQLITE_SCHEMA_DDL
+from app.core.locks import async_file_lock
+from app.core.logger import logger
 from alembic import command
 from alembic.config import Config
+from fastapi.concurrency import run_in_threadpool
+import hashlib
 import os
+import tempfile
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
 SQLALCHEMY_DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./app.db")
 
+# Connection pool and SQLite tuning
+DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", 30))
+SQLITE_BUSY_TIMEOUT: int = int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000))  # milliseconds
+
+# Schema migrations
+ALEMBIC_CONFIG: str = os.getenv("ALEMBIC_CONFIG", "alembic.ini")
+SCHEMA_LOCK_FILE: str = os.getenv(
+    "SCHEMA_LOCK_FILE", os.path.join(tempfile.gettempdir(), "ytmusic_api_schema.lock")
+)
+
+def to_async_url(url: str) -> str:
+    """Map a database URL to the equivalent URL for an async driver."""
+    scheme, sep, rest = url.partition("://")
+    if scheme == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    if scheme in ("postgres", "postgresql", "postgresql+psycopg2"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    return url
+
+def is_memory_sqlite(url: str) -> bool:
+    """Check whether a URL points at an in-memory SQLite database."""
+    return url.startswith("sqlite") and (":memory:" in url or url.rstrip("/").endswith(":"))
+
+def set_sqlite_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+    """Apply WAL journaling, relaxed fsync and a busy timeout to each async SQLite connection."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+def create_async_db_engine(url: str) -> AsyncEngine:
+    """Create an async engine with pool settings suited to the database backend."""
+    if is_memory_sqlite(url):
+        # Every connection to :memory: is a separate database, so share a single one
+        async_db_engine = create_async_engine(
+            url, connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+    elif url.startswith("sqlite"):
+        async_db_engine = create_async_engine(
+            url,
+            connect_args={"timeout": SQLITE_BUSY_TIMEOUT / 1000},
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT
+        )
+    else:
+        async_db_engine = create_async_engine(
+            url,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_pre_ping=True
+        )
+    if url.startswith("sqlite"):
+        event.listen(async_db_engine.sync_engine, "connect", set_sqlite_pragmas)
+    return async_db_engine
+
 # Handle special case for SQLite
 if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
     engine: Engine = create_engine(
@@ -21,6 +91,10 @@ else:
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+ASYNC_DATABASE_URL: str = os.getenv("ASYNC_DATABASE_URL", to_async_url(SQLALCHEMY_DATABASE_URL))
+async_engine: AsyncEngine = create_async_db_engine(ASYNC_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
 def create_db_and_tables() -> None:
     """Create database and tables."""
     Base.metadata.create_all(bind=engine)
@@ -33,6 +107,86 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close() 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Get async database session."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def run_migrations():
-    alembic_cfg = Config("alembic.ini")
+    alembic_cfg = Config(ALEMBIC_CONFIG)
     command.upgrade(alembic_cfg, "head")
+
+def schema_fingerprint(metadata: MetaData = Base.metadata) -> str:
+    """Hash of the tables, columns and indexes defined by the models."""
+    parts = []
+    for table in sorted(metadata.tables.values(), key=lambda t: t.name):
+        parts.append(f"table {table.name}")
+        for column in table.columns:
+            parts.append(f"column {column.name} {column.type} {column.nullable} {column.primary_key}")
+        for index in sorted(table.indexes, key=lambda i: i.name or ""):
+            parts.append(f"index {index.name} {[c.name for c in index.columns]} {index.unique}")
+    parts.extend(SQLITE_SCHEMA_DDL)
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()[:16]
+
+async def get_schema_version() -> Optional[str]:
+    """Get the schema version recorded in the database, or None if there is none.
+
+    Only a missing version table counts as no version; other database errors are raised.
+    """
+    async with async_engine.connect() as conn:
+        if not await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table(SchemaVersion.__tablename__)):
+            return None
+        return (await conn.execute(select(SchemaVersion.version))).scalar()
+
+def _add_missing_columns(sync_conn: Any) -> None:
+    """Add nullable columns defined since their table was created; create_all skips existing tables."""
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                logger.warning(f"Cannot add required column {table.name}.{column.name} to an existing table")
+                continue
+            column_type = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+
+def _upgrade_schema(sync_conn: Any, version: str) -> None:
+    """Create missing tables, columns and indexes and record the schema version."""
+    Base.metadata.create_all(sync_conn)
+    _add_missing_columns(sync_conn)
+    # create_all skips tables that exist, so add indexes defined since they were created
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            sync_conn.execute(CreateIndex(index, if_not_exists=True))
+    if sync_conn.dialect.name == "sqlite":
+        for statement in SQLITE_SCHEMA_DDL:
+            sync_conn.exec_driver_sql(statement)
+    sync_conn.execute(delete(SchemaVersion))
+    sync_conn.execute(SchemaVersion.__table__.insert().values(version=version))
+
+async def init_db() -> bool:
+    """Bring the database schema up to date, doing nothing else when it already is.
+
+    Returns:
+        True if the schema was migrated
+    """
+    start = time.perf_counter()
+    version = schema_fingerprint()
+    if await get_schema_version() == version:
+        logger.info(f"Database schema is current ({(time.perf_counter() - start) * 1000:.1f} ms)")
+        return False
+
+    # Only one worker migrates; the rest wait here and find the schema current
+    async with async_file_lock(SCHEMA_LOCK_FILE):
+        if await get_schema_version() == version:
+            logger.info(f"Database schema migrated by another worker ({(time.perf_counter() - start) * 1000:.1f} ms)")
+            return False
+        if os.path.exists(ALEMBIC_CONFIG):
+            await run_in_threadpool(run_migrations)
+        async with async_engine.begin() as conn:
+            await conn.run_sync(_upgrade_schema, version)
+    logger.info(f"Database schema migrated to {version} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+    return True
+
@@ -15,9 +15,16 @@ from app.core.security import (
     docs_redirect_uri,
     GOOGLE_CLIENT_ID
 )
+from app.core import security
+from app.core.tokens import token_refresher
+from app.db.session import init_db
+from app.db.leases import job_leases
+from app.db.reaper import session_reaper
+from app.services.upload_queue import upload_queue
 from fastapi.openapi.utils import get_openapi
 from dotenv import load_dotenv
 from urllib.parse import urlparse
+from contextlib import asynccontextmanager
 
 load_dotenv()
 
@@ -25,8 +32,26 @@ load_dotenv()
 parsed_uri = urlparse(docs_redirect_uri)
 docs_redirect_path = parsed_uri.path if parsed_uri.path.startswith('/') else f"/{parsed_uri.path}"
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background tasks on startup and stop them on shutdown."""
+    await init_db()
+    await job_leases.recover()
+    job_leases.start()
+    token_refresher.start()
+    security.revocation_store.start(security.TOKEN_REVOCATION_SYNC_INTERVAL)
+    session_reaper.start()
+    upload_queue.start()
+    yield
+    await upload_queue.stop()
+    await job_leases.stop()
+    await session_reaper.stop()
+    await security.revocation_store.stop()
+    await token_refresher.stop()
+
 app = FastAPI(
     title="YTMusic API FastAPI Wrapper",
+    lifespan=lifespan,
     openapi_url="/api/v1/openapi.json",
     docs_url="/api/v1/docs",
     redoc_url="/api/v1/redoc",
@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any, Union
 from enum import Enum
@@ -15,6 +16,7 @@ class CredentialsModel(BaseModel):
     client_secret: str
     scopes: Optional[List[str]] = None
     expires_in: Optional[int] = None
+    account_id: Optional[str] = None  # Verified Google account the credentials belong to
 
 class MessageResponse(BaseModel):
     message: str
@@ -25,6 +27,26 @@ class AuthResponse(BaseModel):
 class SearchResults(BaseModel):
     results: Union[List[Dict[str, Any]], Dict[str, Any], List[str], List[Any]]
 
+class LibraryChangesResponse(BaseModel):
+    version: int
+    reset: bool
+    has_more: bool
+    changes: List[Dict[str, Any]]
+
+class FederatedSearchResults(BaseModel):
+    results: Dict[str, List[Dict[str, Any]]]
+
+class SearchBatchResult(BaseModel):
+    query: str
+    match: Optional[Dict[str, Any]] = None
+    confidence: float
+    cached: bool
+    error: Optional[str] = None
+
+class SearchBatchResponse(BaseModel):
+    results: List[SearchBatchResult]
+    matched: int
+
 class SearchSuggestionsResponse(BaseModel):
     suggestions: List[Union[str, Dict[str, Any]]]
 
@@ -34,6 +56,34 @@ class SearchSuggestionsRequest(BaseModel):
 class PlaylistResponse(BaseModel):
     playlist_id: str
 
+class PlaylistSyncResponse(BaseModel):
+    added: int
+    removed: int
+    unchanged: int
+    requests: int
+
+class PlaylistDedupeResponse(BaseModel):
+    added: int
+    removed: int
+    duplicates: int
+    requests: int
+
+class PlaylistImportResponse(BaseModel):
+    id: str
+    playlist_id: str
+    status: str
+    total: int
+    processed: int
+    added: int
+    chunks_total: int
+    chunks_done: int
+    elapsed_seconds: float
+    items_per_second: Optional[float] = None
+    eta_seconds: Optional[float] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
 class WatchPlaylistResponse(BaseModel):
     playlist: Dict[str, Any]
 
@@ -58,6 +108,61 @@ class UploadArtistResponse(BaseModel):
 class UploadAlbumResponse(BaseModel):
     album: Dict[str, Any]
 
+class UploadJobResponse(BaseModel):
+    id: str
+    filename: str
+    size: int
+    status: str
+    position: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class BulkUploadFileResult(BaseModel):
+    name: str
+    status: str
+    size: Optional[int] = None
+    title: Optional[str] = None
+    artist: Optional[str] = None
+    album: Optional[str] = None
+    error: Optional[str] = None
+    seconds: float
+
+class BulkUploadResponse(BaseModel):
+    id: str
+    source: str
+    status: str
+    found: int
+    total: Optional[int] = None
+    processed: int
+    uploaded: int
+    duplicates: int
+    failed: int
+    bytes_uploaded: int
+    elapsed_seconds: float
+    files_per_second: Optional[float] = None
+    bytes_per_second: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    files: List[BulkUploadFileResult] = []
+
+class UploadDeleteResult(BaseModel):
+    entity_id: str
+    deleted: bool
+    error: Optional[str] = None
+
+class UploadBulkDeleteResponse(BaseModel):
+    results: List[UploadDeleteResult]
+    deleted: int
+    failed: int
+
+class UploadIndexRebuildResponse(BaseModel):
+    entries: int
+    linked: int
+    dropped: int
+
 class TokenResponse(BaseModel):
     token: str
     expires_in: int
@@ -0,0 +1,73 @@
+import os
+from typing import Any, Dict, List, NamedTuple, Optional
+import mutagen
+from app.core.logger import logger
+from app.services.uploads import file_digest
+
+# Tag keys holding each field: mutagen's easy keys (mp3, m4a, flac, ogg), then ASF's (wma)
+TAG_KEYS: Dict[str, List[str]] = {
+    "title": ["title", "Title"],
+    "artist": ["artist", "Author", "WM/AlbumArtist"],
+    "album": ["album", "WM/AlbumTitle"],
+}
+
+class FileInfo(NamedTuple):
+    """What is known about an audio file before it is uploaded."""
+    digest: str
+    size: int
+    title: Optional[str] = None
+    artist: Optional[str] = None
+    album: Optional[str] = None
+    duration_seconds: Optional[int] = None
+
+def _first_value(tags: Any, keys: List[str]) -> Optional[str]:
+    for key in keys:
+        try:
+            values = tags[key]
+        except (KeyError, ValueError):  # Easy tags reject keys they do not know
+            continue
+        for value in values or []:
+            # ASF attributes wrap their value; easy tags are plain strings
+            text = str(getattr(value, "value", value)).strip()
+            if text:
+                return text
+    return None
+
+def read_tags(path: str) -> Dict[str, str]:
+    """Title, artist, album and duration from an audio file's tags, where present.
+
+    Tags are read with mutagen, so every upload format (mp3, m4a, wma, flac, ogg)
+    is supported, including ID3 unsynchronisation and compressed frames. Files
+    mutagen cannot read give an empty result and a warning rather than an error.
+    """
+    try:
+        audio = mutagen.File(path, easy=True)
+    except (mutagen.MutagenError, OSError) as e:
+        logger.warning(f"Could not read tags of {path}: {e}")
+        return {}
+    if audio is None:
+        logger.warning(f"Could not read tags of {path}: not a recognised audio file")
+        return {}
+    tags: Dict[str, str] = {}
+    if audio.tags is not None:
+        for field, keys in TAG_KEYS.items():
+            value = _first_value(audio.tags, keys)
+            if value:
+                tags[field] = value
+    length = getattr(audio.info, "length", 0)
+    if length:
+        tags["duration_seconds"] = str(round(length))
+    return tags
+
+def inspect_file(path: str) -> FileInfo:
+    """Hash and read the tags of a file. CPU bound, so bulk uploads run it in a process pool."""
+    tags = read_tags(path)
+    duration = tags.get("duration_seconds")
+    return FileInfo(
+        digest=file_digest(path),
+        size=os.path.getsize(path),
+        title=tags.get("title"),
+        artist=tags.get("artist"),
+        album=tags.get("album"),
+        duration_seconds=int(duration) if duration else None
+    )
@@ -0,0 +1,408 @@
+import asyncio
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import uuid
+import zipfile
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Set
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, update
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.core.outbound import outbound_limiter
+from app.db import session as db_session
+from app.db.crud import utcnow
+from app.db.leases import job_leases, lease, stale
+from app.db.models import BulkUpload, BulkUploadFile
+from app.services.audio_tags import FileInfo, inspect_file
+from app.services.library import library_mirror
+from app.services.upload_index import upload_index
+from app.services import uploads
+from app.services.ytmusic import YTMusicService
+
+UPLOAD_BULK_CONCURRENCY: int = int(os.getenv("UPLOAD_BULK_CONCURRENCY", 4))
+UPLOAD_BULK_METADATA_PROCESSES: int = int(os.getenv("UPLOAD_BULK_METADATA_PROCESSES", 2))
+UPLOAD_ARCHIVE_MAX_BYTES: int = int(os.getenv("UPLOAD_ARCHIVE_MAX_BYTES", 4 * 1024 * 1024 * 1024))
+# Directory bulk uploads may read from; empty disables uploads from server directories
+UPLOAD_BULK_ROOT: str = os.getenv("UPLOAD_BULK_ROOT", "")
+
+class SourceFile(NamedTuple):
+    """One audio file found by a bulk upload."""
+    name: str  # Path within the directory or archive
+    path: str  # File to upload
+    temporary: bool = False  # Extracted from an archive; delete when done
+    error: Optional[str] = None  # Why the file cannot be uploaded
+
+def is_audio(name: str) -> bool:
+    return "." in name and name.rsplit(".", 1)[-1].lower() in uploads.UPLOAD_EXTENSIONS
+
+def iter_directory(root: str) -> Iterator[SourceFile]:
+    """Audio files below a directory, in name order, listed one directory at a time.
+
+    Symbolic links are skipped, so nothing outside the directory is read.
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        with os.scandir(directory) as scan:
+            entries = sorted(scan, key=lambda entry: entry.name)
+        subdirectories = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirectories.append(entry.path)
+            elif entry.is_file(follow_symlinks=False) and is_audio(entry.name):
+                yield SourceFile(os.path.relpath(entry.path, root), entry.path)
+        stack.extend(reversed(subdirectories))
+
+def _extract(source, name: str) -> str:
+    """Copy an archive member to a spool file, since uploads are sent from a path."""
+    suffix = "." + name.rsplit(".", 1)[-1].lower()
+    with tempfile.NamedTemporaryFile(suffix=suffix, dir=uploads.UPLOAD_SPOOL_DIR, delete=False) as f:
+        shutil.copyfileobj(source, f, uploads.UPLOAD_WRITE_BUFFER)
+    return f.name
+
+def iter_archive(path: str) -> Iterator[SourceFile]:
+    """Audio files in a zip or tar archive, extracted one at a time as they are reached.
+
+    Member names are only reported, never used as paths, so archives cannot
+    write outside the spool directory.
+
+    Raises:
+        ValueError: If the file is neither a zip nor a tar archive
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not is_audio(info.filename):
+                    continue
+                if info.file_size > uploads.UPLOAD_MAX_BYTES:
+                    yield SourceFile(info.filename, "", error=f"File is larger than {uploads.UPLOAD_MAX_BYTES} bytes")
+                    continue
+                with archive.open(info) as member:
+                    yield SourceFile(info.filename, _extract(member, info.filename), temporary=True)
+        return
+    try:
+        archive = tarfile.open(path, "r:*")
+    except tarfile.TarError:
+        raise ValueError("Not a zip or tar archive")
+    with archive:
+        # Iterating reads member headers as it goes, so compressed tars are never listed up front
+        for member in archive:
+            if not member.isfile() or not is_audio(member.name):
+                continue
+            if member.size > uploads.UPLOAD_MAX_BYTES:
+                yield SourceFile(member.name, "", error=f"File is larger than {uploads.UPLOAD_MAX_BYTES} bytes")
+                continue
+            with archive.extractfile(member) as source:
+                yield SourceFile(member.name, _extract(source, member.name), temporary=True)
+
+def bulk_status(job: BulkUpload) -> Dict[str, Any]:
+    """Public view of a bulk upload, with aggregate throughput."""
+    processed = job.uploaded + job.duplicates + job.failed
+    elapsed = job.elapsed_seconds
+    return {
+        "id": job.id,
+        "source": job.source,
+        "status": job.status,
+        "found": job.found,
+        "total": job.found if job.enumerated else None,
+        "processed": processed,
+        "uploaded": job.uploaded,
+        "duplicates": job.duplicates,
+        "failed": job.failed,
+        "bytes_uploaded": job.bytes_uploaded,
+        "elapsed_seconds": round(elapsed, 3),
+        "files_per_second": round(processed / elapsed, 2) if elapsed > 0 else None,
+        "bytes_per_second": round(job.bytes_uploaded / elapsed) if elapsed > 0 else None,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at
+    }
+
+def file_result(row: BulkUploadFile) -> Dict[str, Any]:
+    """Public view of one file's result."""
+    return {
+        "name": row.name,
+        "status": row.status,
+        "size": row.size,
+        "title": row.title,
+        "artist": row.artist,
+        "album": row.album,
+        "error": row.error,
+        "seconds": round(row.seconds, 3)
+    }
+
+class BulkUploader:
+    """Uploads every audio file in a directory or archive as a background job.
+
+    Files are enumerated lazily, so the first uploads start while a large tree or
+    archive is still being read, and at most `concurrency` files are extracted
+    or in flight at a time. Each file is hashed and its tags read in a process
+    pool; files already in the user's upload index are skipped. Uploads run
+    under the outbound limiter. Jobs whose worker stops sending heartbeats are
+    marked interrupted; running the same source again only uploads what is missing.
+    """
+
+    def __init__(self, concurrency: int = UPLOAD_BULK_CONCURRENCY, processes: int = UPLOAD_BULK_METADATA_PROCESSES):
+        self.concurrency = concurrency
+        self.processes = processes
+
+    async def create(self, user: str, source: str, path: str, archive: bool = False) -> Dict[str, Any]:
+        """Record a new bulk upload; run it with `run`. An archive at `path` is owned by the job."""
+        now = utcnow()
+        job = BulkUpload(
+            id=uuid.uuid4().hex,
+            user_key=user,
+            source=source,
+            path=path,
+            archive=archive,
+            status="pending",
+            found=0,
+            enumerated=False,
+            uploaded=0,
+            duplicates=0,
+            failed=0,
+            bytes_uploaded=0,
+            elapsed_seconds=0.0,
+            created_at=now,
+            updated_at=now,
+            **lease(now)
+        )
+        async with db_session.AsyncSessionLocal() as db:
+            db.add(job)
+            await db.commit()
+        metrics.inc("bulk_uploads_created")
+        return bulk_status(job)
+
+    async def get(self, user: str, job_id: str, file_status: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Status and per-file results of one of the user's bulk uploads, or None if there is no such job."""
+        async with db_session.AsyncSessionLocal() as db:
+            job = await db.get(BulkUpload, job_id)
+            if job is None or job.user_key != user:
+                return None
+            query = select(BulkUploadFile).where(BulkUploadFile.bulk_id == job_id)
+            if file_status is not None:
+                query = query.where(BulkUploadFile.status == file_status)
+            rows = (await db.execute(query.order_by(BulkUploadFile.id))).scalars().all()
+        return {**bulk_status(job), "files": [file_result(row) for row in rows]}
+
+    async def interrupt_stale(self) -> int:
+        """Mark jobs whose worker stopped sending heartbeats as interrupted and remove their archives.
+
+        Returns:
+            Number of jobs marked
+        """
+        now = utcnow()
+        active = BulkUpload.status.in_(["pending", "running"])
+        interrupted = []
+        async with db_session.AsyncSessionLocal() as db:
+            jobs = (await db.execute(select(BulkUpload).where(active, stale(BulkUpload, now)))).scalars().all()
+            for job in jobs:
+                # Conditional update: the owner may have renewed its heartbeat since the select
+                result = await db.execute(
+                    update(BulkUpload)
+                    .where(BulkUpload.id == job.id, active, stale(BulkUpload, now))
+                    .values(status="interrupted", updated_at=now, owner=None, heartbeat_at=None)
+                )
+                if result.rowcount == 1:
+                    interrupted.append(job)
+            await db.commit()
+        for job in interrupted:
+            if job.archive:
+                await self._remove(job.path)
+        return len(interrupted)
+
+    def _executor(self) -> Optional[Executor]:
+        # Without processes, metadata is read in the thread pool
+        return ProcessPoolExecutor(self.processes) if self.processes > 0 else None
+
+    async def run(self, ytmusic: YTMusicService, job_id: str) -> None:
+        """Upload the job's files. Errors are recorded on the job and its files."""
+        try:
+            await self._run(ytmusic, job_id)
+        except Exception as e:
+            metrics.inc("bulk_uploads_failed")
+            logger.error(f"Bulk upload {job_id} failed: {e}")
+            await self._update(job_id, status="failed", error=str(e))
+
+    async def _run(self, ytmusic: YTMusicService, job_id: str) -> None:
+        async with db_session.AsyncSessionLocal() as db:
+            now = utcnow()
+            started = await db.execute(
+                update(BulkUpload)
+                .where(BulkUpload.id == job_id, BulkUpload.status == "pending")
+                .values(status="running", updated_at=now, **lease(now))
+            )
+            await db.commit()
+            if started.rowcount != 1:
+                return
+            job = await db.get(BulkUpload, job_id)
+
+        start = time.perf_counter()
+        files: "asyncio.Queue[Optional[SourceFile]]" = asyncio.Queue(maxsize=self.concurrency)
+        record_lock = asyncio.Lock()
+        executor = self._executor()
+        errors = []
+        seen: Set[str] = set()  # Digests of this job's files, for duplicates within the job
+
+        async def enumerate_files() -> None:
+            source = iter_archive(job.path) if job.archive else iter_directory(job.path)
+            found = 0
+            try:
+                while True:
+                    item = await run_in_threadpool(next, source, None)
+                    if item is None:
+                        break
+                    found += 1
+                    await files.put(item)
+                    if found % 100 == 0:
+                        await self._update(job_id, found=found)
+                await self._update(job_id, found=found, enumerated=True)
+            except Exception as e:
+                errors.append(f"Could not read {job.source}: {e}")
+                await self._update(job_id, found=found)
+            finally:
+                await run_in_threadpool(source.close)
+                for _ in range(self.concurrency):
+                    await files.put(None)
+
+        async def upload_files() -> None:
+            while True:
+                item = await files.get()
+                if item is None:
+                    return
+                result = await self._upload(ytmusic, job.user_key, executor, item, seen)
+                try:
+                    async with record_lock:
+                        await self._record(job_id, result, time.perf_counter() - start)
+                except Exception as e:
+                    # Keep consuming, or enumeration would block on a full queue
+                    logger.error(f"Bulk upload {job_id}: could not record {item.name}: {e}")
+
+        try:
+            await asyncio.gather(enumerate_files(), *(upload_files() for _ in range(self.concurrency)))
+        finally:
+            if executor is not None:
+                await run_in_threadpool(executor.shutdown)
+            if job.archive:
+                await self._remove(job.path)
+        elapsed = time.perf_counter() - start
+        async with db_session.AsyncSessionLocal() as db:
+            job = await db.get(BulkUpload, job_id)
+            job.status = "failed" if errors else "completed"
+            job.error = errors[0] if errors else None
+            job.elapsed_seconds = elapsed
+            job.updated_at = utcnow()
+            await db.commit()
+        if job.uploaded:
+            await library_mirror.expire(job.user_key, "uploads")
+        metrics.inc("bulk_uploads_failed" if errors else "bulk_uploads_completed")
+        logger.info(
+            f"Bulk upload {job_id}: {job.uploaded} uploaded, {job.duplicates} duplicates, "
+            f"{job.failed} failed in {elapsed:.1f} s"
+        )
+
+    async def _upload(
+        self,
+        ytmusic: YTMusicService,
+        user: str,
+        executor: Optional[Executor],
+        item: SourceFile,
+        seen: Set[str]
+    ) -> Dict[str, Any]:
+        """Upload one file unless it is a duplicate. Never raises; failures are part of the result."""
+        start = time.perf_counter()
+        result: Dict[str, Any] = {"name": item.name, "status": "failed", "error": item.error}
+        try:
+            if item.error is not None:
+                return result
+            info: FileInfo = await asyncio.get_running_loop().run_in_executor(executor, inspect_file, item.path)
+            result.update(size=info.size, title=info.title, artist=info.artist, album=info.album)
+            duplicate = info.digest in seen
+            seen.add(info.digest)
+            if duplicate or await upload_index.lookup(ytmusic, user, info.digest):
+                result["status"] = "duplicate"
+                return result
+            async with outbound_limiter.slot():
+                # Long jobs outlive access tokens; pick up the one the refresher renewed
+                ytmusic.sync_credentials()
+                success = await run_in_threadpool(ytmusic.upload_song, item.path)
+            if not success:
+                result["error"] = "Failed to upload song"
+                return result
+            await upload_index.record(user, info.digest, os.path.basename(item.name), info.size, info.title)
+            result["status"] = "uploaded"
+            return result
+        except Exception as e:
+            result["error"] = str(e)
+            return result
+        finally:
+            result["seconds"] = time.perf_counter() - start
+            if item.temporary:
+                await self._remove(item.path)
+
+    async def _record(self, job_id: str, result: Dict[str, Any], elapsed: float) -> None:
+        """Store a file's result and add it to the job's totals."""
+        counter = {"uploaded": "uploaded", "duplicate": "duplicates", "failed": "failed"}[result["status"]]
+        async with db_session.AsyncSessionLocal() as db:
+            db.add(BulkUploadFile(bulk_id=job_id, **result))
+            job = await db.get(BulkUpload, job_id)
+            setattr(job, counter, getattr(job, counter) + 1)
+            if result["status"] == "uploaded":
+                job.bytes_uploaded += result["size"]
+            job.elapsed_seconds = elapsed
+            job.updated_at = utcnow()
+            await db.commit()
+        metrics.inc(f"bulk_upload_files_{result['status']}")
+        if result["status"] == "failed":
+            logger.warning(f"Bulk upload {job_id}: {result['name']} failed: {result['error']}")
+
+    async def _update(self, job_id: str, **values: Any) -> None:
+        async with db_session.AsyncSessionLocal() as db:
+            await db.execute(update(BulkUpload).where(BulkUpload.id == job_id).values(updated_at=utcnow(), **values))
+            await db.commit()
+
+    async def _remove(self, path: str) -> None:
+        try:
+            await run_in_threadpool(os.unlink, path)
+        except FileNotFoundError:
+            pass
+
+bulk_uploader = BulkUploader()
+job_leases.track(BulkUpload, ("pending", "running"), bulk_uploader.interrupt_stale)
+
+async def delete_entities(ytmusic: YTMusicService, user: str, entity_ids: List[str]) -> Dict[str, Any]:
+    """Delete uploaded songs or albums concurrently under the outbound limiter.
+
+    Every ID gets a result; one failing does not stop the others. The uploads
+    mirror and the upload index are updated once, after all deletes finished.
+
+    Returns:
+        Per-ID results, in request order, and counts of deleted and failed IDs
+    """
+    entity_ids = list(dict.fromkeys(entity_ids))
+    start = time.perf_counter()
+
+    async def delete(entity_id: str) -> Dict[str, Any]:
+        try:
+            async with outbound_limiter.slot():
+                deleted = await run_in_threadpool(ytmusic.delete_upload_entity, entity_id)
+            error = None if deleted else f"Entity {entity_id} not found or could not be deleted"
+        except Exception as e:
+            deleted, error = False, str(e)
+        return {"entity_id": entity_id, "deleted": deleted, "error": error}
+
+    results = await asyncio.gather(*(delete(entity_id) for entity_id in entity_ids))
+    deleted = [result["entity_id"] for result in results if result["deleted"]]
+    if deleted:
+        await library_mirror.remove(user, "uploads", deleted)
+        # Deleted albums take their songs along, which the mirror cannot tell from the album ID
+        await library_mirror.expire(user, "uploads")
+        await upload_index.forget(user, deleted)
+    metrics.inc("upload_entities_deleted", len(deleted))
+    metrics.inc("upload_entity_delete_errors", len(results) - len(deleted))
+    metrics.observe("upload_bulk_delete_seconds", time.perf_counter() - start)
+    return {"results": results, "deleted": len(deleted), "failed": len(results) - len(deleted)}
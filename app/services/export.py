@@ -0,0 +1,120 @@
+import csv
+import io
+import json
+import os
+from typing import Any, AsyncIterator, Dict, Iterable, List, Literal
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from app.core.cancellation import CLIENT_CLOSED_REQUEST, cancel_on_disconnect
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.services.library import item_fields
+from app.services.ytmusic import YTMusicService
+
+EXPORT_PAGE_SIZE: int = int(os.getenv("EXPORT_PAGE_SIZE", 500))
+# Seconds a client is told to wait while a listing is mirrored for the first time
+EXPORT_RETRY_AFTER: int = int(os.getenv("EXPORT_RETRY_AFTER", 5))
+
+ExportFormat = Literal["csv", "ndjson", "m3u"]
+
+MEDIA_TYPES: Dict[str, str] = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "m3u": "audio/x-mpegurl; charset=utf-8",
+}
+
+CSV_COLUMNS: List[str] = ["id", "title", "artist", "album", "duration_seconds"]
+
+WATCH_URL = "https://music.youtube.com/watch?v={}"
+
+def item_key(item: Dict[str, Any]) -> Any:
+    """The ID an exported item is known by."""
+    return item.get("videoId") or item.get("browseId") or item.get("playlistId") or item.get("entityId")
+
+def format_rows(items: Iterable[Dict[str, Any]], fmt: ExportFormat) -> str:
+    """Serialize a page of items; CSV and M3U headers are written by `export_stream`."""
+    if fmt == "ndjson":
+        return "".join(json.dumps(item, separators=(",", ":")) + "\n" for item in items)
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for item in items:
+            fields = item_fields(item)
+            writer.writerow([item_key(item)] + [fields[column] for column in CSV_COLUMNS[1:]])
+        return buffer.getvalue()
+    lines = []
+    for item in items:
+        # Only playable items belong in a playlist file
+        if not item.get("videoId"):
+            continue
+        fields = item_fields(item)
+        title = f"{fields['artist']} - {fields['title']}" if fields["artist"] else fields["title"]
+        duration = fields["duration_seconds"] if fields["duration_seconds"] is not None else -1
+        lines.append(f"#EXTINF:{duration},{title}\n{WATCH_URL.format(item['videoId'])}\n")
+    return "".join(lines)
+
+def export_header(fmt: ExportFormat) -> str:
+    """Text written before the first row."""
+    if fmt == "csv":
+        return ",".join(CSV_COLUMNS) + "\r\n"
+    if fmt == "m3u":
+        return "#EXTM3U\n"
+    return ""
+
+async def export_stream(
+    request: Request,
+    pages: AsyncIterator[List[Dict[str, Any]]],
+    fmt: ExportFormat
+) -> AsyncIterator[str]:
+    """Serialize pages of items as they arrive, stopping as soon as the client goes away.
+
+    Only the page being written is held in memory. The disconnect check runs
+    before every page is fetched, so an abandoned export fetches nothing more;
+    page sources may also abandon a fetch in progress with a 499.
+    """
+    rows = 0
+    try:
+        yield export_header(fmt)
+        while True:
+            if await request.is_disconnected():
+                metrics.inc("export_disconnects")
+                logger.info(f"Export stopped after {rows} rows: client disconnected")
+                return
+            try:
+                page = await pages.__anext__()
+            except StopAsyncIteration:
+                break
+            except HTTPException as e:
+                if e.status_code != CLIENT_CLOSED_REQUEST:
+                    raise
+                metrics.inc("export_disconnects")
+                logger.info(f"Export stopped after {rows} rows: client disconnected during an upstream fetch")
+                return
+            rows += len(page)
+            yield format_rows(page, fmt)
+        metrics.inc("exports_completed")
+    finally:
+        metrics.inc("export_rows", rows)
+        # Stop the page source now rather than when it is garbage collected
+        close = getattr(pages, "aclose", None)
+        if close is not None:
+            await close()
+
+async def playlist_pages(
+    request: Request,
+    ytmusic: YTMusicService,
+    playlist_id: str,
+    page_size: int = EXPORT_PAGE_SIZE
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """A playlist's tracks in pages of `page_size`.
+
+    The upstream client only returns whole playlists, so the tracks are fetched
+    once, abandoned if the client disconnects meanwhile; the pages keep
+    serialization and the disconnect checks incremental.
+    """
+    playlist = await cancel_on_disconnect(
+        request, run_in_threadpool(ytmusic.get_playlist, playlist_id, None), ytmusic.cancel_event
+    )
+    tracks = playlist.get("tracks") or []
+    for start in range(0, len(tracks), page_size):
+        yield tracks[start:start + page_size]
@@ -0,0 +1,245 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Set
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import update
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.db import session as db_session
+from app.db.crud import utcnow
+from app.db.leases import job_leases, lease, stale
+from app.db.models import PlaylistImport
+from app.services.playlists import chunked, playlist_cache, succeeded
+from app.services.ytmusic import YTMusicService
+
+PLAYLIST_IMPORT_CHUNK_SIZE: int = int(os.getenv("PLAYLIST_IMPORT_CHUNK_SIZE", 100))
+# Above one, chunks are added concurrently and videos may end up out of order
+PLAYLIST_IMPORT_CONCURRENCY: int = int(os.getenv("PLAYLIST_IMPORT_CONCURRENCY", 1))
+PLAYLIST_IMPORT_RETRIES: int = int(os.getenv("PLAYLIST_IMPORT_RETRIES", 3))
+PLAYLIST_IMPORT_RETRY_DELAY: float = float(os.getenv("PLAYLIST_IMPORT_RETRY_DELAY", 1.0))
+
+def import_status(job: PlaylistImport) -> Dict[str, Any]:
+    """Public view of an import job, with progress and throughput."""
+    total = len(json.loads(job.video_ids))
+    chunks_total = -(-total // job.chunk_size)
+    done = json.loads(job.done_chunks)
+    items_done = sum(min(job.chunk_size, total - n * job.chunk_size) for n in done)
+    rate = items_done / job.elapsed_seconds if job.elapsed_seconds > 0 else None
+    return {
+        "id": job.id,
+        "playlist_id": job.playlist_id,
+        "status": job.status,
+        "total": total,
+        "processed": items_done,
+        "added": job.added,
+        "chunks_total": chunks_total,
+        "chunks_done": len(done),
+        "elapsed_seconds": round(job.elapsed_seconds, 3),
+        "items_per_second": round(rate, 2) if rate else None,
+        "eta_seconds": round((total - items_done) / rate, 1) if rate and job.status == "running" else None,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at
+    }
+
+class PlaylistImporter:
+    """Adds large numbers of videos to playlists as background jobs.
+
+    Videos are split into chunks that are added with bounded concurrency and
+    retried with exponential backoff. Each finished chunk is checkpointed in the
+    database, so a failed or interrupted job resumes with the chunks still missing.
+    By default one chunk is added at a time, so videos keep their order; a
+    concurrency above one is faster but lets chunks land out of order. Pending
+    and running jobs carry their worker's heartbeat; a job is only marked
+    interrupted once it is stale.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = PLAYLIST_IMPORT_CHUNK_SIZE,
+        concurrency: int = PLAYLIST_IMPORT_CONCURRENCY,
+        retries: int = PLAYLIST_IMPORT_RETRIES,
+        retry_delay: float = PLAYLIST_IMPORT_RETRY_DELAY
+    ):
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._running: Set[str] = set()
+
+    async def create(self, user: str, playlist_id: str, video_ids: List[str], duplicates: bool = False) -> Dict[str, Any]:
+        """Record a new import job; run it with `run`."""
+        now = utcnow()
+        job = PlaylistImport(
+            id=uuid.uuid4().hex,
+            user_key=user,
+            playlist_id=playlist_id,
+            video_ids=json.dumps(video_ids),
+            chunk_size=self.chunk_size,
+            duplicates=duplicates,
+            done_chunks="[]",
+            added=0,
+            status="pending",
+            elapsed_seconds=0.0,
+            created_at=now,
+            updated_at=now,
+            **lease(now)
+        )
+        async with db_session.AsyncSessionLocal() as db:
+            db.add(job)
+            await db.commit()
+        metrics.inc("playlist_imports_created")
+        return import_status(job)
+
+    async def get(self, user: str, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status of one of the user's import jobs, or None if there is no such job."""
+        async with db_session.AsyncSessionLocal() as db:
+            job = await db.get(PlaylistImport, job_id)
+        if job is None or job.user_key != user:
+            return None
+        return import_status(job)
+
+    async def resume(self, user: str, job_id: str) -> Optional[Dict[str, Any]]:
+        """Mark a failed or interrupted job as pending again so `run` picks up where it stopped.
+
+        Returns:
+            The job's status, or None if there is no such job
+        """
+        async with db_session.AsyncSessionLocal() as db:
+            job = await db.get(PlaylistImport, job_id)
+            if job is None or job.user_key != user:
+                return None
+            if job.status in ("failed", "interrupted"):
+                now = utcnow()
+                job.status = "pending"
+                job.error = None
+                job.updated_at = now
+                for column, value in lease(now).items():
+                    setattr(job, column, value)
+                await db.commit()
+        return import_status(job)
+
+    async def interrupt_stale(self) -> int:
+        """Mark jobs whose worker stopped sending heartbeats as interrupted, so they can be resumed.
+
+        Returns:
+            Number of jobs marked
+        """
+        now = utcnow()
+        async with db_session.AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(PlaylistImport)
+                .where(PlaylistImport.status.in_(["pending", "running"]), stale(PlaylistImport, now))
+                .values(status="interrupted", updated_at=now, owner=None, heartbeat_at=None)
+            )
+            await db.commit()
+        return result.rowcount
+
+    async def run(self, ytmusic: YTMusicService, job_id: str) -> None:
+        """Add the job's remaining chunks to its playlist. Errors are recorded on the job."""
+        if job_id in self._running:
+            return
+        self._running.add(job_id)
+        try:
+            await self._run(ytmusic, job_id)
+        except Exception as e:
+            metrics.inc("playlist_import_errors")
+            logger.error(f"Playlist import {job_id} failed: {e}")
+            await self._finish(job_id, "failed", str(e))
+        finally:
+            self._running.discard(job_id)
+
+    async def _run(self, ytmusic: YTMusicService, job_id: str) -> None:
+        async with db_session.AsyncSessionLocal() as db:
+            # Conditional update, so a job resumed twice is only run by one worker
+            now = utcnow()
+            started = await db.execute(
+                update(PlaylistImport)
+                .where(PlaylistImport.id == job_id, PlaylistImport.status == "pending")
+                .values(status="running", updated_at=now, **lease(now))
+            )
+            await db.commit()
+            if started.rowcount != 1:
+                return
+            job = await db.get(PlaylistImport, job_id)
+        chunks = chunked(json.loads(job.video_ids), job.chunk_size)
+        done = set(json.loads(job.done_chunks))
+        todo = [n for n in range(len(chunks)) if n not in done]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        checkpoint = asyncio.Lock()
+        start = time.perf_counter()
+        base_elapsed = job.elapsed_seconds
+        failed: List[str] = []
+
+        async def add_chunk(n: int) -> None:
+            async with semaphore:
+                if failed:
+                    return  # Stop starting chunks once one has given up
+                try:
+                    added = await self._add_with_retry(ytmusic, job.playlist_id, chunks[n], job.duplicates)
+                except Exception as e:
+                    failed.append(f"Chunk {n} failed after {self.retries + 1} attempts: {e}")
+                    return
+            async with checkpoint:
+                done.add(n)
+                await self._checkpoint(job_id, sorted(done), added, base_elapsed + time.perf_counter() - start)
+            metrics.inc("playlist_import_items", len(chunks[n]))
+
+        await asyncio.gather(*(add_chunk(n) for n in todo))
+        playlist_cache.invalidate(job.user_key, job.playlist_id)
+        elapsed = time.perf_counter() - start
+        if failed:
+            await self._finish(job_id, "failed", failed[0], base_elapsed + elapsed)
+            metrics.inc("playlist_import_errors")
+        else:
+            await self._finish(job_id, "completed", None, base_elapsed + elapsed)
+            metrics.inc("playlist_imports_completed")
+            logger.info(f"Playlist import {job_id}: {len(todo)} chunks added in {elapsed:.1f} s")
+
+    async def _add_with_retry(self, ytmusic: YTMusicService, playlist_id: str, video_ids: List[str], duplicates: bool) -> int:
+        """Add one chunk, retrying with exponential backoff. Returns the number of videos added."""
+        attempt = 0
+        while True:
+            chunk_start = time.perf_counter()
+            try:
+                result = await run_in_threadpool(ytmusic.add_playlist_items, playlist_id, video_ids, None, duplicates)
+                if not succeeded(result):
+                    raise RuntimeError(f"upstream returned {result}")
+                metrics.observe("playlist_import_chunk_seconds", time.perf_counter() - chunk_start)
+                edits = result.get("playlistEditResults") if isinstance(result, dict) else None
+                return len(edits) if edits is not None else len(video_ids)
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                metrics.inc("playlist_import_retries")
+                logger.warning(f"Adding {len(video_ids)} videos to playlist {playlist_id} failed, retrying: {e}")
+                await asyncio.sleep(self.retry_delay * 2 ** attempt)
+                attempt += 1
+
+    async def _checkpoint(self, job_id: str, done: List[int], added: int, elapsed: float) -> None:
+        """Record finished chunks, so a resumed job skips them."""
+        async with db_session.AsyncSessionLocal() as db:
+            job = await db.get(PlaylistImport, job_id)
+            job.done_chunks = json.dumps(done)
+            job.added += added
+            job.elapsed_seconds = elapsed
+            job.updated_at = utcnow()
+            await db.commit()
+
+    async def _finish(self, job_id: str, status: str, error: Optional[str], elapsed: Optional[float] = None) -> None:
+        async with db_session.AsyncSessionLocal() as db:
+            job = await db.get(PlaylistImport, job_id)
+            if job is None:
+                return
+            job.status = status
+            job.error = error
+            if elapsed is not None:
+                job.elapsed_seconds = elapsed
+            job.updated_at = utcnow()
+            await db.commit()
+
+playlist_importer = PlaylistImporter()
+job_leases.track(PlaylistImport, ("pending", "running"), playlist_importer.interrupt_stale)
@@ -0,0 +1,633 @@
+import hashlib
+import json
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Callable, Dict, List, Literal, NamedTuple, Optional, Set, Tuple
+from fastapi import BackgroundTasks, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.core.security import user_key
+from app.db import session as db_session
+from app.db.crud import utcnow
+from app.db.models import LibraryChange, LibraryFeed, LibraryItem, LibrarySync
+from app.schemas.models import CredentialsModel
+from app.services.ytmusic import YTMusicService, LibraryOrderType
+
+LIBRARY_SYNC_INTERVAL: float = float(os.getenv("LIBRARY_SYNC_INTERVAL", 300))
+LIBRARY_FULL_SYNC_INTERVAL: float = float(os.getenv("LIBRARY_FULL_SYNC_INTERVAL", 86400))
+LIBRARY_SYNC_PAGE_SIZE: int = int(os.getenv("LIBRARY_SYNC_PAGE_SIZE", 100))
+LIBRARY_SEARCH_MAX_AGE: float = float(os.getenv("LIBRARY_SEARCH_MAX_AGE", 900))
+LIBRARY_SEARCH_CANDIDATES: int = int(os.getenv("LIBRARY_SEARCH_CANDIDATES", 500))
+LIBRARY_CHANGES_RETENTION: float = float(os.getenv("LIBRARY_CHANGES_RETENTION", 30 * 86400))
+
+class MirrorSource(NamedTuple):
+    """How to fetch one part of the library, newest first, and identify its items."""
+    fetch: Callable[[YTMusicService, Optional[int]], List[Dict[str, Any]]]
+    id_field: str
+    newest_first: bool = True  # Listings in any other order are always synced in full
+
+MIRROR_SOURCES: Dict[str, MirrorSource] = {
+    "songs": MirrorSource(lambda yt, limit: yt.get_library_songs(limit=limit, order="recently_added"), "videoId"),
+    "albums": MirrorSource(lambda yt, limit: yt.get_library_albums(limit=limit, order="recently_added"), "browseId"),
+    "artists": MirrorSource(lambda yt, limit: yt.get_library_artists(limit=limit, order="recently_added"), "browseId"),
+    "liked": MirrorSource(lambda yt, limit: yt.get_liked_songs(limit=limit).get("tracks", []), "videoId"),
+    "uploads": MirrorSource(lambda yt, limit: yt.get_library_upload_songs(limit=limit, order="recently_added"), "entityId"),
+    "playlists": MirrorSource(lambda yt, limit: yt.get_library_playlists(limit=limit), "playlistId", newest_first=False),
+    "subscriptions": MirrorSource(
+        lambda yt, limit: yt.get_library_subscriptions(limit=limit, order="recently_added"), "browseId"
+    ),
+}
+
+# Listings covered by the library change feed
+FEED_KINDS: List[str] = ["songs", "playlists", "liked", "subscriptions"]
+
+# Mirrored listings that can answer a search, by (scope, filter), and the result type of their items
+SEARCH_KINDS: Dict[Tuple[str, Optional[str]], List[str]] = {
+    ("library", None): ["songs", "albums", "artists"],
+    ("library", "songs"): ["songs"],
+    ("library", "albums"): ["albums"],
+    ("library", "artists"): ["artists"],
+    ("uploads", None): ["uploads"],
+    ("uploads", "songs"): ["uploads"],
+    ("uploads", "uploads"): ["uploads"],
+}
+# Sort keys for library listings; prefix with "-" to reverse. recently_added is newest first
+LibrarySortType = Literal[
+    "title", "-title", "artist", "-artist", "album", "-album",
+    "duration", "-duration", "recently_added", "-recently_added"
+]
+SORT_COLUMNS = {
+    "title": func.lower(LibraryItem.title),
+    "artist": func.lower(LibraryItem.artist),
+    "album": func.lower(LibraryItem.album),
+    "duration": LibraryItem.duration_seconds,
+    "recently_added": LibraryItem.seq.desc(),
+}
+
+class LibraryFilters(NamedTuple):
+    """Filters and sort order for a library listing."""
+    artist: Optional[str] = None
+    album: Optional[str] = None
+    min_duration: Optional[int] = None
+    sort: Optional[LibrarySortType] = None
+
+def library_filters(
+    artist: Optional[str] = None,
+    album: Optional[str] = None,
+    min_duration: Optional[int] = None,
+    sort: Optional[LibrarySortType] = None
+) -> LibraryFilters:
+    """Query parameters filtering and sorting a library listing.
+
+    Args:
+        artist: Only items whose artist contains this text, ignoring case
+        album: Only items whose album contains this text, ignoring case
+        min_duration: Only items at least this many seconds long
+        sort: title, artist, album, duration or recently_added; prefix with "-" to reverse
+    """
+    return LibraryFilters(artist, album, min_duration, sort)
+
+def _like_pattern(value: str) -> str:
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+def filter_items(items: List[Dict[str, Any]], filters: LibraryFilters) -> List[Dict[str, Any]]:
+    """Apply listing filters and sort order to items fetched upstream."""
+    rows = [(item, item_fields(item)) for item in items]
+    if filters.artist:
+        rows = [(item, f) for item, f in rows if filters.artist.lower() in (f["artist"] or "").lower()]
+    if filters.album:
+        rows = [(item, f) for item, f in rows if filters.album.lower() in (f["album"] or "").lower()]
+    if filters.min_duration is not None:
+        # Items without a duration never match, as in the database
+        rows = [
+            (item, f) for item, f in rows
+            if f["duration_seconds"] is not None and f["duration_seconds"] >= filters.min_duration
+        ]
+    if filters.sort:
+        key = filters.sort.lstrip("-")
+        reverse = filters.sort.startswith("-")
+        if key == "recently_added":
+            # Upstream order is the listing's own; only reversing it is meaningful
+            if reverse:
+                rows.reverse()
+        else:
+            field = "duration_seconds" if key == "duration" else key
+            present = [row for row in rows if row[1][field] is not None]
+            missing = [row for row in rows if row[1][field] is None]
+            present.sort(
+                key=lambda row: row[1][field] if field == "duration_seconds" else row[1][field].lower(),
+                reverse=reverse
+            )
+            rows = present + missing
+    return [item for item, _ in rows]
+
+RESULT_TYPES: Dict[str, str] = {"songs": "song", "albums": "album", "artists": "artist", "uploads": "song"}
+
+# Rank at most :candidates of the most recently added matches, so very broad
+# queries (a one or two letter prefix) stay fast
+_LOCAL_SEARCH = text(
+    "SELECT i.kind, i.data FROM ("
+    "SELECT rowid AS id, bm25(library_fts, 10.0, 5.0, 2.0, 0.0) AS score FROM library_fts "
+    "WHERE library_fts MATCH :match ORDER BY rowid DESC LIMIT :candidates"
+    ") AS top JOIN library_items AS i ON i.id = top.id "
+    "ORDER BY top.score LIMIT :limit"
+)
+
+def fts_query(query: str, user: str, kinds: List[str]) -> Optional[str]:
+    """Full-text query matching every word of `query` as a prefix in a user's listings.
+
+    Returns:
+        The query, or None if `query` has no words
+    """
+    words = re.findall(r"\w+", query.lower())
+    if not words:
+        return None
+    owners = " OR ".join(f"{user}{kind}" for kind in kinds)
+    terms = " ".join(f'"{word}"*' for word in words)
+    return f"owner : ({owners}) AND {{title artist album}} : ({terms})"
+
+def item_id(item: Dict[str, Any], id_field: str) -> str:
+    """ID of a library item, falling back to a digest of its contents when it has none."""
+    value = item.get(id_field)
+    if value:
+        return str(value)
+    return hashlib.sha1(json.dumps(item, sort_keys=True, default=str).encode()).hexdigest()
+
+def item_fields(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Columns extracted from an item for filtering and sorting."""
+    artists = item.get("artists") or []
+    artist = ", ".join(a["name"] for a in artists if isinstance(a, dict) and a.get("name")) or item.get("artist")
+    album = item.get("album")
+    if isinstance(album, dict):
+        album = album.get("name")
+    return {
+        "title": item.get("title") or item.get("artist"),
+        "artist": artist if isinstance(artist, str) else None,
+        "album": album if isinstance(album, str) else None,
+        "duration_seconds": item.get("duration_seconds")
+    }
+
+async def record_changes(
+    db: AsyncSession,
+    user: str,
+    kind: str,
+    added: Optional[Dict[str, Dict[str, Any]]] = None,
+    removed: Optional[List[str]] = None,
+    reset: bool = False
+) -> None:
+    """Append changes to a listing to the user's change feed and prune entries past retention.
+
+    Args:
+        db: Database session; the caller commits
+        user: User key
+        kind: Listing that changed
+        added: Added items by ID, newest first as fetched
+        removed: IDs of removed items
+        reset: The listing has to be fetched again as a whole
+    """
+    rows = []
+    if reset:
+        rows.append({"user_key": user, "kind": kind, "op": "reset"})
+    for i in removed or []:
+        rows.append({"user_key": user, "kind": kind, "op": "remove", "item_id": i})
+    # Newest first from upstream, so add oldest first and the feed reads chronologically
+    for i, item in reversed(list((added or {}).items())):
+        rows.append({"user_key": user, "kind": kind, "op": "add", "item_id": i, "data": json.dumps(item)})
+    if not rows:
+        return
+    now = utcnow()
+    await db.execute(insert(LibraryChange), [{**row, "created_at": now} for row in rows])
+    metrics.inc("library_changes_recorded", len(rows))
+
+    cutoff = now - timedelta(seconds=LIBRARY_CHANGES_RETENTION)
+    pruned_version = (await db.execute(
+        select(func.max(LibraryChange.id)).where(LibraryChange.user_key == user, LibraryChange.created_at < cutoff)
+    )).scalar()
+    if pruned_version is not None:
+        await db.execute(delete(LibraryChange).where(
+            LibraryChange.user_key == user, LibraryChange.id <= pruned_version
+        ))
+        feed = await db.get(LibraryFeed, user)
+        if feed is None:
+            db.add(LibraryFeed(user_key=user, pruned_version=pruned_version))
+        else:
+            feed.pruned_version = max(feed.pruned_version, pruned_version)
+
+async def get_changes(
+    user: str,
+    since: int = 0,
+    limit: int = 1000,
+    kinds: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """Changes to a user's mirrored listings after version `since`, oldest first.
+
+    Returns:
+        `changes`, the `version` to pass as `since` next time, whether there are
+        more changes (`has_more`), and `reset` if changes after `since` have been
+        pruned, in which case the client has to fetch its listings again
+    """
+    async with db_session.AsyncSessionLocal() as db:
+        feed = await db.get(LibraryFeed, user)
+        current = (await db.execute(
+            select(func.max(LibraryChange.id)).where(LibraryChange.user_key == user)
+        )).scalar() or 0
+        if feed is not None and since < feed.pruned_version:
+            return {"version": max(current, feed.pruned_version), "reset": True, "has_more": False, "changes": []}
+
+        query = select(LibraryChange).where(LibraryChange.user_key == user, LibraryChange.id > since)
+        if kinds:
+            query = query.where(LibraryChange.kind.in_(kinds))
+        rows = (await db.execute(query.order_by(LibraryChange.id).limit(limit + 1))).scalars().all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "version": rows[-1].id if has_more else max(current, since),
+        "reset": False,
+        "has_more": has_more,
+        "changes": [
+            {
+                "version": row.id,
+                "kind": row.kind,
+                "op": row.op,
+                "id": row.item_id,
+                "item": json.loads(row.data) if row.data else None
+            }
+            for row in rows
+        ]
+    }
+
+class LibraryMirror:
+    """Per-user copy of library listings in the database, kept up to date incrementally.
+
+    Listings are fetched newest first, so a sync only re-fetches until it reaches
+    an item it already has. Removals only show up in a full sync, which runs
+    every LIBRARY_FULL_SYNC_INTERVAL seconds or when a client forces a resync.
+    """
+
+    def __init__(self, sources: Dict[str, MirrorSource] = MIRROR_SOURCES):
+        self.sources = sources
+        self._syncing: Set[Tuple[str, str]] = set()
+
+    async def get_items(
+        self,
+        user: str,
+        kind: str,
+        limit: Optional[int] = None,
+        order: Optional[LibraryOrderType] = None,
+        filters: LibraryFilters = LibraryFilters()
+    ) -> Optional[Tuple[List[Dict[str, Any]], LibrarySync]]:
+        """Get mirrored items and the sync state, or None if the library has not been mirrored yet.
+
+        Args:
+            user: User key
+            kind: Part of the library, one of MIRROR_SOURCES
+            limit: Maximum number of items to return
+            order: a_to_z, z_to_a or recently_added. Default: recently_added
+            filters: Filters, and a sort order that takes precedence over `order`
+        """
+        query = select(LibraryItem.data).where(LibraryItem.user_key == user, LibraryItem.kind == kind)
+        # Lowercase both sides, as filter_items does: LIKE only ignores ASCII case on some backends
+        if filters.artist:
+            query = query.where(
+                func.lower(LibraryItem.artist).like(func.lower(_like_pattern(filters.artist)), escape="\\")
+            )
+        if filters.album:
+            query = query.where(
+                func.lower(LibraryItem.album).like(func.lower(_like_pattern(filters.album)), escape="\\")
+            )
+        if filters.min_duration is not None:
+            query = query.where(LibraryItem.duration_seconds >= filters.min_duration)
+        if filters.sort:
+            # Each sort key has an index on (user_key, kind, key). Items missing the key
+            # come last in either direction, as in filter_items
+            key = filters.sort.lstrip("-")
+            column = SORT_COLUMNS[key]
+            if key == "recently_added":
+                query = query.order_by(LibraryItem.seq if filters.sort.startswith("-") else column)
+            else:
+                query = query.order_by((column.desc() if filters.sort.startswith("-") else column.asc()).nulls_last())
+        elif order == "a_to_z":
+            query = query.order_by(func.lower(LibraryItem.title))
+        elif order == "z_to_a":
+            query = query.order_by(func.lower(LibraryItem.title).desc())
+        else:
+            query = query.order_by(LibraryItem.seq.desc())
+        if limit is not None:
+            query = query.limit(limit)
+
+        async with db_session.AsyncSessionLocal() as db:
+            state = await db.get(LibrarySync, (user, kind))
+            if state is None:
+                return None
+            rows = (await db.execute(query)).scalars().all()
+        return [json.loads(data) for data in rows], state
+
+    async def iter_pages(self, user: str, kind: str, page_size: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Mirrored items, newest first, a page at a time.
+
+        Each page is read in its own short query, keyed on the sequence number, so
+        memory use does not grow with the listing and no transaction is held open
+        between pages.
+        """
+        last_seq = None
+        while True:
+            query = select(LibraryItem.seq, LibraryItem.data).where(
+                LibraryItem.user_key == user, LibraryItem.kind == kind
+            )
+            if last_seq is not None:
+                query = query.where(LibraryItem.seq < last_seq)
+            async with db_session.AsyncSessionLocal() as db:
+                rows = (await db.execute(query.order_by(LibraryItem.seq.desc()).limit(page_size))).all()
+            if not rows:
+                return
+            yield [json.loads(row.data) for row in rows]
+            if len(rows) < page_size:
+                return
+            last_seq = rows[-1].seq
+
+    async def get_states(self, user: str, kinds: List[str]) -> Dict[str, LibrarySync]:
+        """Sync state of the given listings that have been mirrored."""
+        async with db_session.AsyncSessionLocal() as db:
+            states = (await db.execute(
+                select(LibrarySync).where(LibrarySync.user_key == user, LibrarySync.kind.in_(kinds))
+            )).scalars()
+            return {state.kind: state for state in states}
+
+    async def search(self, user: str, query: str, kinds: List[str], limit: int = 20) -> Optional[List[Dict[str, Any]]]:
+        """Full-text search over mirrored listings, best matches first.
+
+        Words match as prefixes, and matches in titles rank above artists and albums.
+        Queries matching more than LIBRARY_SEARCH_CANDIDATES items are ranked among
+        the most recently added matches only.
+
+        Returns:
+            Matching items, or None if the database has no full-text index (it is not SQLite)
+            or the query has no words
+        """
+        match = fts_query(query, user, kinds)
+        if match is None or db_session.async_engine.dialect.name != "sqlite":
+            return None
+        async with db_session.async_engine.connect() as conn:
+            rows = (await conn.execute(
+                _LOCAL_SEARCH, {"match": match, "candidates": LIBRARY_SEARCH_CANDIDATES, "limit": limit}
+            )).all()
+        return [{**json.loads(data), "resultType": RESULT_TYPES[kind]} for kind, data in rows]
+
+    async def remove(self, user: str, kind: str, item_ids: List[str]) -> None:
+        """Drop items the user has just removed upstream, without waiting for a full sync."""
+        async with db_session.AsyncSessionLocal() as db:
+            removed = list((await db.execute(
+                delete(LibraryItem).where(
+                    LibraryItem.user_key == user, LibraryItem.kind == kind, LibraryItem.item_id.in_(item_ids)
+                ).returning(LibraryItem.item_id)
+            )).scalars())
+            await db.execute(update(LibrarySync).where(
+                LibrarySync.user_key == user, LibrarySync.kind == kind
+            ).values(item_count=LibrarySync.item_count - len(removed)))
+            await record_changes(db, user, kind, removed=removed)
+            await db.commit()
+
+    async def expire(self, user: str, kind: str) -> None:
+        """Mark a listing as due for a sync, e.g. after the user has added to it."""
+        async with db_session.AsyncSessionLocal() as db:
+            await db.execute(update(LibrarySync).where(
+                LibrarySync.user_key == user, LibrarySync.kind == kind
+            ).values(synced_at=datetime(1970, 1, 1)))
+            await db.commit()
+
+    def is_stale(self, state: LibrarySync) -> bool:
+        """Check whether a mirrored listing is due for a sync."""
+        return utcnow() - state.synced_at >= timedelta(seconds=LIBRARY_SYNC_INTERVAL)
+
+    async def sync(self, ytmusic: YTMusicService, user: str, kind: str, full: bool = False) -> Optional[Tuple[List[str], List[str]]]:
+        """Bring one part of a user's mirror up to date.
+
+        Concurrent syncs of the same listing are collapsed into the one already running.
+
+        Args:
+            ytmusic: Service for the user's account
+            user: User key
+            kind: Part of the library, one of MIRROR_SOURCES
+            full: Re-fetch the whole listing so removals are picked up
+
+        Returns:
+            IDs of the items added and removed, or None if the sync was skipped or failed
+        """
+        key = (user, kind)
+        if key in self._syncing:
+            return None
+        self._syncing.add(key)
+        start = time.perf_counter()
+        try:
+            result = await self._sync(ytmusic, user, kind, full)
+        except Exception as e:
+            metrics.inc("library_sync_errors")
+            logger.error(f"Library sync of {kind} failed: {e}")
+            return None
+        finally:
+            self._syncing.discard(key)
+        added, removed = result
+        elapsed = time.perf_counter() - start
+        metrics.inc("library_sync_runs")
+        metrics.observe("library_sync_seconds", elapsed)
+        logger.info(f"Synced library {kind}: {len(added)} added, {len(removed)} removed ({elapsed * 1000:.1f} ms)")
+        return result
+
+    async def _sync(self, ytmusic: YTMusicService, user: str, kind: str, full: bool) -> Tuple[List[str], List[str]]:
+        source = self.sources[kind]
+        async with db_session.AsyncSessionLocal() as db:
+            state = await db.get(LibrarySync, (user, kind))
+            known = set((await db.execute(
+                select(LibraryItem.item_id).where(LibraryItem.user_key == user, LibraryItem.kind == kind)
+            )).scalars())
+        now = utcnow()
+        full = (
+            full
+            or not source.newest_first
+            or state is None
+            or not known
+            or now - state.full_synced_at >= timedelta(seconds=LIBRARY_FULL_SYNC_INTERVAL)
+        )
+        # Fetch outside any transaction: upstream calls can take seconds
+        if full:
+            items = await run_in_threadpool(source.fetch, ytmusic, None)
+        else:
+            items, full = await self._fetch_new(ytmusic, source, known)
+        metrics.inc("library_sync_items_fetched", len(items))
+
+        async with db_session.AsyncSessionLocal() as db:
+            added, removed = await self._apply(db, user, kind, source, items, known, full)
+            state = await db.get(LibrarySync, (user, kind))
+            if state is None:
+                # Clients start the listing over instead of replaying every item as an add
+                await record_changes(db, user, kind, reset=True)
+                state = LibrarySync(user_key=user, kind=kind, full_synced_at=now)
+                db.add(state)
+            else:
+                await record_changes(db, user, kind, added=added, removed=removed)
+            state.synced_at = now
+            if full:
+                state.full_synced_at = now
+            state.item_count = len(known) + len(added) - len(removed)
+            await db.commit()
+        if full and db_session.async_engine.dialect.name == "sqlite":
+            # Refresh planner statistics so filtered listings pick the right sort index
+            async with db_session.async_engine.begin() as conn:
+                await conn.exec_driver_sql("ANALYZE library_items")
+        return list(added), removed
+
+    async def _fetch_new(
+        self,
+        ytmusic: YTMusicService,
+        source: MirrorSource,
+        known: Set[str]
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """Fetch items added since the last sync, growing the page until a known item shows up.
+
+        Returns:
+            The new items, newest first, and whether the whole listing was fetched
+        """
+        limit = LIBRARY_SYNC_PAGE_SIZE
+        while True:
+            items = await run_in_threadpool(source.fetch, ytmusic, limit)
+            for n, item in enumerate(items):
+                if item_id(item, source.id_field) in known:
+                    return items[:n], False
+            if len(items) < limit:
+                return items, True
+            limit *= 4
+
+    async def _apply(
+        self,
+        db: AsyncSession,
+        user: str,
+        kind: str,
+        source: MirrorSource,
+        items: List[Dict[str, Any]],
+        known: Set[str],
+        full: bool
+    ) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        unique: Dict[str, Dict[str, Any]] = {}
+        for item in items:
+            unique.setdefault(item_id(item, source.id_field), item)
+        added = {i: item for i, item in unique.items() if i not in known}
+        if full:
+            removed = sorted(known - unique.keys())
+            await db.execute(delete(LibraryItem).where(LibraryItem.user_key == user, LibraryItem.kind == kind))
+            new_items = unique
+            base_seq = 0
+        else:
+            removed = []
+            new_items = added
+            base_seq = (await db.execute(
+                select(func.max(LibraryItem.seq)).where(LibraryItem.user_key == user, LibraryItem.kind == kind)
+            )).scalar() or 0
+        if new_items:
+            # Items arrive newest first; insert them oldest first so both the sequence
+            # number and the row ID grow with recency
+            await db.execute(insert(LibraryItem), [
+                {
+                    "user_key": user,
+                    "kind": kind,
+                    "item_id": i,
+                    "seq": base_seq + n + 1,
+                    "data": json.dumps(item),
+                    **item_fields(item)
+                }
+                for n, (i, item) in enumerate(reversed(list(new_items.items())))
+            ])
+        return added, removed
+
+library_mirror = LibraryMirror()
+
+async def serve_mirrored(
+    kind: str,
+    current_user: CredentialsModel,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    fetch_upstream: Callable[[YTMusicService], List[Dict[str, Any]]],
+    limit: Optional[int] = None,
+    order: Optional[LibraryOrderType] = None,
+    filters: LibraryFilters = LibraryFilters()
+) -> List[Dict[str, Any]]:
+    """Serve a library listing from the user's mirror, syncing it in the background when stale.
+
+    Until the first sync has finished the listing is fetched upstream as before, and
+    filters apply to the items that fetch returns.
+    """
+    ytmusic = YTMusicService(current_user)
+    user = user_key(current_user)
+    mirrored = await library_mirror.get_items(user, kind, limit=limit, order=order, filters=filters)
+    if mirrored is None:
+        background_tasks.add_task(library_mirror.sync, ytmusic, user, kind)
+        response.headers["X-Library-Source"] = "upstream"
+        items = await run_in_threadpool(fetch_upstream, ytmusic)
+        if filters != LibraryFilters():
+            items = filter_items(items, filters)[:limit]
+        return items
+
+    items, state = mirrored
+    if library_mirror.is_stale(state):
+        background_tasks.add_task(library_mirror.sync, ytmusic, user, kind)
+    response.headers["X-Library-Source"] = "mirror"
+    response.headers["X-Library-Synced-At"] = f"{state.synced_at.isoformat()}Z"
+    response.headers["X-Library-Age"] = str(int((utcnow() - state.synced_at).total_seconds()))
+    return items
+
+async def search_mirrored(
+    current_user: CredentialsModel,
+    background_tasks: BackgroundTasks,
+    query: str,
+    kinds: List[str],
+    limit: int = 20
+) -> Optional[List[Dict[str, Any]]]:
+    """Answer a library or uploads search from the user's mirror.
+
+    Returns:
+        Results, or None if the search has to go upstream because a listing has not
+        been mirrored or is older than LIBRARY_SEARCH_MAX_AGE. Stale listings are
+        synced in the background
+    """
+    user = user_key(current_user)
+    states = await library_mirror.get_states(user, kinds)
+    cutoff = utcnow() - timedelta(seconds=LIBRARY_SEARCH_MAX_AGE)
+    stale = [kind for kind, state in states.items() if state.synced_at <= cutoff]
+    if stale:
+        ytmusic = YTMusicService(current_user)
+        for kind in stale:
+            background_tasks.add_task(library_mirror.sync, ytmusic, user, kind)
+    if stale or len(states) < len(kinds):
+        metrics.inc("library_search_upstream")
+        return None
+    start = time.perf_counter()
+    results = await library_mirror.search(user, query, kinds, limit)
+    if results is not None:
+        metrics.observe("library_search_seconds", time.perf_counter() - start)
+    return results
+
+async def changes_mirrored(
+    current_user: CredentialsModel,
+    background_tasks: BackgroundTasks,
+    since: int = 0,
+    limit: int = 1000,
+    kinds: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """Serve the user's library change feed and sync listings that are missing or stale.
+
+    Changes found by those syncs show up on the client's next poll.
+    """
+    user = user_key(current_user)
+    kinds = kinds or FEED_KINDS
+    states = await library_mirror.get_states(user, kinds)
+    due = [kind for kind in kinds if kind not in states or library_mirror.is_stale(states[kind])]
+    if due:
+        ytmusic = YTMusicService(current_user)
+        for kind in due:
+            background_tasks.add_task(library_mirror.sync, ytmusic, user, kind)
+    return await get_changes(user, since, limit, kinds)
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import zstandard
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.services.ytmusic import YTMusicService
+
+# Empty keeps lyrics in memory only
+LYRICS_CACHE_DIR: str = os.getenv("LYRICS_CACHE_DIR", "lyrics_cache")
+LYRICS_CACHE_SIZE: int = int(os.getenv("LYRICS_CACHE_SIZE", 2000))
+LYRICS_CACHE_MAX_AGE: float = float(os.getenv("LYRICS_CACHE_MAX_AGE", 30 * 24 * 3600))
+LYRICS_CACHE_PRUNE_INTERVAL: float = float(os.getenv("LYRICS_CACHE_PRUNE_INTERVAL", 3600))
+
+# First byte of a cache file, naming the codec its payload was compressed with
+CODEC_ZSTD = b"S"
+
+def compress(data: bytes) -> bytes:
+    """Compress a cache entry with zstd, prefixed by its codec."""
+    return CODEC_ZSTD + zstandard.ZstdCompressor(level=10).compress(data)
+
+def decompress(blob: bytes) -> Optional[bytes]:
+    """Payload of a cache entry, or None if its codec is unknown and the entry counts as a miss."""
+    codec, payload = blob[:1], blob[1:]
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdDecompressor().decompress(payload)
+    return None
+
+class LyricsCache:
+    """Lyrics by browse ID: an in-memory LRU in front of compressed files on disk.
+
+    Files are written atomically, one per browse ID, so every worker on the
+    host shares them without locking and they survive restarts. Entries older
+    than LYRICS_CACHE_MAX_AGE, in memory or on disk, are fetched again; expired
+    files are deleted when read and by a sweep every LYRICS_CACHE_PRUNE_INTERVAL.
+    """
+
+    def __init__(
+        self,
+        directory: str = LYRICS_CACHE_DIR,
+        size: int = LYRICS_CACHE_SIZE,
+        max_age: float = LYRICS_CACHE_MAX_AGE,
+        prune_interval: float = LYRICS_CACHE_PRUNE_INTERVAL
+    ):
+        self.directory = directory
+        self.size = size
+        self.max_age = max_age
+        self.prune_interval = prune_interval
+        self._lock = threading.Lock()
+        # Lyrics with the time they were fetched upstream
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._pruned_at = time.time()
+
+    def path(self, browse_id: str) -> str:
+        """File holding a browse ID's lyrics, spread over subdirectories by digest."""
+        digest = hashlib.sha1(browse_id.encode()).hexdigest()
+        return os.path.join(self.directory, digest[:2], f"{digest}.lyrics")
+
+    def _remember(self, browse_id: str, lyrics: Dict[str, Any], fetched_at: float) -> None:
+        with self._lock:
+            self._entries.pop(browse_id, None)
+            self._entries[browse_id] = (lyrics, fetched_at)
+            if len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def _recall(self, browse_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(browse_id)
+            if entry is None:
+                return None
+            lyrics, fetched_at = entry
+            if time.time() - fetched_at >= self.max_age:
+                del self._entries[browse_id]
+                return None
+            self._entries.move_to_end(browse_id)
+            return lyrics
+
+    def read(self, browse_id: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Lyrics stored on disk with the time they were written, or None if absent, stale or unreadable.
+
+        Stale files are deleted.
+        """
+        if not self.directory:
+            return None
+        path = self.path(browse_id)
+        try:
+            written_at = os.path.getmtime(path)
+            if time.time() - written_at >= self.max_age:
+                os.unlink(path)
+                return None
+            with open(path, "rb") as f:
+                payload = decompress(f.read())
+            return (json.loads(payload), written_at) if payload is not None else None
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable lyrics cache file {path}: {e}")
+            return None
+
+    def write(self, browse_id: str, lyrics: Dict[str, Any]) -> None:
+        """Store lyrics on disk, replacing any earlier file in one step."""
+        if not self.directory:
+            return
+        path = self.path(browse_id)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(compress(json.dumps(lyrics, separators=(",", ":")).encode()))
+                os.replace(temp_path, path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        except OSError as e:
+            logger.warning(f"Could not write lyrics cache file {path}: {e}")
+
+    def prune(self) -> int:
+        """Delete files older than the maximum age, including temporary files left by a crash.
+
+        Returns:
+            Number of files deleted
+        """
+        if not self.directory:
+            return 0
+        cutoff = time.time() - self.max_age
+        deleted = 0
+        try:
+            subdirectories = [entry.path for entry in os.scandir(self.directory) if entry.is_dir(follow_symlinks=False)]
+        except FileNotFoundError:
+            return 0
+        for subdirectory in subdirectories:
+            try:
+                with os.scandir(subdirectory) as scan:
+                    for entry in scan:
+                        if entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                            os.unlink(entry.path)
+                            deleted += 1
+            except FileNotFoundError:
+                # Another worker pruned the same file or directory first
+                continue
+        metrics.inc("lyrics_cache_files_pruned", deleted)
+        return deleted
+
+    async def _prune_if_due(self) -> None:
+        now = time.time()
+        with self._lock:
+            if now - self._pruned_at < self.prune_interval:
+                return
+            self._pruned_at = now
+        try:
+            await run_in_threadpool(self.prune)
+        except OSError as e:
+            logger.warning(f"Could not prune lyrics cache: {e}")
+
+    async def get(self, ytmusic: YTMusicService, browse_id: str) -> Dict[str, Any]:
+        """Lyrics from memory, then disk, then upstream, filling the faster levels."""
+        lyrics = self._recall(browse_id)
+        if lyrics is not None:
+            metrics.inc("lyrics_cache_memory_hits")
+            return lyrics
+        stored = await run_in_threadpool(self.read, browse_id)
+        if stored is not None:
+            metrics.inc("lyrics_cache_disk_hits")
+            lyrics, written_at = stored
+            self._remember(browse_id, lyrics, written_at)
+            return lyrics
+        metrics.inc("lyrics_cache_misses")
+        lyrics = await run_in_threadpool(ytmusic.get_lyrics, browse_id)
+        # Songs without lyrics return nothing and are asked for again next time
+        if lyrics:
+            self._remember(browse_id, lyrics, time.time())
+            await run_in_threadpool(self.write, browse_id, lyrics)
+            await self._prune_if_due()
+        return lyrics
+
+    def clear(self) -> None:
+        """Forget the lyrics held in memory; files on disk are kept."""
+        with self._lock:
+            self._entries.clear()
+
+lyrics_cache = LyricsCache()
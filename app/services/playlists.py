@@ -0,0 +1,328 @@
+import asyncio
+import os
+import re
+import time
+import unicodedata
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Set, Tuple, Union
+from fastapi.concurrency import run_in_threadpool
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.services.ytmusic import YTMusicService
+
+PLAYLIST_CACHE_TTL: float = float(os.getenv("PLAYLIST_CACHE_TTL", 300))
+PLAYLIST_CACHE_SIZE: int = int(os.getenv("PLAYLIST_CACHE_SIZE", 1000))
+PLAYLIST_SYNC_CHUNK_SIZE: int = int(os.getenv("PLAYLIST_SYNC_CHUNK_SIZE", 100))
+
+class PlaylistEditError(Exception):
+    """An upstream playlist edit did not succeed."""
+
+    def __init__(self, message: str, added: int = 0, removed: int = 0):
+        super().__init__(message)
+        self.added = added
+        self.removed = removed
+
+class PlaylistDiff(NamedTuple):
+    """Edits that turn a playlist's tracks into a target list of video IDs."""
+    add: List[str]
+    remove: List[Dict[str, str]]  # Tracks to remove, with videoId and setVideoId
+    unchanged: int
+
+def succeeded(result: Union[str, Dict[str, Any]]) -> bool:
+    """Whether an upstream playlist edit reported success."""
+    status = result if isinstance(result, str) else result.get("status", "")
+    return "SUCCEEDED" in str(status)
+
+def chunked(items: List[Any], size: int) -> List[List[Any]]:
+    """Split items into lists of at most `size`."""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def diff_playlist(tracks: List[Dict[str, Any]], target: List[str]) -> PlaylistDiff:
+    """Minimal adds and removes that make a playlist hold the target videos.
+
+    Duplicates count: a video listed twice in the target is kept or added twice.
+    Surplus copies of a video are removed from the end of the playlist.
+
+    Args:
+        tracks: Current playlist tracks, each with videoId and setVideoId
+        target: Video IDs the playlist should contain
+    """
+    wanted = Counter(target)
+    kept: Counter = Counter()
+    remove = []
+    for track in tracks:
+        video_id = track.get("videoId")
+        if kept[video_id] < wanted[video_id]:
+            kept[video_id] += 1
+        else:
+            remove.append({"videoId": video_id, "setVideoId": track.get("setVideoId")})
+    add = []
+    for video_id in target:
+        if kept[video_id] > 0:
+            kept[video_id] -= 1
+        else:
+            add.append(video_id)
+    return PlaylistDiff(add, remove, len(target) - len(add))
+
+class PlaylistCache:
+    """Track lists of recently read or synced playlists, per user.
+
+    Entries expire after PLAYLIST_CACHE_TTL and are kept up to date by edits made
+    through this service; other playlist edits invalidate them.
+    """
+
+    def __init__(self, ttl: float = PLAYLIST_CACHE_TTL, size: int = PLAYLIST_CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self._entries: Dict[Tuple[str, str], Tuple[float, List[Dict[str, Any]]]] = {}
+        # Lock per playlist being edited, with the number of edits holding or waiting for it
+        self._locks: Dict[Tuple[str, str], Tuple[asyncio.Lock, int]] = {}
+
+    def get(self, user: str, playlist_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Cached tracks, or None if the playlist is not cached or has expired."""
+        entry = self._entries.get((user, playlist_id))
+        if entry is None or time.monotonic() - entry[0] >= self.ttl:
+            return None
+        return entry[1]
+
+    def put(self, user: str, playlist_id: str, tracks: List[Dict[str, Any]]) -> None:
+        """Cache a playlist's tracks, evicting the oldest entry when full."""
+        key = (user, playlist_id)
+        self._entries.pop(key, None)
+        if len(self._entries) >= self.size:
+            del self._entries[next(iter(self._entries))]
+        self._entries[key] = (time.monotonic(), tracks)
+
+    def invalidate(self, user: str, playlist_id: str) -> None:
+        """Forget a playlist after it was changed outside this service."""
+        self._entries.pop((user, playlist_id), None)
+
+    @asynccontextmanager
+    async def lock(self, user: str, playlist_id: str) -> AsyncIterator[None]:
+        """Serialize edits to one playlist, so diffs are not computed against stale tracks.
+
+        The lock is dropped once no edit holds or waits for it, so only playlists
+        being edited have one.
+        """
+        key = (user, playlist_id)
+        lock, users = self._locks.get(key, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._locks[key] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            held, users = self._locks.get(key, (None, 0))
+            if held is lock:  # Unless the cache was cleared meanwhile
+                if users == 1:
+                    del self._locks[key]
+                else:
+                    self._locks[key] = (lock, users - 1)
+
+    def clear(self) -> None:
+        """Forget all playlists."""
+        self._entries.clear()
+        self._locks.clear()
+
+playlist_cache = PlaylistCache()
+
+def slim_tracks(tracks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The parts of playlist tracks needed to diff and edit the playlist."""
+    return [{"videoId": track.get("videoId"), "setVideoId": track.get("setVideoId")} for track in tracks]
+
+def normalize_text(text: str) -> str:
+    """Case-, accent- and punctuation-insensitive form of a title or artist name."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    return " ".join(re.sub(r"[^\w]+", " ", text).split())
+
+def track_keys(track: Dict[str, Any], by_title: bool = False) -> List[str]:
+    """Keys under which two tracks count as duplicates: the videoId and, optionally,
+    the normalized title and artists, which also match other uploads of a song."""
+    keys = [track["videoId"]] if track.get("videoId") else []
+    if by_title and track.get("title"):
+        artists = ", ".join(sorted(normalize_text(a.get("name") or "") for a in track.get("artists") or []))
+        keys.append(f"{normalize_text(track['title'])}\x1f{artists}")
+    return keys
+
+async def fetch_tracks(ytmusic: YTMusicService, user: str, playlist_id: str) -> List[Dict[str, Any]]:
+    """All of a playlist's tracks with their metadata, refreshing the cached track list."""
+    playlist = await run_in_threadpool(ytmusic.get_playlist, playlist_id, None)
+    tracks = playlist.get("tracks") or []
+    playlist_cache.put(user, playlist_id, slim_tracks(tracks))
+    return tracks
+
+async def get_tracks(ytmusic: YTMusicService, user: str, playlist_id: str) -> List[Dict[str, Any]]:
+    """A playlist's tracks (videoId and setVideoId), from the cache when fresh."""
+    tracks = playlist_cache.get(user, playlist_id)
+    if tracks is not None:
+        metrics.inc("playlist_cache_hits")
+        return tracks
+    metrics.inc("playlist_cache_misses")
+    return slim_tracks(await fetch_tracks(ytmusic, user, playlist_id))
+
+async def apply_edits(
+    ytmusic: YTMusicService,
+    user: str,
+    playlist_id: str,
+    tracks: List[Dict[str, Any]],
+    add: List[str],
+    remove: List[Dict[str, Any]],
+    chunk_size: int = PLAYLIST_SYNC_CHUNK_SIZE
+) -> Tuple[int, int, int]:
+    """Remove and then add playlist items in chunked upstream calls, keeping the cache current.
+
+    Call with the playlist's lock held.
+
+    Args:
+        tracks: The playlist's current tracks
+        add: Video IDs to append
+        remove: Tracks to remove, with videoId and setVideoId
+
+    Returns:
+        Counts of added and removed tracks, and the upstream requests made
+
+    Raises:
+        PlaylistEditError: An upstream edit failed; counts of edits already applied are attached
+    """
+    remaining = slim_tracks(tracks)
+    added = removed = requests = 0
+    try:
+        for chunk in chunked(slim_tracks(remove), chunk_size):
+            result = await run_in_threadpool(ytmusic.remove_playlist_items, playlist_id, chunk)
+            requests += 1
+            if not succeeded(result):
+                raise PlaylistEditError(f"Removing playlist items failed: {result}", added, removed)
+            gone = {track["setVideoId"] for track in chunk}
+            remaining = [track for track in remaining if track["setVideoId"] not in gone]
+            removed += len(chunk)
+
+        # Upstream skips videos already in the playlist unless duplicates are allowed
+        present = {track["videoId"] for track in remaining}
+        duplicates = len(set(add)) < len(add) or not present.isdisjoint(add)
+        for chunk in chunked(add, chunk_size):
+            result = await run_in_threadpool(ytmusic.add_playlist_items, playlist_id, chunk, None, duplicates)
+            requests += 1
+            if not succeeded(result):
+                raise PlaylistEditError(f"Adding playlist items failed: {result}", added, removed)
+            edits = (result.get("playlistEditResults") if isinstance(result, dict) else None) or [
+                {"videoId": video_id} for video_id in chunk
+            ]
+            remaining.extend(slim_tracks(edits))
+            added += len(chunk)
+    except Exception:
+        playlist_cache.invalidate(user, playlist_id)
+        raise
+    finally:
+        metrics.inc("playlist_edit_requests", requests)
+
+    if all(track.get("setVideoId") for track in remaining):
+        playlist_cache.put(user, playlist_id, remaining)
+    else:
+        playlist_cache.invalidate(user, playlist_id)
+    return added, removed, requests
+
+async def sync_playlist(
+    ytmusic: YTMusicService,
+    user: str,
+    playlist_id: str,
+    target: List[str],
+    chunk_size: int = PLAYLIST_SYNC_CHUNK_SIZE
+) -> Dict[str, int]:
+    """Make a playlist contain exactly the target videos with as few edits as possible.
+
+    Removals are applied before additions, each in chunks of `chunk_size`. New
+    videos are appended; the order of videos already in the playlist is kept.
+
+    Returns:
+        Counts of added, removed and unchanged tracks, and the upstream edit requests made
+
+    Raises:
+        PlaylistEditError: An upstream edit failed; counts of edits already applied are attached
+    """
+    async with playlist_cache.lock(user, playlist_id):
+        tracks = await get_tracks(ytmusic, user, playlist_id)
+        diff = diff_playlist(tracks, target)
+        added, removed, requests = await apply_edits(
+            ytmusic, user, playlist_id, tracks, diff.add, diff.remove, chunk_size
+        )
+    metrics.inc("playlist_syncs")
+    logger.info(f"Synced playlist {playlist_id}: {added} added, {removed} removed in {requests} requests")
+    return {"added": added, "removed": removed, "unchanged": diff.unchanged, "requests": requests}
+
+async def dedupe_playlist(
+    ytmusic: YTMusicService,
+    user: str,
+    playlist_id: str,
+    by_title: bool = False,
+    chunk_size: int = PLAYLIST_SYNC_CHUNK_SIZE
+) -> Dict[str, int]:
+    """Remove repeated tracks from a playlist, keeping the first occurrence of each.
+
+    Args:
+        by_title: Also treat tracks with the same normalized title and artists as repeats
+
+    Returns:
+        Counts of added (always 0), removed and duplicate tracks, and the upstream edit requests made
+    """
+    async with playlist_cache.lock(user, playlist_id):
+        if by_title:
+            tracks = await fetch_tracks(ytmusic, user, playlist_id)
+        else:
+            tracks = await get_tracks(ytmusic, user, playlist_id)
+        seen: Set[str] = set()
+        remove = []
+        for track in tracks:
+            keys = track_keys(track, by_title)
+            if any(key in seen for key in keys):
+                remove.append(track)
+            seen.update(keys)
+        added, removed, requests = await apply_edits(ytmusic, user, playlist_id, tracks, [], remove, chunk_size)
+    metrics.inc("playlist_dedupes")
+    return {"added": added, "removed": removed, "duplicates": len(remove), "requests": requests}
+
+async def merge_playlists(
+    ytmusic: YTMusicService,
+    user: str,
+    playlist_id: str,
+    source_ids: List[str],
+    by_title: bool = False,
+    chunk_size: int = PLAYLIST_SYNC_CHUNK_SIZE
+) -> Dict[str, int]:
+    """Append the tracks of other playlists that a playlist does not have yet.
+
+    The target and all sources are fetched concurrently. Tracks are added in
+    source order, each only once.
+
+    Args:
+        source_ids: Playlists to merge in
+        by_title: Also treat tracks with the same normalized title and artists as the same track
+
+    Returns:
+        Counts of added and removed (always 0) tracks, source tracks skipped as
+        duplicates, and the upstream edit requests made
+    """
+    async with playlist_cache.lock(user, playlist_id):
+        fetches = [
+            fetch_tracks(ytmusic, user, playlist_id) if by_title else get_tracks(ytmusic, user, playlist_id)
+        ] + [fetch_tracks(ytmusic, user, source_id) for source_id in source_ids]
+        tracks, *sources = await asyncio.gather(*fetches)
+        seen = {key for track in tracks for key in track_keys(track, by_title)}
+        add = []
+        skipped = 0
+        for source in sources:
+            for track in source:
+                if not track.get("videoId"):
+                    continue  # Unavailable videos cannot be added
+                keys = track_keys(track, by_title)
+                if any(key in seen for key in keys):
+                    skipped += 1
+                    continue
+                add.append(track["videoId"])
+                seen.update(keys)
+        added, removed, requests = await apply_edits(ytmusic, user, playlist_id, tracks, add, [], chunk_size)
+    metrics.inc("playlist_merges")
+    logger.info(f"Merged {len(source_ids)} playlists into {playlist_id}: {added} added, {skipped} duplicates")
+    return {"added": added, "removed": removed, "duplicates": skipped, "requests": requests}
@@ -0,0 +1,240 @@
+import asyncio
+import contextlib
+import os
+import time
+import unicodedata
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from app.core.metrics import metrics
+from app.core.outbound import outbound_limiter
+from app.services.playlists import normalize_text
+from app.services.ytmusic import YTMusicService
+
+SEARCH_CACHE_TTL: float = float(os.getenv("SEARCH_CACHE_TTL", 300))
+SEARCH_CACHE_SIZE: int = int(os.getenv("SEARCH_CACHE_SIZE", 5000))
+# Results of each batch search query considered for its best match
+SEARCH_BATCH_CANDIDATES: int = int(os.getenv("SEARCH_BATCH_CANDIDATES", 5))
+
+# Scopes whose results depend on the user's own library
+USER_SCOPES = ("library", "uploads")
+
+# Filters searched together by a federated search, in the order duplicates are kept
+FEDERATED_FILTERS = ("songs", "albums", "artists", "playlists")
+
+def normalize_query(query: str) -> str:
+    """Form of a query that searches the same as the original: case and spacing do not matter."""
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+class SearchKey(NamedTuple):
+    user: Optional[str]  # Only set for library and uploads scopes
+    query: str
+    filter: Optional[str]
+    scope: Optional[str]
+    ignore_spelling: bool
+
+def search_key(user: str, query: str, filter: Optional[str], scope: Optional[str], ignore_spelling: bool) -> SearchKey:
+    """Cache key of a search; results outside the user's library are shared by all users."""
+    return SearchKey(user if scope in USER_SCOPES else None, normalize_query(query), filter, scope, ignore_spelling)
+
+class SearchCache:
+    """Time-limited LRU cache of search results.
+
+    An entry remembers the limit it was fetched with and answers any request
+    for up to that many results, or for any number once upstream returned
+    fewer than it was asked for.
+    """
+
+    def __init__(self, ttl: float = SEARCH_CACHE_TTL, size: int = SEARCH_CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self._entries: "OrderedDict[SearchKey, Tuple[float, int, List[Dict[str, Any]]]]" = OrderedDict()
+
+    def get(self, key: SearchKey, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """Up to `limit` cached results, or None if the cache cannot answer the request."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        cached_at, cached_limit, results = entry
+        if time.monotonic() - cached_at >= self.ttl:
+            del self._entries[key]
+            return None
+        if limit > cached_limit and len(results) >= cached_limit:
+            return None
+        self._entries.move_to_end(key)
+        return results if limit >= cached_limit else results[:limit]
+
+    def put(self, key: SearchKey, limit: int, results: List[Dict[str, Any]]) -> None:
+        """Cache results fetched with `limit`, unless a fresh entry already covers more."""
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl and entry[1] > limit:
+            return
+        self._entries.pop(key, None)
+        if len(self._entries) >= self.size:
+            self._entries.popitem(last=False)
+        self._entries[key] = (time.monotonic(), limit, results)
+
+    def clear(self) -> None:
+        """Forget all results."""
+        self._entries.clear()
+
+search_cache = SearchCache()
+
+async def cached_search(
+    ytmusic: YTMusicService,
+    user: str,
+    query: str,
+    filter: Optional[str] = None,
+    scope: Optional[str] = None,
+    limit: int = 20,
+    ignore_spelling: bool = False
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """Search upstream, or answer from the search cache.
+
+    Returns:
+        Results, and whether they came from the cache
+    """
+    key = search_key(user, query, filter, scope, ignore_spelling)
+    results = search_cache.get(key, limit)
+    if results is not None:
+        metrics.inc("search_cache_hits")
+        return results, True
+    metrics.inc("search_cache_misses")
+    start = time.perf_counter()
+    results = await run_in_threadpool(
+        ytmusic.search, query=query, filter=filter, scope=scope, limit=limit, ignore_spelling=ignore_spelling
+    )
+    metrics.observe("search_upstream_seconds", time.perf_counter() - start)
+    search_cache.put(key, limit, results)
+    return results, False
+
+def result_id(result: Dict[str, Any]) -> Optional[str]:
+    """Identity of a search result across filters: its videoId, or else its browseId."""
+    return result.get("videoId") or result.get("browseId")
+
+async def federated_search(
+    ytmusic: YTMusicService,
+    user: str,
+    query: str,
+    filters: List[str],
+    limit: int = 20,
+    ignore_spelling: bool = False
+) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, bool]]:
+    """Search several filters at once, each cached on its own.
+
+    An item found by more than one filter is only kept in the first of
+    `filters` that found it. Results without a videoId or browseId are kept.
+
+    Returns:
+        Results grouped by filter, and whether each filter came from the cache
+    """
+    filters = list(dict.fromkeys(filters))
+    searches = await asyncio.gather(*(
+        cached_search(ytmusic, user, query, filter=filter, limit=limit, ignore_spelling=ignore_spelling)
+        for filter in filters
+    ))
+    seen = set()
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    cached: Dict[str, bool] = {}
+    for filter, (results, from_cache) in zip(filters, searches):
+        cached[filter] = from_cache
+        grouped[filter] = []
+        for result in results:
+            identity = result_id(result)
+            if identity is not None:
+                if identity in seen:
+                    metrics.inc("federated_search_duplicates")
+                    continue
+                seen.add(identity)
+            grouped[filter].append(result)
+    return grouped, cached
+
+def _similarity(a: str, b: str) -> float:
+    return SequenceMatcher(None, a, b).ratio() if a and b else 0.0
+
+def match_confidence(query: str, result: Dict[str, Any]) -> float:
+    """How well a search result matches a query such as "artist - title", from 0 to 1.
+
+    Queries with a " - " are compared as artist and title, in either order;
+    others against the result's title with and without its artists.
+    """
+    title = normalize_text(result.get("title") or "")
+    names = [normalize_text(a.get("name") or "") for a in result.get("artists") or []]
+    artists = " ".join(names)
+
+    def artist_similarity(text: str) -> float:
+        # A query usually names the main artist only, not the featured ones
+        return max([_similarity(text, artists)] + [_similarity(text, name) for name in names])
+
+    if " - " in query:
+        first, second = (normalize_text(part) for part in query.split(" - ", 1))
+        score = max(
+            0.6 * _similarity(second, title) + 0.4 * artist_similarity(first),
+            0.6 * _similarity(first, title) + 0.4 * artist_similarity(second)
+        )
+    else:
+        query = normalize_text(query)
+        score = max(
+            _similarity(query, title),
+            _similarity(query, f"{artists} {title}"),
+            _similarity(query, f"{title} {artists}")
+        )
+    return round(score, 3)
+
+def best_match(query: str, results: List[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], float]:
+    """The playable result matching a query best, preferring the higher ranked on a tie."""
+    best, confidence = None, 0.0
+    for result in results:
+        if not result.get("videoId"):
+            continue
+        score = match_confidence(query, result)
+        if best is None or score > confidence:
+            best, confidence = result, score
+    return best, confidence
+
+async def batch_search(
+    ytmusic: YTMusicService,
+    user: str,
+    queries: List[str],
+    filter: Optional[str] = "songs",
+    ignore_spelling: bool = False
+) -> Dict[str, Any]:
+    """Resolve many queries to their best matching result.
+
+    Queries answered by the search cache are resolved at once; the others go
+    upstream concurrently under the outbound limiter. Queries that normalize
+    alike are searched once. A failing query gets an error and does not stop
+    the others.
+
+    Returns:
+        Per-query results in request order, and the number of queries matched
+    """
+    start = time.perf_counter()
+    searches: Dict[SearchKey, "asyncio.Future[Tuple[List[Dict[str, Any]], bool]]"] = {}
+
+    async def search(query: str) -> Tuple[List[Dict[str, Any]], bool]:
+        key = search_key(user, query, filter, None, ignore_spelling)
+        cached = search_cache.get(key, SEARCH_BATCH_CANDIDATES) is not None
+        async with contextlib.nullcontext() if cached else outbound_limiter.slot():
+            return await cached_search(
+                ytmusic, user, query, filter=filter, limit=SEARCH_BATCH_CANDIDATES, ignore_spelling=ignore_spelling
+            )
+
+    async def resolve(query: str) -> Dict[str, Any]:
+        key = search_key(user, query, filter, None, ignore_spelling)
+        if key not in searches:
+            searches[key] = asyncio.ensure_future(search(query))
+        try:
+            results, cached = await searches[key]
+        except Exception as e:
+            return {"query": query, "match": None, "confidence": 0.0, "cached": False, "error": str(e)}
+        match, confidence = best_match(query, results)
+        return {"query": query, "match": match, "confidence": confidence, "cached": cached, "error": None}
+
+    results = await asyncio.gather(*(resolve(query) for query in queries))
+    matched = sum(result["match"] is not None for result in results)
+    metrics.inc("search_batch_queries", len(results))
+    metrics.inc("search_batch_unmatched", len(results) - matched)
+    metrics.observe("search_batch_seconds", time.perf_counter() - start)
+    return {"results": results, "matched": matched}
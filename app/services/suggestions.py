@@ -0,0 +1,230 @@
+import bisect
+import heapq
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+from app.core.metrics import metrics
+from app.services.search import normalize_query
+
+SUGGESTION_LIMIT: int = int(os.getenv("SUGGESTION_LIMIT", 7))
+SUGGESTION_TTL: float = float(os.getenv("SUGGESTION_TTL", 3600))
+SUGGESTION_INDEX_SIZE: int = int(os.getenv("SUGGESTION_INDEX_SIZE", 100000))
+SUGGESTION_USER_INDEX_SIZE: int = int(os.getenv("SUGGESTION_USER_INDEX_SIZE", 1000))
+SUGGESTION_INDEX_USERS: int = int(os.getenv("SUGGESTION_INDEX_USERS", 10000))
+# Distinct users who must have searched a query before it is suggested to everyone
+SUGGESTION_POPULAR_USERS: int = int(os.getenv("SUGGESTION_POPULAR_USERS", 3))
+# Prefixes this short match so many texts that their top results are kept precomputed
+SHORT_PREFIX_LENGTH = 2
+
+class Suggestion:
+    """One suggestion text and how often it was seen."""
+    __slots__ = ("text", "weight", "history", "feedback_token")
+
+    def __init__(self, text: str, weight: float, history: bool = False, feedback_token: Optional[str] = None):
+        self.text = text
+        self.weight = weight
+        self.history = history
+        self.feedback_token = feedback_token
+
+    def to_dict(self, query: str) -> Dict[str, Any]:
+        """Detailed form, as upstream returns it: the completion of `query` is bold."""
+        if self.text.casefold().startswith(query.casefold()) and query:
+            runs = [{"text": self.text[:len(query)]}, {"text": self.text[len(query):], "bold": True}]
+            runs = [run for run in runs if run["text"]]
+        else:
+            runs = [{"text": self.text, "bold": True}]
+        return {
+            "text": self.text,
+            "runs": runs,
+            "fromHistory": self.history,
+            "feedbackToken": self.feedback_token
+        }
+
+def _rank(entry: Suggestion) -> Tuple[float, str]:
+    return -entry.weight, entry.text
+
+class PrefixIndex:
+    """Suggestions kept in a sorted array of normalized texts, so a prefix is a bisected range.
+
+    A range for a prefix of one or two characters can hold most of the index,
+    so the top `top_k` suggestions of every such prefix are kept up to date as
+    suggestions are added, and matching them does not scan the range.
+    """
+
+    def __init__(self, size: int, top_k: int = SUGGESTION_LIMIT):
+        self.size = size
+        self.top_k = top_k
+        self._keys: List[str] = []
+        self._entries: Dict[str, Suggestion] = {}
+        self._top: Dict[str, List[Suggestion]] = {}  # Short prefix -> its best suggestions, ranked
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def add(self, text: str, weight: float = 1.0, history: bool = False, feedback_token: Optional[str] = None) -> None:
+        """Add a suggestion, or make a known one rank higher."""
+        key = normalize_query(text)
+        if not key:
+            return
+        entry = self._entries.get(key)
+        if entry is None:
+            bisect.insort(self._keys, key)
+            entry = self._entries[key] = Suggestion(text, weight, history, feedback_token)
+            if len(self._keys) > self.size:
+                self._prune()
+                return
+        else:
+            entry.weight += weight
+            entry.history = entry.history or history
+            entry.feedback_token = feedback_token or entry.feedback_token
+        # Weights only grow, so an entry can only enter a top list when it is added to
+        for length in range(min(len(key), SHORT_PREFIX_LENGTH) + 1):
+            top = self._top.setdefault(key[:length], [])
+            if entry not in top:
+                if len(top) >= self.top_k and _rank(entry) >= _rank(top[-1]):
+                    continue
+                top.append(entry)
+            top.sort(key=_rank)
+            del top[self.top_k:]
+
+    def match(self, prefix: str, limit: int) -> List[Suggestion]:
+        """The highest ranked suggestions starting with a normalized prefix."""
+        if len(prefix) <= SHORT_PREFIX_LENGTH and limit <= self.top_k:
+            return self._top.get(prefix, [])[:limit]
+        start = bisect.bisect_left(self._keys, prefix)
+        end = bisect.bisect_left(self._keys, prefix + "\U0010ffff", start)
+        return heapq.nsmallest(
+            limit,
+            (self._entries[key] for key in self._keys[start:end]),
+            key=_rank
+        )
+
+    def _prune(self) -> None:
+        """Drop the lowest ranked tenth of the suggestions."""
+        keep = heapq.nlargest(self.size * 9 // 10, self._entries.items(), key=lambda item: item[1].weight)
+        self._entries = dict(keep)
+        self._keys = sorted(self._entries)
+        self._top = {}
+        for key, entry in self._entries.items():
+            for length in range(min(len(key), SHORT_PREFIX_LENGTH) + 1):
+                self._top.setdefault(key[:length], []).append(entry)
+        for top in self._top.values():
+            top.sort(key=_rank)
+            del top[self.top_k:]
+
+class SuggestionIndex:
+    """Local prefix index answering search suggestions without going upstream.
+
+    It learns from upstream suggestion responses and from the queries users
+    search for. Suggestions from a user's own history, and queries they searched,
+    are kept in that user's index and only suggested to them. Other upstream
+    suggestions, and queries searched by SUGGESTION_POPULAR_USERS distinct users,
+    are shared by everyone. A prefix is answered locally once upstream answered
+    it within SUGGESTION_TTL, or when the index already holds a full page of
+    suggestions for it; any other prefix goes upstream.
+    """
+
+    def __init__(
+        self,
+        limit: int = SUGGESTION_LIMIT,
+        ttl: float = SUGGESTION_TTL,
+        size: int = SUGGESTION_INDEX_SIZE,
+        user_size: int = SUGGESTION_USER_INDEX_SIZE,
+        users: int = SUGGESTION_INDEX_USERS,
+        popular_users: int = SUGGESTION_POPULAR_USERS
+    ):
+        self.limit = limit
+        self.ttl = ttl
+        self.user_size = user_size
+        self.users = users
+        self.popular_users = popular_users
+        self._global = PrefixIndex(size, limit)
+        self._personal: "OrderedDict[str, PrefixIndex]" = OrderedDict()
+        self._fetched: "OrderedDict[str, float]" = OrderedDict()  # Prefix -> when upstream answered it
+        self._searchers: "OrderedDict[str, Set[str]]" = OrderedDict()  # Query -> users, until popular
+        self._size = size
+
+    def _user_index(self, user: str, create: bool = False) -> Optional[PrefixIndex]:
+        index = self._personal.get(user)
+        if index is None and create:
+            index = self._personal[user] = PrefixIndex(self.user_size, self.limit)
+            if len(self._personal) > self.users:
+                self._personal.popitem(last=False)
+        if index is not None:
+            self._personal.move_to_end(user)
+        return index
+
+    def lookup(self, user: str, query: str) -> Optional[List[Suggestion]]:
+        """The user's suggestions for a query, or None if the query has to go upstream."""
+        prefix = normalize_query(query)
+        personal = self._user_index(user)
+        results = personal.match(prefix, self.limit) if personal is not None else []
+        seen = {normalize_query(s.text) for s in results}
+        for suggestion in self._global.match(prefix, self.limit):
+            if len(results) >= self.limit:
+                break
+            if normalize_query(suggestion.text) not in seen:
+                results.append(suggestion)
+        fetched = self._fetched.get(prefix)
+        if (fetched is not None and time.monotonic() - fetched < self.ttl) or len(results) >= self.limit:
+            metrics.inc("suggestions_local")
+            return results
+        metrics.inc("suggestions_upstream")
+        return None
+
+    def learn(self, user: str, query: str, suggestions: List[Union[str, Dict[str, Any]]]) -> None:
+        """Add an upstream response for a query to the index."""
+        prefix = normalize_query(query)
+        self._fetched.pop(prefix, None)
+        self._fetched[prefix] = time.monotonic()
+        if len(self._fetched) > self._size:
+            self._fetched.popitem(last=False)
+        count = len(suggestions)
+        for position, suggestion in enumerate(suggestions):
+            if isinstance(suggestion, str):
+                suggestion = {"text": suggestion}
+            text = suggestion.get("text")
+            if not text:
+                continue
+            # Upstream's order is kept by ranking earlier suggestions a little higher
+            weight = 1 + (count - position) / count
+            if suggestion.get("fromHistory"):
+                self._user_index(user, create=True).add(text, weight, True, suggestion.get("feedbackToken"))
+            else:
+                self._global.add(text, weight)
+
+    def record_search(self, user: str, query: str) -> None:
+        """Count a searched query towards the user's own and the popular suggestions."""
+        if not normalize_query(query):
+            return
+        self._user_index(user, create=True).add(query.strip(), history=True)
+        key = normalize_query(query)
+        searchers = self._searchers.get(key)
+        if searchers is None:
+            if key in self._global:
+                self._global.add(query.strip())
+                return
+            searchers = self._searchers[key] = set()
+            if len(self._searchers) > self._size:
+                self._searchers.popitem(last=False)
+        searchers.add(user)
+        if len(searchers) >= self.popular_users:
+            del self._searchers[key]
+            self._global.add(query.strip(), len(searchers))
+
+    def forget_user(self, user: str) -> None:
+        """Drop a user's personal suggestions, e.g. after they removed their search history."""
+        self._personal.pop(user, None)
+
+    def clear(self) -> None:
+        """Forget everything."""
+        self._global = PrefixIndex(self._size, self.limit)
+        self._personal.clear()
+        self._fetched.clear()
+        self._searchers.clear()
+
+suggestion_index = SuggestionIndex()
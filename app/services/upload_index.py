@@ -0,0 +1,162 @@
+import asyncio
+import os
+import re
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Set
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, select
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.db import session as db_session
+from app.db.crud import utcnow
+from app.db.models import UploadedFile
+from app.services.playlists import normalize_text
+from app.services.ytmusic import YTMusicService
+
+UPLOAD_INDEX_MAX_AGE: float = float(os.getenv("UPLOAD_INDEX_MAX_AGE", 3600))
+UPLOAD_INDEX_LINK_GRACE: float = float(os.getenv("UPLOAD_INDEX_LINK_GRACE", 86400))
+
+def title_key(filename: str) -> str:
+    """Normalized title an uploaded file is expected to be listed under: its name
+    without the extension and any leading track number."""
+    stem = filename.rsplit(".", 1)[0]
+    return normalize_text(re.sub(r"^\d+\s*[-_.)]?\s+", "", stem))
+
+def song_keys(song: Dict[str, Any]) -> List[str]:
+    """Title keys an uploaded song from the uploads listing can be matched by."""
+    title = song.get("title") or ""
+    artists = " ".join(a.get("name") or "" for a in song.get("artists") or [])
+    keys = [normalize_text(title)]
+    if artists:
+        keys += [normalize_text(f"{artists} {title}"), normalize_text(f"{title} {artists}")]
+    return [key for key in keys if key]
+
+def uploaded_file(entry: UploadedFile) -> Dict[str, Any]:
+    """Public view of an index entry."""
+    return {
+        "digest": entry.digest,
+        "filename": entry.filename,
+        "size": entry.size,
+        "entity_id": entry.entity_id,
+        "uploaded_at": entry.uploaded_at
+    }
+
+class UploadIndex:
+    """Per-user index of the content hashes of uploaded files.
+
+    A file whose hash is in the index is answered without sending it upstream.
+    Upstream knows nothing about hashes, so entries are reconciled with the
+    uploads listing instead: an entry is linked to the song listed under its
+    title, and dropped once that song is gone, or if no song turns up for it
+    within UPLOAD_INDEX_LINK_GRACE. Lookups rebuild a user's index first when it
+    was last reconciled more than UPLOAD_INDEX_MAX_AGE ago, so a deleted song
+    can be uploaded again.
+    """
+
+    def __init__(self, max_age: float = UPLOAD_INDEX_MAX_AGE, link_grace: float = UPLOAD_INDEX_LINK_GRACE):
+        self.max_age = max_age
+        self.link_grace = link_grace
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def lookup(self, ytmusic: YTMusicService, user: str, digest: str) -> Optional[Dict[str, Any]]:
+        """The index entry of a file the user already uploaded, or None if it is unknown."""
+        async with db_session.AsyncSessionLocal() as db:
+            entry = await db.get(UploadedFile, (user, digest))
+        if entry is None:
+            metrics.inc("upload_index_misses")
+            return None
+        if (utcnow() - entry.verified_at).total_seconds() >= self.max_age:
+            try:
+                await self.rebuild(ytmusic, user)
+            except Exception as e:
+                # Uploading again is safer than trusting an entry that could not be checked
+                logger.warning(f"Upload index rebuild failed, not deduplicating: {e}")
+                return None
+            async with db_session.AsyncSessionLocal() as db:
+                entry = await db.get(UploadedFile, (user, digest))
+            if entry is None:
+                metrics.inc("upload_index_misses")
+                return None
+        metrics.inc("upload_index_hits")
+        return uploaded_file(entry)
+
+    async def record(self, user: str, digest: str, filename: str, size: int, title: Optional[str] = None) -> None:
+        """Add a successfully uploaded file to the user's index.
+
+        Pass the file's title tag where it is known: uploads are listed under it
+        rather than under the file name.
+        """
+        now = utcnow()
+        async with db_session.AsyncSessionLocal() as db:
+            await db.merge(UploadedFile(
+                user_key=user,
+                digest=digest,
+                filename=filename,
+                size=size,
+                title_key=normalize_text(title) if title else title_key(filename),
+                entity_id=None,
+                uploaded_at=now,
+                verified_at=now
+            ))
+            await db.commit()
+
+    async def forget(self, user: str, entity_ids: List[str]) -> None:
+        """Drop the entries of deleted uploads, so their files can be uploaded again."""
+        async with db_session.AsyncSessionLocal() as db:
+            await db.execute(
+                delete(UploadedFile)
+                .where(UploadedFile.user_key == user, UploadedFile.entity_id.in_(entity_ids))
+            )
+            await db.commit()
+
+    async def rebuild(self, ytmusic: YTMusicService, user: str) -> Dict[str, int]:
+        """Reconcile the user's index with their uploads listing.
+
+        Returns:
+            Counts of entries kept, newly linked to a song and dropped
+        """
+        lock = self._locks.setdefault(user, asyncio.Lock())
+        async with lock:
+            songs = await run_in_threadpool(ytmusic.get_library_upload_songs, None)
+            async with db_session.AsyncSessionLocal() as db:
+                entries = (await db.execute(
+                    select(UploadedFile).where(UploadedFile.user_key == user)
+                )).scalars().all()
+                entity_ids = {song.get("entityId") for song in songs if song.get("entityId")}
+                taken: Set[str] = {e.entity_id for e in entries if e.entity_id in entity_ids}
+                # Songs no entry is linked to yet, by title key
+                unlinked: Dict[str, List[str]] = {}
+                for song in songs:
+                    if song.get("entityId") and song["entityId"] not in taken:
+                        for key in song_keys(song):
+                            unlinked.setdefault(key, []).append(song["entityId"])
+
+                now = utcnow()
+                grace = timedelta(seconds=self.link_grace)
+                linked = dropped = 0
+                for entry in sorted(entries, key=lambda e: e.uploaded_at):
+                    if entry.entity_id is not None and entry.entity_id not in entity_ids:
+                        await db.delete(entry)
+                        dropped += 1
+                        continue
+                    if entry.entity_id is None:
+                        candidates = [e for e in unlinked.get(entry.title_key, []) if e not in taken]
+                        if candidates:
+                            entry.entity_id = candidates[0]
+                            taken.add(candidates[0])
+                            linked += 1
+                        elif now - entry.uploaded_at >= grace:
+                            await db.delete(entry)
+                            dropped += 1
+                            continue
+                    entry.verified_at = now
+                await db.commit()
+        metrics.inc("upload_index_rebuilds")
+        logger.info(f"Upload index rebuilt: {len(entries) - dropped} entries, {linked} linked, {dropped} dropped")
+        return {"entries": len(entries) - dropped, "linked": linked, "dropped": dropped}
+
+    def clear(self) -> None:
+        """Forget all locks."""
+        self._locks.clear()
+
+upload_index = UploadIndex()
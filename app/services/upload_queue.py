@@ -0,0 +1,312 @@
+import asyncio
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select, update
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.core.security import user_key
+from app.core.tokens import token_refresher
+from app.db import session as db_session
+from app.db.crud import utcnow
+from app.db.leases import WORKER_ID, job_leases, lease, stale
+from app.db.models import UploadJob
+from app.schemas.models import CredentialsModel
+from app.services.library import library_mirror
+from app.services.upload_index import upload_index
+from app.services.uploads import SpooledUpload
+from app.services.ytmusic import YTMusicService
+
+UPLOAD_WORKERS: int = int(os.getenv("UPLOAD_WORKERS", 2))
+UPLOAD_USER_CONCURRENCY: int = int(os.getenv("UPLOAD_USER_CONCURRENCY", 1))
+UPLOAD_QUEUE_POLL_INTERVAL: float = float(os.getenv("UPLOAD_QUEUE_POLL_INTERVAL", 5))
+
+def job_status(job: UploadJob, position: Optional[int] = None) -> Dict[str, Any]:
+    """Public view of an upload job."""
+    return {
+        "id": job.id,
+        "filename": job.filename,
+        "size": job.size,
+        "status": job.status,
+        "position": position,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at
+    }
+
+class UploadQueue:
+    """Persistent queue of song uploads, worked off by a pool of background workers.
+
+    Jobs are stored in the database and their files in the spool directory, so
+    queued uploads survive restarts. Each user has at most `per_user` uploads
+    running at once. Workers only hold credentials in memory: jobs queued before a
+    restart run once their owner makes another upload request or polls a job.
+    Files already in the owner's upload index are not queued: their jobs finish
+    straight away with the status `duplicate`. Running jobs carry their worker's
+    heartbeat, and a job is only queued again once its heartbeat is stale.
+    """
+
+    def __init__(
+        self,
+        workers: int = UPLOAD_WORKERS,
+        per_user: int = UPLOAD_USER_CONCURRENCY,
+        poll_interval: float = UPLOAD_QUEUE_POLL_INTERVAL
+    ):
+        self.workers = workers
+        self.per_user = per_user
+        self.poll_interval = poll_interval
+        self._credentials: Dict[str, CredentialsModel] = {}  # user key -> credentials to upload with
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._claim_lock: Optional[asyncio.Lock] = None
+        self._tasks: List["asyncio.Task[None]"] = []
+
+    def remember(self, credentials: CredentialsModel) -> str:
+        """Keep a user's credentials so workers can run their queued jobs. Returns the user key."""
+        user = user_key(credentials)
+        self._credentials[user] = credentials
+        self._notify()
+        return user
+
+    async def enqueue(self, credentials: CredentialsModel, upload: SpooledUpload) -> Dict[str, Any]:
+        """Queue a spooled file for upload; the job owns the file from now on."""
+        user = self.remember(credentials)
+        duplicate = await upload_index.lookup(YTMusicService(credentials), user, upload.digest)
+        now = utcnow()
+        job = UploadJob(
+            id=uuid.uuid4().hex,
+            user_key=user,
+            filename=upload.filename,
+            path=upload.path,
+            size=upload.size,
+            digest=upload.digest,
+            status="duplicate" if duplicate else "queued",
+            created_at=now,
+            finished_at=now if duplicate else None
+        )
+        async with db_session.AsyncSessionLocal() as db:
+            db.add(job)
+            await db.commit()
+            position = await self._position(db, job)
+        if duplicate:
+            await run_in_threadpool(os.unlink, upload.path)
+            metrics.inc("upload_duplicates")
+            return job_status(job)
+        metrics.inc("upload_jobs_queued")
+        self._notify()
+        return job_status(job, position)
+
+    async def get(self, credentials: CredentialsModel, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status of one of the user's upload jobs, or None if there is no such job."""
+        user = self.remember(credentials)
+        async with db_session.AsyncSessionLocal() as db:
+            job = await db.get(UploadJob, job_id)
+            if job is None or job.user_key != user:
+                return None
+            return job_status(job, await self._position(db, job))
+
+    async def _position(self, db, job: UploadJob) -> Optional[int]:
+        """Number of queued jobs ahead of a queued job."""
+        if job.status != "queued":
+            return None
+        return (await db.execute(
+            select(func.count()).select_from(UploadJob)
+            .where(UploadJob.status == "queued", UploadJob.created_at < job.created_at)
+        )).scalar()
+
+    async def recover(self) -> int:
+        """Put jobs whose worker stopped sending heartbeats back in the queue.
+
+        Returns:
+            Number of jobs requeued
+        """
+        async with db_session.AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(UploadJob)
+                .where(UploadJob.status == "running", stale(UploadJob, utcnow()))
+                .values(status="queued", started_at=None, owner=None, heartbeat_at=None)
+            )
+            await db.commit()
+        return result.rowcount
+
+    async def release(self) -> int:
+        """Put the jobs this process was running back in the queue, e.g. when its workers stop.
+
+        Returns:
+            Number of jobs requeued
+        """
+        async with db_session.AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(UploadJob)
+                .where(UploadJob.status == "running", UploadJob.owner == WORKER_ID)
+                .values(status="queued", started_at=None, owner=None, heartbeat_at=None)
+            )
+            await db.commit()
+        return result.rowcount
+
+    async def claim(self) -> Optional[Tuple[UploadJob, CredentialsModel]]:
+        """Take the oldest queued job whose owner is below the per-user limit and whose credentials are known."""
+        if self._claim_lock is None:
+            self._claim_lock = asyncio.Lock()
+        async with self._claim_lock:
+            async with db_session.AsyncSessionLocal() as db:
+                running = dict((await db.execute(
+                    select(UploadJob.user_key, func.count())
+                    .where(UploadJob.status == "running")
+                    .group_by(UploadJob.user_key)
+                )).all())
+                eligible = [
+                    user for user in self._credentials if running.get(user, 0) < self.per_user
+                ]
+                if not eligible:
+                    return None
+                job = (await db.execute(
+                    select(UploadJob)
+                    .where(UploadJob.status == "queued", UploadJob.user_key.in_(eligible))
+                    .order_by(UploadJob.created_at)
+                    .limit(1)
+                )).scalar()
+                if job is None:
+                    return None
+                # Conditional update, so a worker in another process cannot take the same job
+                now = utcnow()
+                claimed = await db.execute(
+                    update(UploadJob)
+                    .where(UploadJob.id == job.id, UploadJob.status == "queued")
+                    .values(status="running", started_at=now, **lease(now))
+                )
+                await db.commit()
+                if claimed.rowcount != 1:
+                    return None
+                await db.refresh(job)
+        return job, self._credentials[job.user_key]
+
+    async def process(self, job: UploadJob, credentials: CredentialsModel) -> None:
+        """Upload a claimed job's file and record the result."""
+        metrics.observe("upload_queue_wait_seconds", (job.started_at - job.created_at).total_seconds())
+        # The background refresher may have replaced the access token since the job was queued
+        credentials = token_refresher.resolve(credentials.token) or credentials
+        start = time.perf_counter()
+        error = None
+        try:
+            if user_key(credentials) != job.user_key:
+                # Never upload into an account other than the one that queued the file
+                raise RuntimeError("Credentials do not belong to the job's owner")
+            success = await run_in_threadpool(YTMusicService(credentials).upload_song, job.path)
+            if not success:
+                error = "Failed to upload song"
+        except Exception as e:
+            error = str(e)
+        metrics.observe("upload_job_seconds", time.perf_counter() - start)
+
+        async with db_session.AsyncSessionLocal() as db:
+            await db.execute(
+                update(UploadJob).where(UploadJob.id == job.id)
+                .values(status="failed" if error else "completed", error=error, finished_at=utcnow())
+            )
+            await db.commit()
+        if not error:
+            try:
+                await upload_index.record(job.user_key, job.digest, job.filename, job.size)
+            except Exception as e:
+                logger.warning(f"Could not add upload job {job.id} to the upload index: {e}")
+        try:
+            await run_in_threadpool(os.unlink, job.path)
+        except FileNotFoundError:
+            pass
+        if error:
+            metrics.inc("upload_jobs_failed")
+            logger.warning(f"Upload job {job.id} ({job.filename}) failed: {error}")
+        else:
+            metrics.inc("upload_jobs_completed")
+            await library_mirror.expire(job.user_key, "uploads")
+        self._notify()
+
+    async def drain(self) -> int:
+        """Process claimable jobs one after another until none is left.
+
+        Returns:
+            Number of jobs processed
+        """
+        processed = 0
+        while True:
+            claimed = await self.claim()
+            if claimed is None:
+                return processed
+            await self.process(*claimed)
+            processed += 1
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                claimed = await self.claim()
+            except Exception as e:
+                logger.error(f"Upload queue error: {e}")
+                claimed = None
+            if claimed is not None:
+                try:
+                    await self.process(*claimed)
+                except Exception as e:
+                    logger.error(f"Upload job {claimed[0].id} could not be processed: {e}")
+                    await self._fail(claimed[0].id, str(e))
+                continue
+            self._wakeup.clear()
+            try:
+                # Jobs queued by other processes are only seen by polling
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fail(self, job_id: str, error: str) -> None:
+        """Mark a job that broke off as failed, so it does not stay running."""
+        metrics.inc("upload_jobs_failed")
+        try:
+            async with db_session.AsyncSessionLocal() as db:
+                await db.execute(
+                    update(UploadJob).where(UploadJob.id == job_id, UploadJob.status == "running")
+                    .values(status="failed", error=error, finished_at=utcnow())
+                )
+                await db.commit()
+        except Exception as e:
+            # Left running; its heartbeat lapses and another worker requeues it
+            logger.error(f"Upload job {job_id} could not be marked failed: {e}")
+
+    def _notify(self) -> None:
+        if self._wakeup is not None:
+            # Thread-safe, as jobs may be queued from outside the workers' event loop
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def start(self) -> None:
+        """Start the worker pool on the running event loop."""
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._claim_lock = asyncio.Lock()
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Stop the workers and requeue the jobs they were running."""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if self._tasks:
+            await self.release()
+        self._tasks = []
+        self._loop = None
+        self._wakeup = None
+        self._claim_lock = None
+
+    def clear(self) -> None:
+        """Forget all credentials."""
+        self._credentials.clear()
+
+upload_queue = UploadQueue()
+job_leases.track(UploadJob, ("running",), upload_queue.recover)
@@ -0,0 +1,239 @@
+import hashlib
+import os
+import tempfile
+import time
+from typing import Dict, List, NamedTuple, Optional
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from app.core.metrics import metrics
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+UPLOAD_MAX_BYTES: int = int(os.getenv("UPLOAD_MAX_BYTES", 300 * 1024 * 1024))
+UPLOAD_SPOOL_DIR: Optional[str] = os.getenv("UPLOAD_SPOOL_DIR") or None
+# Received data is buffered up to this size before it is written to the spool file
+UPLOAD_WRITE_BUFFER: int = int(os.getenv("UPLOAD_WRITE_BUFFER", 1024 * 1024))
+
+# File types YouTube Music accepts, by extension
+UPLOAD_EXTENSIONS: List[str] = ["mp3", "m4a", "wma", "flac", "ogg"]
+
+# Archives accepted by bulk uploads; compressed tars are named after their compression
+ARCHIVE_EXTENSIONS: List[str] = ["zip", "tar", "tgz", "gz", "bz2", "xz"]
+
+# Bytes needed to recognize a file type from its contents
+SNIFF_BYTES = 16
+
+# Block size for hashing files already on disk
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def content_hasher() -> "hashlib.blake2b":
+    """Hash used to recognize files that were uploaded before."""
+    return hashlib.blake2b(digest_size=32)
+
+def file_digest(path: str) -> str:
+    """Content hash of a file on disk, as hex. Blocking; run it in the thread pool."""
+    hasher = content_hasher()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def sniff_audio(head: bytes, extension: str) -> bool:
+    """Whether the first bytes of a file look like the audio type its extension claims."""
+    if extension == "mp3":
+        # ID3 tag, or an MPEG audio frame sync
+        return head.startswith(b"ID3") or (len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0)
+    if extension == "m4a":
+        return head[4:8] == b"ftyp"
+    if extension == "flac":
+        return head.startswith(b"fLaC")
+    if extension == "ogg":
+        return head.startswith(b"OggS")
+    if extension == "wma":
+        # ASF header object GUID
+        return head.startswith(bytes.fromhex("3026b2758e66cf11a6d900aa0062ce6c"))
+    return False
+
+def sniff_archive(head: bytes, extension: str) -> bool:
+    """Whether the first bytes of a file look like the archive type its extension claims."""
+    if extension == "zip":
+        return head.startswith(b"PK\x03\x04") or head.startswith(b"PK\x05\x06")
+    if extension in ("gz", "tgz"):
+        return head.startswith(b"\x1f\x8b")
+    if extension == "bz2":
+        return head.startswith(b"BZh")
+    if extension == "xz":
+        return head.startswith(bytes.fromhex("fd377a585a00"))
+    # Plain tar has its magic at offset 257, past the sniffed bytes; tarfile checks it when reading
+    return extension == "tar"
+
+class SpooledUpload(NamedTuple):
+    """An uploaded file written to a temporary file; delete `path` when done."""
+    path: str
+    filename: str
+    size: int
+    digest: str  # Content hash, see `content_hasher`
+
+class _UploadReceiver:
+    """Multipart parser callbacks that spool the `file` part to disk as it arrives.
+
+    Parsing is driven from the event loop; disk writes are batched and run in the
+    thread pool. Problems are recorded in `error` rather than raised, because the
+    parser calls back from inside `write`.
+    """
+
+    def __init__(self, max_bytes: int, archive: bool = False):
+        self.max_bytes = max_bytes
+        self.extensions = ARCHIVE_EXTENSIONS if archive else UPLOAD_EXTENSIONS
+        self.sniff = sniff_archive if archive else sniff_audio
+        self.kind = "archive" if archive else "audio"
+        self.error: Optional[HTTPException] = None
+        self.file = None
+        self.filename = ""
+        self.extension = ""
+        self.size = 0
+        self.head = b""
+        self.hasher = content_hasher()
+        self.pending: List[bytes] = []
+        self.pending_size = 0
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        self._in_file = False
+        self._done = False
+
+    def reject(self, status_code: int, detail: str) -> None:
+        if self.error is None:
+            self.error = HTTPException(status_code=status_code, detail=detail)
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition"))
+        self._in_file = options.get(b"name") == b"file" and not self._done
+        if not self._in_file:
+            return
+        self.filename = os.path.basename(options.get(b"filename", b"").decode("utf-8", "replace"))
+        self.extension = self.filename.rsplit(".", 1)[-1].lower() if "." in self.filename else ""
+        if self.extension not in self.extensions:
+            self.reject(
+                status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                f"Unsupported file type, expected one of: {', '.join(self.extensions)}"
+            )
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if not self._in_file or self.error is not None:
+            return
+        chunk = data[start:end]
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            self.reject(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, f"File is larger than {self.max_bytes} bytes")
+            return
+        if len(self.head) < SNIFF_BYTES:
+            self.head += chunk[:SNIFF_BYTES - len(self.head)]
+            if len(self.head) == SNIFF_BYTES and not self.sniff(self.head, self.extension):
+                self.reject(status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, f"File contents are not {self.extension} {self.kind}")
+                return
+        # Hashed as it arrives, so the digest is ready when the last byte is
+        self.hasher.update(chunk)
+        self.pending.append(chunk)
+        self.pending_size += len(chunk)
+
+    def on_part_end(self) -> None:
+        if self._in_file:
+            self._in_file = False
+            self._done = True
+
+    async def flush(self) -> None:
+        """Write buffered data to the spool file."""
+        if not self.pending:
+            return
+        data = b"".join(self.pending)
+        self.pending.clear()
+        self.pending_size = 0
+        if self.file is None:
+            self.file = await run_in_threadpool(
+                tempfile.NamedTemporaryFile, suffix=f".{self.extension}", dir=UPLOAD_SPOOL_DIR, delete=False
+            )
+        await run_in_threadpool(self.file.write, data)
+
+async def spool_upload(request: Request, max_bytes: Optional[int] = None, archive: bool = False) -> SpooledUpload:
+    """Stream a multipart/form-data request's `file` part into a temporary file.
+
+    Memory use is bounded by UPLOAD_WRITE_BUFFER, and the file's content hash is
+    computed on the way through. The request is rejected as
+    soon as the file turns out to be too large, to have an unsupported extension,
+    or to have contents that do not match it.
+
+    Raises:
+        HTTPException: 400 for malformed requests, 413 for files over `max_bytes`
+            (default: UPLOAD_MAX_BYTES), 415 for files that are not a supported audio
+            type, or with `archive`, a supported archive type
+    """
+    max_bytes = UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    content_type, params = parse_options_header(request.headers.get("content-type"))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a multipart/form-data upload")
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + 64 * 1024:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File is larger than {max_bytes} bytes"
+        )
+
+    receiver = _UploadReceiver(max_bytes, archive)
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": receiver.on_part_begin,
+        "on_header_field": receiver.on_header_field,
+        "on_header_value": receiver.on_header_value,
+        "on_header_end": receiver.on_header_end,
+        "on_headers_finished": receiver.on_headers_finished,
+        "on_part_data": receiver.on_part_data,
+        "on_part_end": receiver.on_part_end,
+    })
+    start = time.perf_counter()
+    try:
+        async for chunk in request.stream():
+            try:
+                parser.write(chunk)
+            except Exception as e:
+                receiver.reject(status.HTTP_400_BAD_REQUEST, f"Malformed multipart upload: {e}")
+            if receiver.error is not None:
+                raise receiver.error
+            if receiver.pending_size >= UPLOAD_WRITE_BUFFER:
+                await receiver.flush()
+        parser.finalize()
+        if not receiver.filename:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No file part named 'file' in the upload")
+        if len(receiver.head) < SNIFF_BYTES and not receiver.sniff(receiver.head, receiver.extension):
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail=f"File contents are not {receiver.extension} {receiver.kind}"
+            )
+        await receiver.flush()
+        if receiver.file is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Uploaded file is empty")
+        await run_in_threadpool(receiver.file.close)
+    except BaseException:
+        metrics.inc("uploads_rejected")
+        if receiver.file is not None:
+            await run_in_threadpool(receiver.file.close)
+            await run_in_threadpool(os.unlink, receiver.file.name)
+        raise
+    metrics.inc("upload_bytes_received", receiver.size)
+    metrics.observe("upload_receive_seconds", time.perf_counter() - start)
+    return SpooledUpload(receiver.file.name, receiver.filename, receiver.size, receiver.hasher.hexdigest())
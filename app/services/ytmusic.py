@@ -1,16 +1,24 @@
 import json
+import threading
 from ytmusicapi import YTMusic
 from typing import Dict, Any, Optional, List, cast, Union, Sequence, Tuple, Literal
 from app.schemas.models import CredentialsModel
+from app.core.tokens import token_refresher
 
 # Define order types
 LibraryOrderType = Literal["a_to_z", "z_to_a", "recently_added"]
 ArtistOrderType = Literal["Recency", "Popularity", "Alphabetical order"]
 
+class UpstreamCancelled(Exception):
+    """An upstream call was abandoned because its result is no longer wanted."""
+
 class YTMusicService:
     def __init__(self, credentials: CredentialsModel):
         """Initialize YTMusic service with credentials."""
         self.credentials = credentials
+        # Set to abandon calls in flight: no further upstream requests are sent,
+        # and responses already on their way are dropped before they are parsed
+        self.cancel_event = threading.Event()
         self.client = self._create_client()
 
     def _create_client(self) -> YTMusic:
@@ -18,7 +26,30 @@ class YTMusicService:
         headers = {
             "authorization": f"Bearer {self.credentials.token}"
         }
-        return YTMusic(auth=headers)
+        client = YTMusic(auth=headers)
+        send_request = client._send_request
+
+        def cancellable_send_request(*args: Any, **kwargs: Any) -> Dict[str, Any]:
+            if self.cancel_event.is_set():
+                raise UpstreamCancelled()
+            response = send_request(*args, **kwargs)
+            if self.cancel_event.is_set():
+                raise UpstreamCancelled()
+            return response
+
+        client._send_request = cancellable_send_request
+        return client
+
+    def sync_credentials(self) -> None:
+        """Swap to the latest access token if the background refresher has renewed it.
+
+        The client is replaced in a single assignment, so calls already in flight
+        finish with the previous token while new calls use the fresh one.
+        """
+        latest = token_refresher.resolve(self.credentials.token)
+        if latest is not None and latest.token != self.credentials.token:
+            self.credentials = latest
+            self.client = self._create_client()
 
     def search(
         self,
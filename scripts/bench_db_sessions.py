@@ -0,0 +1,65 @@
+"""Measure concurrent session lookups through the async database layer."""
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.db import crud
+from app.db.models import Base, Credentials, Session
+from app.db.session import create_async_db_engine
+
+SESSIONS = 10_000
+LOOKUPS = 5_000
+CONCURRENCY = (1, 10, 50)
+
+async def seed(session_factory) -> None:
+    """Insert one set of credentials and SESSIONS sessions."""
+    async with session_factory() as db:
+        db.add(Credentials(token="t", token_uri="u", client_id="c", client_secret="s"))
+        await db.flush()
+        expires_at = crud.utcnow() + timedelta(hours=1)
+        await db.execute(insert(Session), [
+            {"user_id": 1, "session_token": f"session-{i}", "expires_at": expires_at}
+            for i in range(SESSIONS)
+        ])
+        await db.commit()
+
+async def run_lookups(session_factory, concurrency: int) -> None:
+    """Look up random sessions from `concurrency` concurrent tasks and print stats."""
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def lookup() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            async with session_factory() as db:
+                await crud.get_session_by_token(db, f"session-{random.randrange(SESSIONS)}")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(lookup() for _ in range(LOOKUPS)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(
+        f"concurrency {concurrency:3d}: {LOOKUPS / elapsed:8.0f} lookups/s, "
+        f"p50 {statistics.median(latencies) * 1000:6.2f} ms, "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:6.2f} ms"
+    )
+
+async def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_db_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        await seed(session_factory)
+        for concurrency in CONCURRENCY:
+            await run_lookups(session_factory, concurrency)
+        await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
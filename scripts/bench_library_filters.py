@@ -0,0 +1,47 @@
+"""Measure filtered and sorted listings over a large mirrored library."""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from unittest.mock import MagicMock
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.db import session as db_session
+from app.db.session import create_async_db_engine, schema_fingerprint, _upgrade_schema
+from app.services.library import LibraryFilters, LibraryMirror, MirrorSource
+from bench_library_search import make_library
+
+SONGS = 50_000
+RUNS = 50
+CASES = {
+    "newest 25": LibraryFilters(),
+    "sort title, 25": LibraryFilters(sort="title"),
+    "sort -duration, 25": LibraryFilters(sort="-duration"),
+    "artist filter, 25": LibraryFilters(artist="Artist 12"),
+    "album filter, sort artist": LibraryFilters(album="river", sort="artist"),
+    "min_duration, sort album": LibraryFilters(min_duration=500, sort="album"),
+}
+
+async def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_db_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        async with engine.begin() as conn:
+            await conn.run_sync(_upgrade_schema, schema_fingerprint())
+        db_session.async_engine = engine
+        db_session.AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+
+        songs = make_library(SONGS)
+        mirror = LibraryMirror({"songs": MirrorSource(lambda yt, limit: songs, "videoId")})
+        await mirror.sync(MagicMock(), "user", "songs")
+
+        for name, filters in CASES.items():
+            latencies = []
+            for _ in range(RUNS):
+                start = time.perf_counter()
+                items, _ = await mirror.get_items("user", "songs", limit=25, filters=filters)
+                latencies.append(time.perf_counter() - start)
+            print(f"{name:28s}: p50 {statistics.median(latencies) * 1000:6.2f} ms, max {max(latencies) * 1000:6.2f} ms")
+        await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
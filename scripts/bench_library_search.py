@@ -0,0 +1,65 @@
+"""Measure full-text search over a large mirrored library."""
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from unittest.mock import MagicMock
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.db import session as db_session
+from app.db.session import create_async_db_engine, schema_fingerprint, _upgrade_schema
+from app.services.library import LibraryMirror, MirrorSource
+
+SONGS = 50_000
+SEARCHES = 1_000
+WORDS = ["love", "night", "blue", "summer", "dance", "heart", "river", "fire", "dream", "city",
+         "gold", "rain", "moon", "wild", "home", "light", "road", "sky", "sea", "stone"]
+
+def make_library(count: int):
+    """Songs with random titles, artists and albums, newest first."""
+    rng = random.Random(0)
+    return [
+        {
+            "videoId": f"video{i}",
+            "title": " ".join(rng.sample(WORDS, 3)).title(),
+            "artists": [{"name": f"Artist {rng.randrange(2000)}"}],
+            "album": {"name": f"{rng.choice(WORDS).title()} Album {rng.randrange(5000)}"},
+            "duration_seconds": rng.randrange(60, 600)
+        }
+        for i in range(count)
+    ]
+
+async def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_db_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        async with engine.begin() as conn:
+            await conn.run_sync(_upgrade_schema, schema_fingerprint())
+        db_session.async_engine = engine
+        db_session.AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+
+        songs = make_library(SONGS)
+        mirror = LibraryMirror({"songs": MirrorSource(lambda yt, limit: songs, "videoId")})
+        start = time.perf_counter()
+        await mirror.sync(MagicMock(), "user", "songs")
+        print(f"mirrored {SONGS} songs in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        rng = random.Random(1)
+        queries = [
+            " ".join(word[:rng.randrange(2, len(word) + 1)] for word in rng.sample(WORDS, rng.randrange(1, 3)))
+            for _ in range(SEARCHES)
+        ]
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            await mirror.search("user", query, ["songs"], limit=20)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print(
+            f"{SEARCHES} searches: p50 {statistics.median(latencies) * 1000:.2f} ms, "
+            f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms"
+        )
+        await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
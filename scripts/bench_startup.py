@@ -0,0 +1,53 @@
+"""Measure database startup time for a fresh and an up-to-date schema.
+
+Also starts several worker processes at once against the same database to
+check that only one of them takes the migration path.
+"""
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+WORKERS = 8
+
+def start_worker(database_url: str, lock_file: str, results) -> None:
+    """Import the database layer the way a worker does and run the startup check."""
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["SCHEMA_LOCK_FILE"] = lock_file
+    from app.db.session import init_db
+    start = time.perf_counter()
+    migrated = asyncio.run(init_db())
+    results.put((migrated, time.perf_counter() - start))
+
+def run_workers(database_url: str, lock_file: str, count: int):
+    """Start `count` workers at once and collect (migrated, seconds) from each."""
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=start_worker, args=(database_url, lock_file, results))
+        for _ in range(count)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return outcomes
+
+def report(label: str, outcomes) -> None:
+    migrated = sum(1 for did_migrate, _ in outcomes if did_migrate)
+    slowest = max(seconds for _, seconds in outcomes) * 1000
+    fastest = min(seconds for _, seconds in outcomes) * 1000
+    print(f"{label}: {len(outcomes)} workers, {migrated} migrated, {fastest:.1f}-{slowest:.1f} ms")
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'startup.db')}"
+        lock_file = os.path.join(tmp, "schema.lock")
+        report("fresh database   ", run_workers(database_url, lock_file, WORKERS))
+        report("current schema   ", run_workers(database_url, lock_file, WORKERS))
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.getcwd())
+    main()
@@ -8,7 +8,9 @@ from app.main import app
 from app.db.session import get_db
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import StaticPool, NullPool
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from app.db.models import Base, Credentials as DBCredentials, Session as DBSession
 from datetime import datetime, timedelta, timezone
 import uuid
@@ -38,7 +40,26 @@ def test_db():
         Base.metadata.drop_all(bind=engine)
 
 @pytest.fixture(autouse=True)
-def mock_env_vars(monkeypatch):
+def async_test_db(tmp_path, monkeypatch):
+    """Point the async session factory at a fresh SQLite file for the test"""
+    import app.db.session as db_session
+    db_path = tmp_path / "test.db"
+    sync_engine = create_engine(f"sqlite:///{db_path}")
+    with sync_engine.begin() as conn:
+        db_session._upgrade_schema(conn, db_session.schema_fingerprint())
+    sync_engine.dispose()
+
+    # NullPool so connections are never shared between the event loops tests run on
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+    event.listen(engine.sync_engine, "connect", db_session.set_sqlite_pragmas)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
+    monkeypatch.setattr(db_session, "async_engine", engine)
+    monkeypatch.setattr(db_session, "AsyncSessionLocal", session_factory)
+    monkeypatch.setattr(db_session, "SCHEMA_LOCK_FILE", str(tmp_path / "schema.lock"))
+    return session_factory
+
+@pytest.fixture(autouse=True)
+def mock_env_vars(monkeypatch, tmp_path):
     """Mock environment variables."""
     test_env = {
         # Required OAuth variables
@@ -51,7 +72,8 @@ def mock_env_vars(monkeypatch):
         "RATE_LIMIT_MAX_REQUESTS": "50",
         "RATE_LIMIT_WINDOW": "60",
         "BRUTE_FORCE_MAX_ATTEMPTS": "5",
-        "BRUTE_FORCE_WINDOW": "300"
+        "BRUTE_FORCE_WINDOW": "300",
+        "TOKEN_REVOCATION_FILE": str(tmp_path / "revoked_tokens.txt")
     }
     
     # Use monkeypatch to ensure environment variables are properly overridden
@@ -62,6 +84,35 @@ def mock_env_vars(monkeypatch):
     import app.core.security
     reload(app.core.security)
 
+    # Forget server-side credentials registered by previous tests
+    from app.core.tokens import token_refresher
+    token_refresher.clear()
+
+    # Forget playlists cached by previous tests
+    from app.services.playlists import playlist_cache
+    playlist_cache.clear()
+
+    # Forget credentials the upload queue kept from previous tests
+    from app.services.upload_queue import upload_queue
+    upload_queue.clear()
+
+    # Forget search results cached by previous tests
+    from app.services.search import search_cache
+    search_cache.clear()
+
+    # Forget suggestions learned by previous tests
+    from app.services.suggestions import suggestion_index
+    suggestion_index.clear()
+
+    # Keep lyrics cached by each test in memory and on disk to itself
+    from app.services.lyrics import lyrics_cache
+    lyrics_cache.clear()
+    monkeypatch.setattr(lyrics_cache, "directory", str(tmp_path / "lyrics_cache"))
+
+    # Forget upload index locks bound to previous tests' event loops
+    from app.services.upload_index import upload_index
+    upload_index.clear()
+
 @pytest.fixture
 def test_client(test_db):
     """Create a test client"""
@@ -86,7 +137,8 @@ def test_credentials():
         token_uri="https://oauth2.googleapis.com/token",
         client_id="test_client_id",
         client_secret="test_client_secret",
-        scopes=["https://www.googleapis.com/auth/youtube"]
+        scopes=["https://www.googleapis.com/auth/youtube"],
+        account_id="test_account_id"
     )
 
 @pytest.fixture
@@ -141,6 +193,7 @@ def mock_security(test_credentials):
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
         return {
             "sub": test_credentials.client_id,
+            "account_id": test_credentials.account_id,
             "scopes": test_credentials.scopes,
             "refresh_token": test_credentials.refresh_token,
             "client_secret": test_credentials.client_secret,
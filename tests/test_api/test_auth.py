@@ -3,6 +3,8 @@ from fastapi import HTTPException
 from app.core.security import get_oauth_credentials
 from app.schemas.models import CredentialsModel
 import os
+import json
+import asyncio
 from unittest.mock import patch
 
 @pytest.fixture
@@ -252,3 +254,83 @@ def test_rate_limit_login(test_client):
         )
         assert response.status_code == 307
         assert response.headers["location"].startswith("https://accounts.google.com/o/oauth2/v2/auth")
+
+def test_client_config_reloaded_only_on_change(tmp_path, monkeypatch):
+    """Test client secrets are parsed once and re-read when the file changes"""
+    import app.core.security as security
+    secrets_file = tmp_path / "client_secrets.json"
+    secrets_file.write_text(json.dumps({"web": {"client_id": "first"}}))
+    monkeypatch.setattr(security, "CLIENT_SECRETS_FILE", str(secrets_file))
+
+    with patch("app.core.security.json.load", wraps=json.load) as mock_load:
+        first = security.load_client_config()
+        second = security.load_client_config()
+        assert first is second
+        assert mock_load.call_count == 1
+
+        secrets_file.write_text(json.dumps({"web": {"client_id": "second"}}))
+        mtime = secrets_file.stat().st_mtime_ns
+        os.utime(secrets_file, ns=(mtime, mtime + 1_000_000_000))
+        third = security.load_client_config()
+        assert third["web"]["client_id"] == "second"
+        assert mock_load.call_count == 2
+
+def test_get_client_config_skips_disk_within_interval(tmp_path, monkeypatch):
+    """Test cached client secrets are served without touching the disk"""
+    import app.core.security as security
+    secrets_file = tmp_path / "client_secrets.json"
+    secrets_file.write_text(json.dumps({"web": {"client_id": "cached"}}))
+    monkeypatch.setattr(security, "CLIENT_SECRETS_FILE", str(secrets_file))
+
+    config = asyncio.run(security.get_client_config())
+    with patch("app.core.security.os.stat") as mock_stat:
+        assert asyncio.run(security.get_client_config()) is config
+        mock_stat.assert_not_called()
+
+def test_oauth_flow_reused_until_config_changes():
+    """Test Flow objects are reused per redirect URI and rebuilt on config change"""
+    import app.core.security as security
+    config = {"web": {
+        "client_id": "id",
+        "client_secret": "secret",
+        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+        "token_uri": "https://oauth2.googleapis.com/token"
+    }}
+    flow = security.get_oauth_flow(config, "http://localhost/callback")
+    assert security.get_oauth_flow(config, "http://localhost/callback") is flow
+    assert security.get_oauth_flow(config, "http://localhost/docs") is not flow
+    assert security.get_oauth_flow(dict(config), "http://localhost/callback") is not flow
+
+def test_different_tokens_get_different_user_keys():
+    """Test server-side data of two accounts is never keyed alike"""
+    from app.core import security
+    accounts = {"ya29.alice-token": "alice-sub", "ya29.bob-token": "bob-sub"}
+
+    def tokeninfo(token):
+        return {
+            "aud": security.GOOGLE_CLIENT_ID,
+            "sub": accounts[token],
+            "scope": "https://www.googleapis.com/auth/youtube openid",
+            "expires_in": "3600"
+        }
+
+    async def keys():
+        return [
+            security.user_key(await security.get_current_user(None, token))
+            for token in ("ya29.alice-token", "ya29.bob-token", "ya29.alice-token")
+        ]
+
+    with patch("app.core.security._fetch_token_info", side_effect=tokeninfo) as mock_fetch:
+        alice, bob, alice_again = asyncio.run(keys())
+    assert alice != bob
+    assert alice == alice_again
+    assert mock_fetch.call_count == 2
+
+def test_token_without_account_rejected():
+    """Test tokens that do not name their account are not authenticated"""
+    from app.core import security
+    tokeninfo = {"aud": security.GOOGLE_CLIENT_ID, "scope": "https://www.googleapis.com/auth/youtube"}
+    with patch("app.core.security._fetch_token_info", return_value=tokeninfo):
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(security.get_current_user(None, "ya29.anonymous-token"))
+    assert exc.value.status_code == 401
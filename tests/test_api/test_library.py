@@ -141,3 +141,91 @@ def test_delete_upload_entity(authenticated_client):
         response = authenticated_client.delete("/api/v1/library/uploads/test_entity_id")
         assert response.status_code == 200
         assert response.json()["message"] == "Entity deleted successfully" 
+
+def test_library_served_from_mirror_after_sync(authenticated_client):
+    """Test library songs come from the mirror, with freshness headers, once synced"""
+    mock_data = [{"videoId": "v1", "title": "Test Song"}]
+    with patch("app.services.ytmusic.YTMusicService.get_library_songs", return_value=mock_data) as mock_get:
+        first = authenticated_client.get("/api/v1/library/songs")
+        assert first.headers["X-Library-Source"] == "upstream"
+
+        second = authenticated_client.get("/api/v1/library/songs")
+        assert second.status_code == 200
+        assert second.json()["results"] == mock_data
+        assert second.headers["X-Library-Source"] == "mirror"
+        assert "X-Library-Synced-At" in second.headers
+        assert int(second.headers["X-Library-Age"]) >= 0
+        # The upstream request and the background sync, but nothing for the mirrored response
+        assert mock_get.call_count == 2
+
+def test_force_library_sync(authenticated_client):
+    """Test clients can force a full resync of selected listings"""
+    with patch("app.services.library.LibraryMirror.sync") as mock_sync:
+        response = authenticated_client.post("/api/v1/library/sync", json={"kinds": ["songs", "liked"]})
+        assert response.status_code == 202
+        assert [c.args[2:] for c in mock_sync.call_args_list] == [("songs", True), ("liked", True)]
+
+    response = authenticated_client.post("/api/v1/library/sync", json={"kinds": ["unknown"]})
+    assert response.status_code == 400
+
+def test_library_filter_and_sort(authenticated_client):
+    """Test library listings accept filter and sort parameters"""
+    mock_data = [
+        {"videoId": "v1", "title": "B Song", "artists": [{"name": "Artist One"}], "duration_seconds": 100},
+        {"videoId": "v2", "title": "A Song", "artists": [{"name": "Artist Two"}], "duration_seconds": 300},
+        {"videoId": "v3", "title": "C Song", "artists": [{"name": "Artist Two"}], "duration_seconds": 200},
+    ]
+    with patch("app.services.ytmusic.YTMusicService.get_library_songs", return_value=mock_data):
+        for _ in range(2):  # Once upstream, once from the mirror
+            response = authenticated_client.get("/api/v1/library/songs?artist=two&min_duration=150&sort=title")
+            assert response.status_code == 200
+            assert [item["videoId"] for item in response.json()["results"]] == ["v2", "v3"]
+        assert response.headers["X-Library-Source"] == "mirror"
+
+    response = authenticated_client.get("/api/v1/library/songs?sort=unknown")
+    assert response.status_code == 422
+
+def test_library_changes(authenticated_client):
+    """Test the change feed syncs its listings and returns changes since a version"""
+    with patch("app.services.library.LibraryMirror.sync") as mock_sync:
+        response = authenticated_client.get("/api/v1/library/changes?since=0")
+        assert response.status_code == 200
+        assert response.json() == {"version": 0, "reset": False, "has_more": False, "changes": []}
+        assert [c.args[2] for c in mock_sync.call_args_list] == ["songs", "playlists", "liked", "subscriptions"]
+
+    response = authenticated_client.get("/api/v1/library/changes?kinds=albums")
+    assert response.status_code == 400
+
+def test_export_library(authenticated_client):
+    """Test an unmirrored listing is synced in the background, then streamed as CSV"""
+    mock_data = [{"videoId": f"v{n}", "title": f"Song {n}", "artists": [{"name": "Artist"}]} for n in range(3)]
+    with patch("app.services.ytmusic.YTMusicService.get_library_songs", return_value=mock_data):
+        response = authenticated_client.get("/api/v1/library/export?kind=songs&format=csv")
+        assert response.status_code == 202
+        assert response.headers["retry-after"] == "5"
+        response = authenticated_client.get("/api/v1/library/export?kind=songs&format=csv")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert response.text.splitlines() == [
+            "id,title,artist,album,duration_seconds",
+            "v0,Song 0,Artist,,",
+            "v1,Song 1,Artist,,",
+            "v2,Song 2,Artist,,",
+        ]
+
+    response = authenticated_client.get("/api/v1/library/export?kind=unknown")
+    assert response.status_code == 400
+
+def test_export_library_during_sync(authenticated_client, test_credentials):
+    """Test an export while the listing is already being synced asks the client to retry"""
+    from app.core.security import user_key
+    from app.services.library import library_mirror
+    key = (user_key(test_credentials), "songs")
+    library_mirror._syncing.add(key)
+    try:
+        with patch("app.services.ytmusic.YTMusicService.get_library_songs") as mock_songs:
+            response = authenticated_client.get("/api/v1/library/export?kind=songs")
+        assert response.status_code == 202
+        mock_songs.assert_not_called()
+    finally:
+        library_mirror._syncing.discard(key)
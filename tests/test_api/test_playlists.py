@@ -11,6 +11,17 @@ def test_get_playlist(authenticated_client):
         assert response.status_code == 200
         assert response.json()["playlist"] == mock_data
 
+def test_get_whole_playlist_fills_cache(authenticated_client, test_credentials):
+    """Test limit=0 fetches every track and caches the track list for later edits"""
+    from app.core.security import user_key
+    from app.services.playlists import playlist_cache
+    mock_data = {"title": "Test Playlist", "tracks": [{"videoId": "v1", "setVideoId": "s1", "title": "Song"}]}
+    with patch("app.services.ytmusic.YTMusicService.get_playlist", return_value=mock_data) as mock_get:
+        response = authenticated_client.get("/api/v1/playlists/PL1?limit=0")
+    assert response.status_code == 200
+    assert mock_get.call_args.kwargs["limit"] is None
+    assert playlist_cache.get(user_key(test_credentials), "PL1") == [{"videoId": "v1", "setVideoId": "s1"}]
+
 def test_create_playlist(authenticated_client):
     """Test create playlist endpoint"""
     mock_data = "test_playlist_id"
@@ -126,3 +137,78 @@ def test_delete_playlist(authenticated_client):
         response = authenticated_client.delete("/api/v1/playlists/test_playlist_id")
         assert response.status_code == 200
         assert response.json()["message"] == mock_data 
+
+def test_set_playlist_items(authenticated_client):
+    """Test replacing a playlist's items applies only the difference"""
+    mock_playlist = {"tracks": [{"videoId": "v1", "setVideoId": "s1"}, {"videoId": "v2", "setVideoId": "s2"}]}
+    with patch("app.services.ytmusic.YTMusicService.get_playlist", return_value=mock_playlist), \
+         patch("app.services.ytmusic.YTMusicService.remove_playlist_items", return_value="STATUS_SUCCEEDED") as mock_remove, \
+         patch("app.services.ytmusic.YTMusicService.add_playlist_items", return_value={"status": "STATUS_SUCCEEDED"}) as mock_add:
+        response = authenticated_client.put(
+            "/api/v1/playlists/test_playlist_id/items",
+            json={"video_ids": ["v2", "v3"]}
+        )
+        assert response.status_code == 200
+        assert response.json() == {"added": 1, "removed": 1, "unchanged": 1, "requests": 2}
+        assert mock_remove.call_args.args[1] == [{"videoId": "v1", "setVideoId": "s1"}]
+        assert mock_add.call_args.args[1] == ["v3"]
+
+    with patch("app.services.ytmusic.YTMusicService.get_playlist", return_value=mock_playlist), \
+         patch("app.services.ytmusic.YTMusicService.remove_playlist_items", return_value="STATUS_FAILED"):
+        response = authenticated_client.put("/api/v1/playlists/other_playlist_id/items", json={"video_ids": []})
+        assert response.status_code == 502
+
+def test_import_playlist_items(authenticated_client):
+    """Test a bulk import runs as a job whose progress can be polled"""
+    with patch("app.services.ytmusic.YTMusicService.add_playlist_items", return_value={"status": "STATUS_SUCCEEDED"}):
+        response = authenticated_client.post(
+            "/api/v1/playlists/test_playlist_id/imports",
+            json={"video_ids": [f"video_{n}" for n in range(250)]}
+        )
+        assert response.status_code == 202
+        job = response.json()
+        assert job["status"] == "pending" and job["total"] == 250
+
+    response = authenticated_client.get(f"/api/v1/playlists/imports/{job['id']}")
+    assert response.status_code == 200
+    assert response.json()["status"] == "completed"
+    assert response.json()["chunks_done"] == 3
+
+    assert authenticated_client.get("/api/v1/playlists/imports/unknown").status_code == 404
+
+def test_dedupe_and_merge_playlists(authenticated_client):
+    """Test dedupe removes repeated tracks and merge appends tracks from other playlists"""
+    mock_playlist = {"tracks": [
+        {"videoId": "v1", "setVideoId": "s1", "title": "Song"},
+        {"videoId": "v2", "setVideoId": "s2", "title": "song!"},
+    ]}
+    with patch("app.services.ytmusic.YTMusicService.get_playlist", return_value=mock_playlist), \
+         patch("app.services.ytmusic.YTMusicService.remove_playlist_items", return_value="STATUS_SUCCEEDED") as mock_remove:
+        response = authenticated_client.post("/api/v1/playlists/test_playlist_id/dedupe", json={"by_title": True})
+        assert response.status_code == 200
+        assert response.json()["removed"] == 1
+        assert mock_remove.call_args.args[1] == [{"videoId": "v2", "setVideoId": "s2"}]
+
+    source = {"tracks": [{"videoId": "v3", "setVideoId": "s3"}, {"videoId": "v1", "setVideoId": "s4"}]}
+    playlists = {"target_playlist_id": mock_playlist, "source_playlist_id": source}
+    with patch("app.services.ytmusic.YTMusicService.get_playlist", side_effect=lambda playlist_id, limit: playlists[playlist_id]), \
+         patch("app.services.ytmusic.YTMusicService.add_playlist_items", return_value={"status": "STATUS_SUCCEEDED"}) as mock_add:
+        response = authenticated_client.post(
+            "/api/v1/playlists/target_playlist_id/merge",
+            json={"source_playlist_ids": ["source_playlist_id"]}
+        )
+        assert response.status_code == 200
+        assert response.json() == {"added": 1, "removed": 0, "duplicates": 1, "requests": 1}
+        assert mock_add.call_args.args[1] == ["v3"]
+
+def test_export_playlist(authenticated_client):
+    """Test a playlist is streamed as M3U"""
+    mock_playlist = {"tracks": [{"videoId": "v1", "title": "Song", "artists": [{"name": "Artist"}], "duration_seconds": 60}]}
+    with patch("app.services.ytmusic.YTMusicService.get_playlist", return_value=mock_playlist):
+        response = authenticated_client.get("/api/v1/playlists/test_playlist_id/export?format=m3u")
+        assert response.status_code == 200
+        assert response.text.splitlines() == [
+            "#EXTM3U",
+            "#EXTINF:60,Artist - Song",
+            "https://music.youtube.com/watch?v=v1",
+        ]
@@ -1,5 +1,7 @@
+import asyncio
 from unittest.mock import patch
 from app.api.v1.endpoints.search import SearchFilter, SearchScope
+from app.services.ytmusic import YTMusicService
 
 def test_search(authenticated_client):
     """Test search endpoint"""
@@ -64,3 +66,108 @@ def test_remove_search_suggestions_failure(authenticated_client):
         response = authenticated_client.post("/api/v1/search/suggestions/remove")
         assert response.status_code == 200
         assert response.json()["message"] == "Failed to remove search suggestions" 
+
+def test_library_search_served_from_mirror(authenticated_client, test_credentials):
+    """Test library searches are answered locally when the mirror is fresh"""
+    from app.core.security import user_key
+    from app.services.library import library_mirror
+    songs = [{"videoId": "v1", "title": "Test Song"}]
+    with patch("app.services.ytmusic.YTMusicService.get_library_songs", return_value=songs):
+        asyncio.run(library_mirror.sync(YTMusicService(test_credentials), user_key(test_credentials), "songs"))
+
+    with patch("app.services.ytmusic.YTMusicService.search") as mock_search:
+        response = authenticated_client.get("/api/v1/search?query=tes&filter=songs&scope=library")
+        assert response.status_code == 200
+        assert response.headers["X-Library-Source"] == "mirror"
+        assert response.json()["results"] == [{"videoId": "v1", "title": "Test Song", "resultType": "song"}]
+        mock_search.assert_not_called()
+
+def test_library_search_falls_back_when_stale(authenticated_client, test_credentials):
+    """Test stale mirrors send searches upstream and are synced in the background"""
+    from app.core.security import user_key
+    from app.services.library import library_mirror
+    user = user_key(test_credentials)
+    with patch("app.services.ytmusic.YTMusicService.get_library_upload_songs", return_value=[]):
+        asyncio.run(library_mirror.sync(YTMusicService(test_credentials), user, "uploads"))
+    asyncio.run(library_mirror.expire(user, "uploads"))
+
+    mock_data = [{"title": "Test Upload"}]
+    with patch("app.services.ytmusic.YTMusicService.search", return_value=mock_data), \
+         patch("app.services.library.LibraryMirror.sync") as mock_sync:
+        response = authenticated_client.get("/api/v1/search?query=test&scope=uploads")
+        assert response.json()["results"] == mock_data
+        assert "X-Library-Source" not in response.headers
+        assert [c.args[2] for c in mock_sync.call_args_list] == ["uploads"]
+
+def test_search_cached(authenticated_client):
+    """Test repeated searches are served from the search cache"""
+    mock_data = [{"title": "Test Song"}]
+    with patch("app.services.ytmusic.YTMusicService.search", return_value=mock_data) as mock_search:
+        first = authenticated_client.get("/api/v1/search?query=Test%20Song&filter=songs")
+        second = authenticated_client.get("/api/v1/search?query=test%20%20song&filter=songs&limit=10")
+        other = authenticated_client.get("/api/v1/search?query=test%20song&filter=albums")
+    assert first.headers["X-Search-Cache"] == "miss"
+    assert second.headers["X-Search-Cache"] == "hit"
+    assert second.json()["results"] == mock_data
+    assert other.headers["X-Search-Cache"] == "miss"
+    assert mock_search.call_count == 2
+
+def test_search_suggestions_answered_locally(authenticated_client):
+    """Test a prefix answered upstream once is then answered from the local index"""
+    mock_data = [
+        {"text": "test song", "runs": [{"text": "test"}, {"text": " song", "bold": True}], "fromHistory": False}
+    ]
+    with patch("app.services.ytmusic.YTMusicService.get_search_suggestions", return_value=mock_data) as mock_get:
+        first = authenticated_client.get("/api/v1/search/suggestions?query=test")
+        second = authenticated_client.get("/api/v1/search/suggestions?query=TEST")
+        detailed = authenticated_client.get("/api/v1/search/suggestions?query=test&detailed_runs=true")
+    assert first.json()["suggestions"] == ["test song"]
+    assert "X-Suggestions-Source" not in first.headers
+    assert second.headers["X-Suggestions-Source"] == "local"
+    assert second.json()["suggestions"] == ["test song"]
+    assert detailed.json()["suggestions"][0]["runs"] == [{"text": "test"}, {"text": " song", "bold": True}]
+    mock_get.assert_called_once()
+
+def test_federated_search(authenticated_client):
+    """Test federated search groups results by filter and caches each filter"""
+    def search(query, filter, **kwargs):
+        return [{"browseId": f"{filter}-1"}, {"videoId": "shared"}]
+
+    with patch("app.services.ytmusic.YTMusicService.search", side_effect=search) as mock_search:
+        authenticated_client.get("/api/v1/search?query=test&filter=albums")
+        response = authenticated_client.get("/api/v1/search/federated?query=test&filters=songs&filters=albums")
+    assert response.status_code == 200
+    assert response.json()["results"] == {
+        "songs": [{"browseId": "songs-1"}, {"videoId": "shared"}],
+        "albums": [{"browseId": "albums-1"}],
+    }
+    assert response.headers["X-Search-Cache"] == "songs=miss, albums=hit"
+    assert mock_search.call_count == 2
+
+def test_federated_search_default_filters(authenticated_client):
+    """Test federated search covers songs, albums, artists and playlists by default"""
+    with patch("app.services.ytmusic.YTMusicService.search", return_value=[]):
+        response = authenticated_client.get("/api/v1/search/federated?query=test")
+    assert response.status_code == 200
+    assert list(response.json()["results"]) == ["songs", "albums", "artists", "playlists"]
+
+def test_search_batch(authenticated_client):
+    """Test batch search returns the best match and a confidence for each query"""
+    mock_data = [
+        {"videoId": "v2", "title": "Lucky", "artists": [{"name": "Britney Spears"}]},
+        {"videoId": "v1", "title": "Get Lucky", "artists": [{"name": "Daft Punk"}]},
+    ]
+    with patch("app.services.ytmusic.YTMusicService.search", return_value=mock_data):
+        response = authenticated_client.post(
+            "/api/v1/search/batch", json={"queries": ["Daft Punk - Get Lucky", "Britney Spears - Lucky"]}
+        )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["matched"] == 2
+    assert [result["match"]["videoId"] for result in data["results"]] == ["v1", "v2"]
+    assert all(result["confidence"] > 0.8 for result in data["results"])
+
+def test_search_batch_requires_queries(authenticated_client):
+    """Test an empty batch is rejected"""
+    response = authenticated_client.post("/api/v1/search/batch", json={"queries": []})
+    assert response.status_code == 422
@@ -1,3 +1,4 @@
+import os
 from unittest.mock import patch
 
 def test_get_library_upload_songs(authenticated_client):
@@ -53,3 +54,164 @@ def test_delete_upload_entity(authenticated_client):
         response = authenticated_client.delete("/api/v1/uploads/entities/test_entity_id")
         assert response.status_code == 200
         assert response.json()["message"] == "Upload entity deleted successfully" 
+
+def test_upload_song_file(authenticated_client):
+    """Test a multipart upload is spooled to a temporary file that is removed afterwards"""
+    received = {}
+
+    def upload(path):
+        with open(path, "rb") as f:
+            received["data"] = f.read()
+        received["path"] = path
+        return True
+
+    data = b"fLaC" + b"\0" * 100_000
+    with patch("app.services.ytmusic.YTMusicService.upload_song", side_effect=upload):
+        response = authenticated_client.post(
+            "/api/v1/uploads/songs/file",
+            files={"file": ("song.flac", data, "audio/flac")}
+        )
+        assert response.status_code == 200
+        assert response.json()["message"] == "Song uploaded successfully"
+    assert received["data"] == data
+    assert received["path"].endswith(".flac")
+    assert not os.path.exists(received["path"])
+
+def test_upload_song_file_duplicate(authenticated_client):
+    """Test a file uploaded before is answered from the upload index without uploading it again"""
+    data = b"ID3" + b"\0" * 1000
+    with patch("app.services.ytmusic.YTMusicService.upload_song", return_value=True) as mock_upload:
+        first = authenticated_client.post("/api/v1/uploads/songs/file", files={"file": ("song.mp3", data)})
+        second = authenticated_client.post("/api/v1/uploads/songs/file", files={"file": ("copy.mp3", data)})
+    assert first.json()["message"] == "Song uploaded successfully"
+    assert second.status_code == 200
+    assert second.json()["message"] == "Song already uploaded"
+    mock_upload.assert_called_once()
+
+def test_rebuild_upload_index(authenticated_client):
+    """Test the upload index is linked to the uploads listing on request"""
+    with patch("app.services.ytmusic.YTMusicService.upload_song", return_value=True):
+        authenticated_client.post("/api/v1/uploads/songs/file", files={"file": ("01 Song.mp3", b"ID3" + b"\0" * 100)})
+    songs = [{"entityId": "e1", "title": "Song", "artists": [{"name": "Artist"}]}]
+    with patch("app.services.ytmusic.YTMusicService.get_library_upload_songs", return_value=songs):
+        response = authenticated_client.post("/api/v1/uploads/index/rebuild")
+    assert response.status_code == 200
+    assert response.json() == {"entries": 1, "linked": 1, "dropped": 0}
+
+    with patch("app.services.ytmusic.YTMusicService.get_library_upload_songs", side_effect=Exception("boom")):
+        assert authenticated_client.post("/api/v1/uploads/index/rebuild").status_code == 502
+
+def test_upload_song_file_rejected(authenticated_client, monkeypatch):
+    """Test uploads with unsupported types, mismatched contents or too many bytes are rejected"""
+    import app.services.uploads as uploads_service
+    with patch("app.services.ytmusic.YTMusicService.upload_song", return_value=True) as mock_upload:
+        response = authenticated_client.post("/api/v1/uploads/songs/file", files={"file": ("notes.txt", b"hello")})
+        assert response.status_code == 415
+        response = authenticated_client.post(
+            "/api/v1/uploads/songs/file", files={"file": ("song.mp3", b"<html>" + b"\0" * 100)}
+        )
+        assert response.status_code == 415
+
+        monkeypatch.setattr(uploads_service, "UPLOAD_MAX_BYTES", 1000)
+        response = authenticated_client.post(
+            "/api/v1/uploads/songs/file", files={"file": ("song.ogg", b"OggS" + b"\0" * 5000)}
+        )
+        assert response.status_code == 413
+        response = authenticated_client.post("/api/v1/uploads/songs/file", json={"filepath": "song.mp3"})
+        assert response.status_code == 400
+        mock_upload.assert_not_called()
+
+def test_queue_song_upload(authenticated_client):
+    """Test a queued upload returns a job whose result can be polled once a worker ran it"""
+    import time
+    with patch("app.services.ytmusic.YTMusicService.upload_song", return_value=True) as mock_upload:
+        response = authenticated_client.post(
+            "/api/v1/uploads/jobs",
+            files={"file": ("song.mp3", b"ID3" + b"\0" * 1000, "audio/mpeg")}
+        )
+        assert response.status_code == 202
+        job = response.json()
+        assert job["status"] in ("queued", "running", "completed") and job["size"] == 1003
+
+        # The app's worker pool runs the job in the background
+        for _ in range(100):
+            response = authenticated_client.get(f"/api/v1/uploads/jobs/{job['id']}")
+            if response.json()["status"] == "completed":
+                break
+            time.sleep(0.02)
+        assert response.status_code == 200
+        assert response.json()["status"] == "completed"
+        mock_upload.assert_called_once()
+
+    assert authenticated_client.get("/api/v1/uploads/jobs/unknown").status_code == 404
+
+def test_bulk_upload_directory(authenticated_client, tmp_path, monkeypatch):
+    """Test a directory is uploaded as a background job whose results can be polled"""
+    import app.services.bulk_uploads as bulk_service
+    music = tmp_path / "music"
+    (music / "album").mkdir(parents=True)
+    (music / "album" / "song.mp3").write_bytes(b"ID3" + b"\0" * 100)
+    (music / "notes.txt").write_bytes(b"not music")
+    assert authenticated_client.post("/api/v1/uploads/bulk", json={"directory": str(music)}).status_code == 403
+    monkeypatch.setattr(bulk_service, "UPLOAD_BULK_ROOT", str(tmp_path))
+    with patch("app.services.ytmusic.YTMusicService.upload_song", return_value=True) as mock_upload:
+        response = authenticated_client.post("/api/v1/uploads/bulk", json={"directory": str(music)})
+        assert response.status_code == 202
+        job_id = response.json()["id"]
+        response = authenticated_client.get(f"/api/v1/uploads/bulk/{job_id}")
+    assert response.status_code == 200
+    job = response.json()
+    assert job["status"] == "completed" and job["total"] == 1 and job["uploaded"] == 1
+    assert job["files"][0]["name"] == os.path.join("album", "song.mp3")
+    mock_upload.assert_called_once()
+    assert authenticated_client.get(f"/api/v1/uploads/bulk/{job_id}?file_status=failed").json()["files"] == []
+
+    assert authenticated_client.post("/api/v1/uploads/bulk", json={"directory": str(tmp_path / "missing")}).status_code == 400
+    assert authenticated_client.post("/api/v1/uploads/bulk", json={"directory": "/"}).status_code == 403
+    monkeypatch.setattr(bulk_service, "UPLOAD_BULK_ROOT", str(music))
+    assert authenticated_client.post("/api/v1/uploads/bulk", json={"directory": str(tmp_path)}).status_code == 403
+    assert authenticated_client.get("/api/v1/uploads/bulk/unknown").status_code == 404
+
+def test_bulk_upload_archive(authenticated_client):
+    """Test an uploaded zip archive is accepted and other files are rejected"""
+    import io
+    import zipfile
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("one.mp3", b"ID3one")
+        archive.writestr("two.ogg", b"OggStwo")
+    with patch("app.services.ytmusic.YTMusicService.upload_song", return_value=True) as mock_upload:
+        response = authenticated_client.post(
+            "/api/v1/uploads/bulk/archive", files={"file": ("music.zip", buffer.getvalue())}
+        )
+        assert response.status_code == 202
+        job = authenticated_client.get(f"/api/v1/uploads/bulk/{response.json()['id']}").json()
+        assert job["source"] == "music.zip" and job["uploaded"] == 2
+        assert mock_upload.call_count == 2
+
+        response = authenticated_client.post("/api/v1/uploads/bulk/archive", files={"file": ("music.zip", b"junk" * 10)})
+        assert response.status_code == 415
+
+def test_delete_upload_entities(authenticated_client):
+    """Test entities are deleted in bulk with one result per ID"""
+    def delete(entity_id):
+        if entity_id == "boom":
+            raise Exception("upstream error")
+        return entity_id != "missing"
+
+    with patch("app.services.ytmusic.YTMusicService.delete_upload_entity", side_effect=delete) as mock_delete, \
+            patch("app.services.library.LibraryMirror.remove") as mock_remove:
+        response = authenticated_client.post(
+            "/api/v1/uploads/entities/delete", json={"entity_ids": ["e1", "missing", "e2", "boom", "e1"]}
+        )
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["deleted"], data["failed"]) == (2, 2)
+    assert [r["entity_id"] for r in data["results"]] == ["e1", "missing", "e2", "boom"]
+    assert data["results"][1]["error"] == "Entity missing not found or could not be deleted"
+    assert data["results"][3] == {"entity_id": "boom", "deleted": False, "error": "upstream error"}
+    assert mock_delete.call_count == 4
+    mock_remove.assert_called_once()
+    assert sorted(mock_remove.call_args[0][2]) == ["e1", "e2"]
+
+    assert authenticated_client.post("/api/v1/uploads/entities/delete", json={"entity_ids": []}).status_code == 422
@@ -27,3 +27,13 @@ def test_get_lyrics(authenticated_client):
         response = authenticated_client.get("/api/v1/watch/lyrics/test_browse_id")
         assert response.status_code == 200
         assert response.json()["lyrics"] == mock_data 
+
+
+def test_get_lyrics_cached(authenticated_client):
+    """Test repeated lyrics requests are served without going upstream"""
+    mock_data = {"lyrics": "Test lyrics"}
+    with patch("app.services.ytmusic.YTMusicService.get_lyrics", return_value=mock_data) as mock_get:
+        first = authenticated_client.get("/api/v1/watch/lyrics/test_browse_id")
+        second = authenticated_client.get("/api/v1/watch/lyrics/test_browse_id")
+    assert first.json()["lyrics"] == second.json()["lyrics"] == mock_data
+    mock_get.assert_called_once()
@@ -0,0 +1,50 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+from app.core.cancellation import cancel_on_disconnect
+from app.core.metrics import metrics
+
+class FakeRequest:
+    """Request whose client disconnects after a number of polls"""
+
+    def __init__(self, polls_until_disconnect: int):
+        self.polls = polls_until_disconnect
+        self.url = type("URL", (), {"path": "/api/v1/search"})()
+
+    async def is_disconnected(self) -> bool:
+        self.polls -= 1
+        return self.polls < 0
+
+def test_result_returned_while_connected():
+    """Test the result of the work is returned when the client stays"""
+    async def work():
+        await asyncio.sleep(0.01)
+        return "results"
+
+    before = metrics.snapshot()["counters"].get("upstream_calls_cancelled", 0)
+    assert asyncio.run(cancel_on_disconnect(FakeRequest(1000), work(), poll_interval=0.001)) == "results"
+    assert metrics.snapshot()["counters"].get("upstream_calls_cancelled", 0) == before
+
+def test_work_cancelled_on_disconnect():
+    """Test work is cancelled, the event set and the cancellation counted when the client leaves"""
+    event = threading.Event()
+    cancelled = []
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    before = metrics.snapshot()["counters"].get("upstream_calls_cancelled", 0)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(cancel_on_disconnect(FakeRequest(2), work(), event, poll_interval=0.001))
+    assert exc.value.status_code == 499
+    assert event.is_set()
+    assert cancelled == [True]
+    counters = metrics.snapshot()["counters"]
+    assert counters["upstream_calls_cancelled"] == before + 1
+    assert counters["upstream_calls_watched"] >= counters["upstream_calls_cancelled"]
+    assert "upstream_cancel_ratio" not in metrics.snapshot()["gauges"]
@@ -0,0 +1,61 @@
+import time
+from app.core.revocation import BloomFilter, RevocationStore, token_key
+
+def test_bloom_filter_membership():
+    """Test added keys are always found and unrelated keys mostly are not"""
+    bloom = BloomFilter(size=1 << 16)
+    keys = [token_key(f"token-{i}") for i in range(100)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    misses = sum(token_key(f"other-{i}") in bloom for i in range(1000))
+    assert misses < 10
+
+def test_revoke_and_check():
+    """Test revoked tokens are reported until they expire"""
+    store = RevocationStore()
+    assert not store.is_revoked("token")
+    store.revoke("token", time.time() + 60)
+    store.revoke("expired", time.time() - 1)
+    assert store.is_revoked("token")
+    assert not store.is_revoked("expired")
+    assert not store.is_revoked("other")
+
+def test_revocations_survive_restart(tmp_path):
+    """Test revocations are persisted as digests and reloaded"""
+    path = str(tmp_path / "revoked.txt")
+    RevocationStore(path).revoke("secret_token", time.time() + 60)
+    assert "secret_token" not in open(path).read()
+    assert RevocationStore(path).is_revoked("secret_token")
+
+def test_sync_picks_up_other_workers(tmp_path):
+    """Test revocations written by another store instance are picked up on sync"""
+    path = str(tmp_path / "revoked.txt")
+    worker_a, worker_b = RevocationStore(path), RevocationStore(path)
+    worker_a.revoke("token", time.time() + 60)
+    assert not worker_b.is_revoked("token")
+    worker_b.sync()
+    assert worker_b.is_revoked("token")
+
+def test_prune_compacts_expired_entries(tmp_path):
+    """Test pruning drops expired revocations from memory and disk"""
+    path = str(tmp_path / "revoked.txt")
+    store = RevocationStore(path)
+    now = time.time()
+    store.revoke("short_lived", now + 10)
+    store.revoke("long_lived", now + 1000)
+    assert store.prune(now + 100) == 1
+    assert len(store) == 1
+    assert len(open(path).read().splitlines()) == 1
+    assert store.is_revoked("long_lived")
+    assert len(RevocationStore(path)) == 1
+
+def test_logout_revokes_token(test_client):
+    """Test a logged-out token can no longer be used"""
+    headers = {"Authorization": "Bearer test_token", "User-Agent": "Test Client"}
+    assert test_client.get("/api/v1/auth/me", headers=headers).status_code == 200
+    assert test_client.post("/api/v1/auth/logout", headers=headers).status_code == 200
+
+    response = test_client.get("/api/v1/auth/me", headers=headers)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token has been revoked"
@@ -0,0 +1,114 @@
+import asyncio
+import time
+from app.core.tokens import TokenRefresher, token_refresher
+from app.schemas.models import CredentialsModel
+
+def make_credentials(token: str, expires_in=None) -> CredentialsModel:
+    return CredentialsModel(
+        token=token,
+        refresh_token="test_refresh_token",
+        token_uri="https://oauth2.googleapis.com/token",
+        client_id="test_client_id",
+        client_secret="test_client_secret",
+        scopes=["https://www.googleapis.com/auth/youtube"],
+        expires_in=expires_in,
+        account_id="test_account_id"
+    )
+
+def test_concurrent_refreshes_share_one_call():
+    """Test concurrent refreshes of the same refresh token collapse into one"""
+    calls = []
+
+    async def refresh_func(credentials):
+        calls.append(credentials.token)
+        await asyncio.sleep(0.01)
+        return make_credentials("new_token", expires_in=3600)
+
+    refresher = TokenRefresher(refresh_func=refresh_func)
+
+    async def run():
+        return await asyncio.gather(*(refresher.refresh(make_credentials("old_token")) for _ in range(10)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert {r.token for r in results} == {"new_token"}
+
+def test_refresh_due_swaps_expiring_tokens():
+    """Test the background pass renews tokens close to expiry"""
+    async def refresh_func(credentials):
+        return make_credentials("fresh_token", expires_in=3600)
+
+    refresher = TokenRefresher(refresh_func=refresh_func, leeway=300)
+    refresher.register(make_credentials("stale_token"), expires_at=time.time() + 60)
+
+    asyncio.run(refresher.refresh_due())
+    assert refresher.resolve("stale_token").token == "fresh_token"
+    assert refresher.resolve("fresh_token").token == "fresh_token"
+
+def test_refresh_due_leaves_fresh_tokens():
+    """Test tokens far from expiry are not refreshed"""
+    calls = []
+
+    async def refresh_func(credentials):
+        calls.append(credentials.token)
+        return credentials
+
+    refresher = TokenRefresher(refresh_func=refresh_func, leeway=300)
+    refresher.register(make_credentials("valid_token"), expires_at=time.time() + 3000)
+
+    asyncio.run(refresher.refresh_due())
+    assert calls == []
+
+def test_current_user_uses_refreshed_token(test_client):
+    """Test requests with a replaced access token get the refreshed one"""
+    token_refresher.register(make_credentials("test_token"), expires_at=time.time() + 60)
+    token_refresher.register(make_credentials("refreshed_token"), expires_at=time.time() + 3600)
+
+    response = test_client.get(
+        "/api/v1/auth/me",
+        headers={"Authorization": "Bearer test_token", "User-Agent": "Test Client"}
+    )
+    assert response.status_code == 200
+    assert response.json()["token"] == "refreshed_token"
+
+def test_client_token_resolves_after_it_expires():
+    """Test the token a client logged in with keeps resolving once the refresher has replaced it"""
+    async def refresh_func(credentials):
+        return make_credentials(f"token_{time.time()}", expires_in=3600)
+
+    refresher = TokenRefresher(refresh_func=refresh_func, leeway=300)
+    refresher.register(make_credentials("login_token"), expires_at=time.time() - 1)
+
+    async def run():
+        first = (await refresher.refresh(make_credentials("login_token"))).token
+        refresher._expires_at["test_refresh_token"] = time.time() - 1
+        await refresher.refresh_due()
+        return first
+
+    first = asyncio.run(run())
+    latest = refresher.resolve("login_token")
+    assert latest is not None and latest.token != "login_token"
+    # Tokens only the refresher saw are dropped once replaced and expired
+    refresher._alias_expires_at[first] = time.time() - 1
+    refresher._prune(time.time())
+    assert refresher.resolve(first) is None
+    assert refresher.resolve("login_token").token == latest.token
+
+def test_login_shared_with_other_workers():
+    """Test a login is stored so another worker resolves it, until the client logs out"""
+    async def refresh_func(credentials):
+        return make_credentials("refreshed_token", expires_in=3600)
+
+    worker, other_worker = TokenRefresher(refresh_func=refresh_func), TokenRefresher()
+
+    async def run():
+        await worker.login(make_credentials("login_token"), time.time() + 60)
+        await worker.refresh(make_credentials("login_token"))
+        restored = await other_worker.restore("login_token")
+        await worker.logout("login_token")
+        return restored, await TokenRefresher().restore("login_token")
+
+    restored, after_logout = asyncio.run(run())
+    assert restored.token == "refreshed_token" and restored.account_id == "test_account_id"
+    assert other_worker.resolve("login_token").token == "refreshed_token"
+    assert after_logout is None
@@ -0,0 +1,55 @@
+import asyncio
+from datetime import timedelta
+from sqlalchemy import func, select
+from app.core.metrics import metrics
+from app.db import crud
+from app.db.models import Credentials, Session
+from app.db.reaper import SessionReaper
+
+def test_reaper_deletes_expired_sessions_in_batches(async_test_db, test_credentials):
+    """Test expired sessions are deleted batch by batch and live ones are kept"""
+    async def run():
+        async with async_test_db() as db:
+            stored = await crud.save_credentials(db, test_credentials)
+            for i in range(7):
+                await crud.create_session(db, stored.id, f"expired_{i}", timedelta(hours=-1))
+            await crud.create_session(db, stored.id, "live", timedelta(hours=1))
+        deleted = await SessionReaper(batch_size=3, pause=0).reap()
+        async with async_test_db() as db:
+            tokens = (await db.execute(select(Session.session_token))).scalars().all()
+            credentials = (await db.execute(select(func.count(Credentials.id)))).scalar()
+        return deleted, tokens, credentials
+
+    metrics.clear()
+    deleted, tokens, credentials = asyncio.run(run())
+    assert deleted == 7
+    assert tokens == ["live"]
+    assert credentials == 1
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"]["session_reaper_sessions_deleted"] == 7
+    # 3 + 3 + 1: the short batch ends the pass
+    assert snapshot["summaries"]["session_reaper_lock_wait_seconds"]["count"] == 3
+    assert snapshot["gauges"]["session_reaper_rows_per_second"] > 0
+
+def test_reaper_deletes_orphaned_credentials(async_test_db, test_credentials):
+    """Test credentials are deleted once their last session has been reaped"""
+    async def run():
+        async with async_test_db() as db:
+            stored = await crud.save_credentials(db, test_credentials)
+            await crud.create_session(db, stored.id, "expired", timedelta(hours=-1))
+        await SessionReaper(pause=0).reap()
+        async with async_test_db() as db:
+            return await crud.get_credentials(db, stored.id)
+
+    metrics.clear()
+    assert asyncio.run(run()) is None
+    assert metrics.snapshot()["counters"]["session_reaper_credentials_deleted"] == 1
+
+def test_metrics_endpoint(test_client, authenticated_client):
+    """Test the metrics endpoint exposes the current values to authenticated clients only"""
+    metrics.clear()
+    metrics.inc("session_reaper_runs")
+    assert test_client.get("/api/v1/metrics").status_code == 401
+    response = authenticated_client.get("/api/v1/metrics")
+    assert response.status_code == 200
+    assert response.json()["counters"] == {"session_reaper_runs": 1}
@@ -0,0 +1,129 @@
+import asyncio
+from datetime import timedelta
+from unittest.mock import patch
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from app.db import crud
+from app.db.session import create_async_db_engine, engine, set_sqlite_pragmas, to_async_url, is_memory_sqlite
+
+def test_to_async_url():
+    """Test database URLs are mapped to async drivers"""
+    assert to_async_url("sqlite:///./app.db") == "sqlite+aiosqlite:///./app.db"
+    assert to_async_url("postgresql://user:pass@db/app") == "postgresql+asyncpg://user:pass@db/app"
+    assert to_async_url("postgres://user:pass@db/app") == "postgresql+asyncpg://user:pass@db/app"
+    assert to_async_url("sqlite+aiosqlite:///./app.db") == "sqlite+aiosqlite:///./app.db"
+
+def test_is_memory_sqlite():
+    """Test in-memory SQLite URLs are detected"""
+    assert is_memory_sqlite("sqlite+aiosqlite:///:memory:")
+    assert is_memory_sqlite("sqlite+aiosqlite://")
+    assert not is_memory_sqlite("sqlite+aiosqlite:///./app.db")
+
+def test_sqlite_pragmas_applied(tmp_path):
+    """Test async SQLite connections use WAL, synchronous=NORMAL and a busy timeout, and the sync engine is untouched"""
+    async_engine = create_async_db_engine(f"sqlite+aiosqlite:///{tmp_path / 'pragmas.db'}")
+
+    async def read_pragmas():
+        async with async_engine.connect() as conn:
+            journal_mode = (await conn.execute(text("PRAGMA journal_mode"))).scalar()
+            synchronous = (await conn.execute(text("PRAGMA synchronous"))).scalar()
+            busy_timeout = (await conn.execute(text("PRAGMA busy_timeout"))).scalar()
+        await async_engine.dispose()
+        return journal_mode, synchronous, busy_timeout
+
+    journal_mode, synchronous, busy_timeout = asyncio.run(read_pragmas())
+    assert journal_mode == "wal"
+    assert synchronous == 1  # NORMAL
+    assert busy_timeout > 0
+    assert not event.contains(engine, "connect", set_sqlite_pragmas)
+
+def test_session_lookup(async_test_db, test_credentials):
+    """Test sessions can be stored and looked up by token until they expire"""
+    async def run():
+        async with async_test_db() as db:
+            stored = await crud.save_credentials(db, test_credentials)
+            await crud.create_session(db, stored.id, "live_session", timedelta(hours=1))
+            await crud.create_session(db, stored.id, "expired_session", timedelta(hours=-1))
+        async with async_test_db() as db:
+            live = await crud.get_session_by_token(db, "live_session")
+            expired = await crud.get_session_by_token(db, "expired_session")
+            owner = await crud.get_credentials(db, live.user_id)
+        return live, expired, owner
+
+    live, expired, owner = asyncio.run(run())
+    assert live is not None
+    assert expired is None
+    assert owner.refresh_token == test_credentials.refresh_token
+
+def test_init_db_skips_current_schema(async_test_db):
+    """Test startup migrates once and then only checks the schema version"""
+    import app.db.session as db_session
+    from app.db.models import SchemaVersion
+    from sqlalchemy import delete
+
+    async def forget_version():
+        async with db_session.async_engine.begin() as conn:
+            await conn.execute(delete(SchemaVersion))
+
+    asyncio.run(forget_version())
+    assert asyncio.run(db_session.init_db()) is True
+    assert asyncio.run(db_session.get_schema_version()) == db_session.schema_fingerprint()
+
+    with patch.object(db_session, "_upgrade_schema") as mock_upgrade:
+        assert asyncio.run(db_session.init_db()) is False
+        mock_upgrade.assert_not_called()
+
+def test_schema_version_only_absent_without_table(tmp_path, monkeypatch):
+    """Test a database without the version table has no version, and other errors are raised"""
+    import app.db.session as db_session
+    monkeypatch.setattr(db_session, "async_engine", create_async_db_engine(f"sqlite+aiosqlite:///{tmp_path / 'empty.db'}"))
+    assert asyncio.run(db_session.get_schema_version()) is None
+
+    monkeypatch.setattr(
+        db_session, "async_engine", create_async_db_engine(f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'app.db'}")
+    )
+    with pytest.raises(OperationalError):
+        asyncio.run(db_session.get_schema_version())
+
+def test_init_db_creates_new_indexes(tmp_path, monkeypatch):
+    """Test indexes added to existing tables are created on migration"""
+    import app.db.session as db_session
+    from sqlalchemy import Column, Index, Integer, MetaData, Table, create_engine, inspect
+    from sqlalchemy.ext.asyncio import create_async_engine
+    db_path = tmp_path / "indexes.db"
+    old_metadata = MetaData()
+    Table("credentials", old_metadata, Column("id", Integer, primary_key=True), Column("client_id", Integer))
+    sync_engine = create_engine(f"sqlite:///{db_path}")
+    old_metadata.create_all(sync_engine)
+
+    monkeypatch.setattr(db_session, "async_engine", create_async_engine(f"sqlite+aiosqlite:///{db_path}"))
+    new_index = Index("ix_test_credentials_client_id", db_session.Base.metadata.tables["credentials"].c.client_id)
+    try:
+        assert asyncio.run(db_session.init_db()) is True
+        index_names = {index["name"] for index in inspect(sync_engine).get_indexes("credentials")}
+        assert "ix_test_credentials_client_id" in index_names
+    finally:
+        db_session.Base.metadata.tables["credentials"].indexes.discard(new_index)
+
+def test_init_db_adds_new_columns(tmp_path, monkeypatch):
+    """Test nullable columns added to existing tables are created on migration"""
+    import app.db.session as db_session
+    from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, create_engine, inspect
+    from sqlalchemy.ext.asyncio import create_async_engine
+    db_path = tmp_path / "columns.db"
+    old_metadata = MetaData()
+    Table(
+        "upload_jobs", old_metadata,
+        Column("id", String, primary_key=True), Column("user_key", String, nullable=False),
+        Column("filename", String, nullable=False), Column("path", String, nullable=False),
+        Column("size", Integer, nullable=False), Column("status", String, nullable=False),
+        Column("created_at", DateTime, nullable=False)
+    )
+    sync_engine = create_engine(f"sqlite:///{db_path}")
+    old_metadata.create_all(sync_engine)
+
+    monkeypatch.setattr(db_session, "async_engine", create_async_engine(f"sqlite+aiosqlite:///{db_path}"))
+    assert asyncio.run(db_session.init_db()) is True
+    columns = {column["name"] for column in inspect(sync_engine).get_columns("upload_jobs")}
+    assert {"owner", "heartbeat_at", "error", "finished_at"} <= columns
@@ -0,0 +1,89 @@
+import struct
+import zlib
+from app.services.audio_tags import inspect_file, read_tags
+from app.services.uploads import file_digest
+
+# One silent MPEG-1 Layer III frame: 128 kbit/s, 44.1 kHz, 417 bytes
+MP3_FRAME = b"\xff\xfb\x90\x64" + b"\0" * 413
+
+def syncsafe(size):
+    return bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+
+def id3_frame(frame_id, text, encoding=3, flags=b"\0\0"):
+    body = bytes([encoding]) + text
+    return frame_id + struct.pack(">I", len(body)) + flags + body
+
+def write_mp3(path, frames, flags=0):
+    path.write_bytes(b"ID3\x03\x00" + bytes([flags]) + syncsafe(len(frames)) + frames + MP3_FRAME * 20)
+
+def vorbis_comments(*comments):
+    data = struct.pack("<I", 6) + b"vendor" + struct.pack("<I", len(comments))
+    for comment in comments:
+        data += struct.pack("<I", len(comment)) + comment
+    return data
+
+def atom(name, data):
+    return struct.pack(">I", 8 + len(data)) + name + data
+
+def test_read_id3_tags(tmp_path):
+    """Test title, artist and album are read from ID3v2.3 frames in any text encoding"""
+    path = tmp_path / "song.mp3"
+    write_mp3(path, (
+        id3_frame(b"TIT2", "Café".encode("utf-8"))
+        + id3_frame(b"TPE1", "Artist".encode("utf-16"), encoding=1)
+        + id3_frame(b"TALB", b"Album\0Other", encoding=0)
+    ))
+    tags = read_tags(str(path))
+    assert {k: tags[k] for k in ("title", "artist", "album")} == {"title": "Café", "artist": "Artist", "album": "Album"}
+    assert tags["duration_seconds"] == "1"
+
+def test_read_unsynchronised_and_compressed_id3_frames(tmp_path):
+    """Test tags written with ID3 unsynchronisation, or in zlib-compressed frames, are decoded"""
+    path = tmp_path / "unsync.mp3"
+    frames = id3_frame(b"TIT2", "ÿÿ Song".encode("latin-1"), encoding=0)
+    write_mp3(path, frames.replace(b"\xff", b"\xff\x00"), flags=0x80)
+    assert read_tags(str(path))["title"] == "ÿÿ Song"
+
+    path = tmp_path / "compressed.mp3"
+    body = b"\x00" + b"Squeezed"
+    packed = struct.pack(">I", len(body)) + zlib.compress(body)
+    frame = b"TIT2" + struct.pack(">I", len(packed)) + b"\x00\x80" + packed
+    write_mp3(path, frame)
+    assert read_tags(str(path))["title"] == "Squeezed"
+
+def test_read_flac_tags(tmp_path):
+    """Test FLAC Vorbis comments and the duration from STREAMINFO are read"""
+    # 44.1 kHz, 2 channels, 16 bits, 441000 samples
+    packed = (44100 << 44) | (1 << 41) | (15 << 36) | 441000
+    streaminfo = struct.pack(">HH", 4096, 4096) + b"\0" * 6 + packed.to_bytes(8, "big") + b"\0" * 16
+    comments = vorbis_comments(b"title=Song", b"ARTIST=Band", b"ALBUM=")
+    path = tmp_path / "song.flac"
+    path.write_bytes(
+        b"fLaC"
+        + bytes([0]) + len(streaminfo).to_bytes(3, "big") + streaminfo
+        + bytes([0x84]) + len(comments).to_bytes(3, "big") + comments
+    )
+    assert read_tags(str(path)) == {"title": "Song", "artist": "Band", "duration_seconds": "10"}
+
+    info = inspect_file(str(path))
+    assert info.title == "Song" and info.duration_seconds == 10
+    assert info.digest == file_digest(str(path)) and info.size == path.stat().st_size
+
+def test_read_m4a_tags(tmp_path):
+    """Test iTunes-style tags of m4a files are read"""
+    def data(text):
+        return atom(b"data", struct.pack(">II", 1, 0) + text.encode())
+
+    mvhd = atom(b"mvhd", b"\0" * 12 + struct.pack(">II", 1000, 10000) + b"\0" * 80)
+    ilst = atom(b"ilst", atom(b"\xa9nam", data("Song")) + atom(b"\xa9ART", data("Band")) + atom(b"\xa9alb", data("Record")))
+    meta = atom(b"meta", b"\0" * 4 + atom(b"hdlr", b"\0" * 8 + b"mdirappl" + b"\0" * 9) + ilst)
+    path = tmp_path / "song.m4a"
+    path.write_bytes(atom(b"ftyp", b"M4A \0\0\0\0M4A mp42") + atom(b"moov", mvhd + atom(b"udta", meta)))
+    assert read_tags(str(path)) == {"title": "Song", "artist": "Band", "album": "Record"}
+
+def test_unreadable_tags(tmp_path):
+    """Test files that are not audio, or are damaged, give no tags"""
+    for name, data in [("a.mp3", b"junk" * 10), ("b.flac", b"fLaC\x04\xff"), ("c.wma", b"\0" * 16)]:
+        (tmp_path / name).write_bytes(data)
+        assert read_tags(str(tmp_path / name)) == {}
+    assert read_tags(str(tmp_path / "missing.ogg")) == {}
@@ -0,0 +1,162 @@
+import asyncio
+import io
+import os
+import tarfile
+import zipfile
+from unittest.mock import MagicMock, patch
+import pytest
+import app.services.uploads as uploads_service
+from app.core.outbound import OutboundLimiter
+from app.services.bulk_uploads import BulkUploader, iter_archive, iter_directory
+
+@pytest.fixture
+def spool_dir(tmp_path, monkeypatch):
+    path = tmp_path / "spool"
+    path.mkdir()
+    monkeypatch.setattr(uploads_service, "UPLOAD_SPOOL_DIR", str(path))
+    return path
+
+def make_tree(root):
+    (root / "b").mkdir(parents=True)
+    (root / "a").mkdir()
+    (root / "a" / "2.mp3").write_bytes(b"ID3two")
+    (root / "a" / "1.flac").write_bytes(b"fLaCone")
+    (root / "b" / "cover.jpg").write_bytes(b"jpeg")
+    (root / "b" / "3.ogg").write_bytes(b"OggSthree")
+    (root / "top.m4a").write_bytes(b"\0\0\0\x20ftyptop")
+
+def test_iter_directory(tmp_path):
+    """Test audio files are found in name order, directory by directory"""
+    make_tree(tmp_path / "music")
+    names = [f.name for f in iter_directory(str(tmp_path / "music"))]
+    assert names == ["top.m4a", os.path.join("a", "1.flac"), os.path.join("a", "2.mp3"), os.path.join("b", "3.ogg")]
+
+def test_iter_directory_skips_symlinks(tmp_path):
+    """Test symbolic links to files or directories outside the tree are not followed"""
+    make_tree(tmp_path / "music")
+    (tmp_path / "secret").mkdir()
+    (tmp_path / "secret" / "hidden.mp3").write_bytes(b"ID3secret")
+    os.symlink(tmp_path / "secret" / "hidden.mp3", tmp_path / "music" / "link.mp3")
+    os.symlink(tmp_path / "secret", tmp_path / "music" / "linked")
+    names = [f.name for f in iter_directory(str(tmp_path / "music"))]
+    assert "link.mp3" not in names
+    assert not any(name.startswith("linked") for name in names)
+
+def test_iter_archive(tmp_path, spool_dir, monkeypatch):
+    """Test zip and tar members are extracted one at a time, and oversized ones reported"""
+    monkeypatch.setattr(uploads_service, "UPLOAD_MAX_BYTES", 100)
+    zip_path = tmp_path / "music.zip"
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        archive.writestr("../evil/song.mp3", b"ID3song")
+        archive.writestr("notes.txt", b"text")
+        archive.writestr("big.flac", b"fLaC" + b"\0" * 200)
+    files = iter_archive(str(zip_path))
+    first = next(files)
+    assert first.name == "../evil/song.mp3" and first.temporary
+    assert os.path.dirname(first.path) == str(spool_dir)
+    assert open(first.path, "rb").read() == b"ID3song"
+    assert next(files).error == "File is larger than 100 bytes"
+    assert next(files, None) is None
+
+    tar_path = tmp_path / "music.tar.gz"
+    with tarfile.open(tar_path, "w:gz") as archive:
+        info = tarfile.TarInfo("album/song.ogg")
+        info.size = 9
+        archive.addfile(info, io.BytesIO(b"OggSsong!"))
+    assert [f.name for f in iter_archive(str(tar_path))] == ["album/song.ogg"]
+
+    (tmp_path / "junk.zip").write_bytes(b"not an archive")
+    with pytest.raises(ValueError):
+        next(iter_archive(str(tmp_path / "junk.zip")))
+
+def test_run_uploads_files_and_reports_results(tmp_path):
+    """Test a bulk upload sends each distinct file once and records per-file results and totals"""
+    make_tree(tmp_path / "music")
+    (tmp_path / "music" / "copy.mp3").write_bytes(b"ID3two")
+    (tmp_path / "music" / "bad.mp3").write_bytes(b"ID3bad")
+    uploader = BulkUploader(concurrency=2, processes=1)
+    ytmusic = MagicMock()
+    ytmusic.upload_song.side_effect = lambda path: not open(path, "rb").read().endswith(b"bad")
+
+    async def run():
+        job = await uploader.create("alice", "music", str(tmp_path / "music"))
+        await uploader.run(ytmusic, job["id"])
+        return await uploader.get("alice", job["id"]), await uploader.get("bob", job["id"])
+
+    job, other_user = asyncio.run(run())
+    assert other_user is None
+    assert job["status"] == "completed"
+    assert job["total"] == job["found"] == job["processed"] == 6
+    assert (job["uploaded"], job["duplicates"], job["failed"]) == (4, 1, 1)
+    assert job["bytes_uploaded"] == sum(len(d) for d in [b"ID3two", b"fLaCone", b"OggSthree", b"\0\0\0\x20ftyptop"])
+    assert ytmusic.upload_song.call_count == 5
+    results = {f["name"]: f for f in job["files"]}
+    assert results["bad.mp3"]["error"] == "Failed to upload song"
+    statuses = sorted([results["copy.mp3"]["status"], results[os.path.join("a", "2.mp3")]["status"]])
+    assert statuses == ["duplicate", "uploaded"]
+
+def test_run_archive_removes_temporary_files(tmp_path, spool_dir):
+    """Test an archive job removes extracted files and the archive, and fails on unreadable archives"""
+    archive_path = spool_dir / "upload.zip"
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        archive.writestr("song.mp3", b"ID3song")
+    junk_path = spool_dir / "junk.zip"
+    junk_path.write_bytes(b"junk")
+    uploader = BulkUploader(processes=0)
+    ytmusic = MagicMock()
+    ytmusic.upload_song.return_value = True
+
+    async def run():
+        job = await uploader.create("alice", "upload.zip", str(archive_path), archive=True)
+        junk = await uploader.create("alice", "junk.zip", str(junk_path), archive=True)
+        await uploader.run(ytmusic, job["id"])
+        await uploader.run(ytmusic, junk["id"])
+        return await uploader.get("alice", job["id"]), await uploader.get("alice", junk["id"])
+
+    job, junk = asyncio.run(run())
+    assert job["status"] == "completed" and job["uploaded"] == 1
+    assert junk["status"] == "failed" and "Not a zip or tar archive" in junk["error"]
+    assert list(spool_dir.iterdir()) == []
+
+def test_interrupt_keeps_archives_of_live_workers(spool_dir):
+    """Test only jobs of a stopped worker are marked interrupted and have their archive removed"""
+    archive_path = spool_dir / "upload.zip"
+    archive_path.write_bytes(b"zip")
+    uploader = BulkUploader(processes=0)
+
+    async def run():
+        job = await uploader.create("alice", "upload.zip", str(archive_path), archive=True)
+        live = await uploader.interrupt_stale()
+        kept = archive_path.exists()
+        with patch("app.db.leases.JOB_STALE_AFTER", -1):
+            marked = await uploader.interrupt_stale()
+        return live, kept, marked, await uploader.get("alice", job["id"])
+
+    live, kept, marked, job = asyncio.run(run())
+    assert live == 0 and kept
+    assert marked == 1 and job["status"] == "interrupted"
+    assert not archive_path.exists()
+
+def test_outbound_limiter():
+    """Test the limiter bounds both the rate and the concurrency of calls"""
+    limiter = OutboundLimiter(rate=50, burst=1, concurrency=2)
+    running = []
+    peak = []
+
+    async def call():
+        async with limiter.slot():
+            running.append(1)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.pop()
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*(call() for _ in range(6)))
+        return loop.time() - start
+
+    elapsed = asyncio.run(run())
+    # One call may start at once, the other five wait 1/50 s each
+    assert elapsed >= 0.09
+    assert max(peak) <= 2
@@ -0,0 +1,72 @@
+import asyncio
+import csv
+import io
+import json
+import threading
+from unittest.mock import MagicMock, patch
+from app.services.export import export_stream, format_rows, playlist_pages
+
+SONGS = [
+    {"videoId": "v1", "title": "Song, One", "artists": [{"name": "Artist"}], "album": {"name": "Album"}, "duration_seconds": 180},
+    {"videoId": "v2", "title": "Song Two", "artists": [], "duration_seconds": None},
+]
+
+class FakeRequest:
+    """Request that reports a disconnect after a number of checks"""
+
+    def __init__(self, connected_checks):
+        self.connected_checks = connected_checks
+        self.url = type("URL", (), {"path": "/api/v1/playlists/PL1/export"})()
+
+    async def is_disconnected(self):
+        self.connected_checks -= 1
+        return self.connected_checks < 0
+
+def collect(request, pages, fmt):
+    async def run():
+        return "".join([chunk async for chunk in export_stream(request, pages, fmt)])
+    return asyncio.run(run())
+
+async def make_pages(fetched, count=10):
+    for n in range(count):
+        fetched.append(n)
+        yield [dict(SONGS[0], videoId=f"v{n}")]
+
+def test_export_formats():
+    """Test CSV quoting, NDJSON lines and M3U entries"""
+    rows = list(csv.reader(io.StringIO(format_rows(SONGS, "csv"))))
+    assert rows[0] == ["v1", "Song, One", "Artist", "Album", "180"]
+    assert [json.loads(line)["videoId"] for line in format_rows(SONGS, "ndjson").splitlines()] == ["v1", "v2"]
+    assert format_rows(SONGS, "m3u").splitlines() == [
+        "#EXTINF:180,Artist - Song, One",
+        "https://music.youtube.com/watch?v=v1",
+        "#EXTINF:-1,Song Two",
+        "https://music.youtube.com/watch?v=v2",
+    ]
+
+def test_export_streams_every_page():
+    """Test all pages are written after the header"""
+    fetched = []
+    output = collect(FakeRequest(100), make_pages(fetched), "csv")
+    assert output.splitlines()[0] == "id,title,artist,album,duration_seconds"
+    assert len(output.splitlines()) == 11
+    assert fetched == list(range(10))
+
+def test_export_stops_fetching_on_disconnect():
+    """Test no further pages are fetched once the client has gone away"""
+    fetched = []
+    output = collect(FakeRequest(3), make_pages(fetched), "ndjson")
+    assert len(output.splitlines()) == 3
+    assert fetched == [0, 1, 2]
+
+def test_playlist_fetch_abandoned_on_disconnect():
+    """Test the whole-playlist upstream fetch is cancelled when the client leaves during it"""
+    ytmusic = MagicMock()
+    ytmusic.cancel_event = threading.Event()
+    ytmusic.get_playlist.side_effect = lambda playlist_id, limit: (
+        ytmusic.cancel_event.wait(5) and {"tracks": SONGS}
+    )
+    with patch("app.core.cancellation.DISCONNECT_POLL_INTERVAL", 0.001):
+        output = collect(FakeRequest(1), playlist_pages(FakeRequest(1), ytmusic, "PL1"), "csv")
+    assert ytmusic.cancel_event.is_set()
+    assert output == "id,title,artist,album,duration_seconds\r\n"
@@ -0,0 +1,114 @@
+import asyncio
+import time
+from unittest.mock import MagicMock, patch
+from app.services.imports import PlaylistImporter
+
+def test_import_adds_chunks_with_bounded_concurrency():
+    """Test videos are added in chunks, never more at once than the concurrency limit"""
+    importer = PlaylistImporter(chunk_size=10, concurrency=2, retry_delay=0)
+    ytmusic = MagicMock()
+    active, peak = [0], [0]
+
+    def add(playlist_id, video_ids, source_playlist, duplicates):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        time.sleep(0.01)
+        active[0] -= 1
+        return {"status": "STATUS_SUCCEEDED", "playlistEditResults": [{"videoId": v} for v in video_ids]}
+    ytmusic.add_playlist_items.side_effect = add
+
+    async def run():
+        job = await importer.create("user", "PL1", [f"v{n}" for n in range(95)])
+        await importer.run(ytmusic, job["id"])
+        return await importer.get("user", job["id"])
+
+    status = asyncio.run(run())
+    assert status["status"] == "completed"
+    assert status["added"] == status["processed"] == status["total"] == 95
+    assert status["chunks_done"] == status["chunks_total"] == 10
+    assert status["items_per_second"] > 0
+    assert ytmusic.add_playlist_items.call_count == 10
+    assert 1 < peak[0] <= 2
+
+def test_import_keeps_order_by_default():
+    """Test a default import adds its chunks one at a time, in the order submitted"""
+    importer = PlaylistImporter(chunk_size=10, retry_delay=0)
+    ytmusic = MagicMock()
+    added = []
+
+    def add(playlist_id, video_ids, source_playlist, duplicates):
+        time.sleep(0.001 * (len(added) % 3))
+        added.extend(video_ids)
+        return {"status": "STATUS_SUCCEEDED", "playlistEditResults": [{"videoId": v} for v in video_ids]}
+    ytmusic.add_playlist_items.side_effect = add
+
+    async def run():
+        job = await importer.create("user", "PL1", [f"v{n}" for n in range(45)])
+        await importer.run(ytmusic, job["id"])
+
+    asyncio.run(run())
+    assert added == [f"v{n}" for n in range(45)]
+
+def test_import_retries_and_resumes_from_checkpoint():
+    """Test a failing chunk is retried, and a failed job resumes with only the missing chunks"""
+    importer = PlaylistImporter(chunk_size=10, concurrency=1, retries=1, retry_delay=0)
+    ytmusic = MagicMock()
+    added = []
+    failures = {"v20": 3}  # The third chunk fails three times: the first run gives up on it
+
+    def add(playlist_id, video_ids, source_playlist, duplicates):
+        if failures.get(video_ids[0]):
+            failures[video_ids[0]] -= 1
+            raise RuntimeError("upstream busy")
+        added.extend(video_ids)
+        return {"status": "STATUS_SUCCEEDED"}
+    ytmusic.add_playlist_items.side_effect = add
+
+    async def run():
+        job = await importer.create("user", "PL1", [f"v{n}" for n in range(40)])
+        await importer.run(ytmusic, job["id"])
+        failed = await importer.get("user", job["id"])
+        await importer.resume("user", job["id"])
+        await importer.run(ytmusic, job["id"])
+        return failed, await importer.get("user", job["id"])
+
+    failed, resumed = asyncio.run(run())
+    assert failed["status"] == "failed" and "upstream busy" in failed["error"]
+    assert failed["chunks_done"] == 2
+    assert resumed["status"] == "completed" and resumed["chunks_done"] == 4
+    assert sorted(added) == sorted(f"v{n}" for n in range(40))
+
+def test_interrupted_jobs_can_be_resumed():
+    """Test jobs of a stopped worker are marked interrupted and are private to their user"""
+    importer = PlaylistImporter()
+
+    async def run():
+        job = await importer.create("user", "PL1", ["v1"])
+        live = await importer.interrupt_stale()
+        with patch("app.db.leases.JOB_STALE_AFTER", -1):
+            marked = await importer.interrupt_stale()
+        return job, live, marked, await importer.get("user", job["id"]), await importer.get("other_user", job["id"])
+
+    job, live, marked, status, other = asyncio.run(run())
+    assert live == 0
+    assert marked == 1 and status["status"] == "interrupted"
+    assert other is None
+
+def test_resumed_job_runs_once():
+    """Test a job started by two workers at once only has its chunks added by one"""
+    importer, other_worker = PlaylistImporter(chunk_size=10), PlaylistImporter(chunk_size=10)
+    ytmusic = MagicMock()
+
+    def add(playlist_id, video_ids, source_playlist, duplicates):
+        time.sleep(0.01)
+        return {"status": "STATUS_SUCCEEDED"}
+    ytmusic.add_playlist_items.side_effect = add
+
+    async def run():
+        job = await importer.create("user", "PL1", [f"v{n}" for n in range(30)])
+        await asyncio.gather(importer.run(ytmusic, job["id"]), other_worker.run(ytmusic, job["id"]))
+        return await importer.get("user", job["id"])
+
+    status = asyncio.run(run())
+    assert status["status"] == "completed"
+    assert ytmusic.add_playlist_items.call_count == 3
@@ -0,0 +1,180 @@
+import asyncio
+from unittest.mock import MagicMock
+import pytest
+from app.services.library import LibraryMirror, MirrorSource
+
+def make_song(n):
+    return {"videoId": f"v{n}", "title": f"Song {n}", "artists": [{"name": "Artist"}], "duration_seconds": n}
+
+class FakeLibrary:
+    """Upstream library listing, newest first, recording the limits it was fetched with"""
+
+    def __init__(self, songs):
+        self.songs = songs
+        self.limits = []
+
+    def fetch(self, ytmusic, limit):
+        self.limits.append(limit)
+        return list(self.songs if limit is None else self.songs[:limit])
+
+@pytest.fixture
+def library():
+    return FakeLibrary([make_song(n) for n in range(250, 0, -1)])
+
+@pytest.fixture
+def mirror(library, monkeypatch):
+    import app.services.library as library_service
+    monkeypatch.setattr(library_service, "LIBRARY_SYNC_PAGE_SIZE", 10)
+    return LibraryMirror({"songs": MirrorSource(library.fetch, "videoId")})
+
+def test_first_sync_fetches_everything(mirror, library):
+    """Test the first sync walks the whole listing and serves it newest first"""
+    added, removed = asyncio.run(mirror.sync(MagicMock(), "user", "songs"))
+    assert len(added) == 250 and removed == []
+    assert library.limits == [None]
+
+    items, state = asyncio.run(mirror.get_items("user", "songs", limit=3))
+    assert [item["videoId"] for item in items] == ["v250", "v249", "v248"]
+    assert state.item_count == 250
+
+def test_incremental_sync_stops_at_known_items(mirror, library):
+    """Test later syncs only fetch until they reach items already mirrored"""
+    asyncio.run(mirror.sync(MagicMock(), "user", "songs"))
+    library.songs = [make_song(n) for n in range(262, 250, -1)] + library.songs
+    library.limits.clear()
+
+    added, removed = asyncio.run(mirror.sync(MagicMock(), "user", "songs"))
+    assert added == [f"v{n}" for n in range(262, 250, -1)]
+    assert removed == []
+    assert library.limits == [10, 40]
+
+    items, state = asyncio.run(mirror.get_items("user", "songs", limit=2))
+    assert [item["videoId"] for item in items] == ["v262", "v261"]
+    assert state.item_count == 262
+
+def test_full_sync_picks_up_removals(mirror, library):
+    """Test a forced full sync removes items no longer in the library"""
+    asyncio.run(mirror.sync(MagicMock(), "user", "songs"))
+    library.songs = [song for song in library.songs if song["videoId"] != "v100"]
+
+    added, removed = asyncio.run(mirror.sync(MagicMock(), "user", "songs", full=True))
+    assert added == [] and removed == ["v100"]
+    items, state = asyncio.run(mirror.get_items("user", "songs", order="a_to_z"))
+    assert "v100" not in {item["videoId"] for item in items}
+    assert items[0]["title"] == "Song 1"
+    assert state.item_count == 249
+
+def test_mirrors_are_per_user(mirror):
+    """Test one user's mirror is not served to another"""
+    asyncio.run(mirror.sync(MagicMock(), "user", "songs"))
+    assert asyncio.run(mirror.get_items("other_user", "songs")) is None
+
+def test_failed_sync_is_reported_not_raised(library):
+    """Test upstream errors during a background sync are logged and leave no mirror"""
+    def fail(ytmusic, limit):
+        raise RuntimeError("upstream down")
+    mirror = LibraryMirror({"songs": MirrorSource(fail, "videoId")})
+    assert asyncio.run(mirror.sync(MagicMock(), "user", "songs")) is None
+    assert asyncio.run(mirror.get_items("user", "songs")) is None
+
+def test_local_search_prefix_and_ranking(mirror, library):
+    """Test mirrored items are searchable by word prefixes, title matches first"""
+    library.songs = [
+        {"videoId": "a", "title": "Quiet Night", "artists": [{"name": "Beyoncé"}]},
+        {"videoId": "b", "title": "Beyond the Sea", "artists": [{"name": "Bobby Darin"}]},
+        {"videoId": "c", "title": "Sea of Love", "artists": [{"name": "Cat Power"}], "album": {"name": "Beyond"}},
+    ]
+    asyncio.run(mirror.sync(MagicMock(), "user", "songs"))
+
+    results = asyncio.run(mirror.search("user", "beyon", ["songs"]))
+    assert [r["videoId"] for r in results] == ["b", "a", "c"]
+    assert all(r["resultType"] == "song" for r in results)
+    # Every word has to match, accents are ignored
+    assert [r["videoId"] for r in asyncio.run(mirror.search("user", "beyonce quiet", ["songs"]))] == ["a"]
+    assert asyncio.run(mirror.search("other_user", "beyon", ["songs"])) == []
+    assert asyncio.run(mirror.search("user", "  ", ["songs"])) is None
+
+def test_local_search_follows_removals(mirror, library):
+    """Test removed items drop out of the full-text index"""
+    asyncio.run(mirror.sync(MagicMock(), "user", "songs"))
+    assert len(asyncio.run(mirror.search("user", "song 100", ["songs"]))) == 1
+    asyncio.run(mirror.remove("user", "songs", ["v100"]))
+    assert asyncio.run(mirror.search("user", "song 100", ["songs"])) == []
+
+def test_filter_and_sort_mirrored_items(mirror, library):
+    """Test mirrored listings are filtered by artist, album and duration and sorted server-side"""
+    from app.services.library import LibraryFilters, filter_items
+    library.songs = [
+        {"videoId": "a", "title": "beta", "artists": [{"name": "Cat Power"}], "album": {"name": "Moon Pix"}, "duration_seconds": 300},
+        {"videoId": "b", "title": "Alpha", "artists": [{"name": "Bobby Darin"}], "album": {"name": "That's All"}, "duration_seconds": 120},
+        {"videoId": "c", "title": "Gamma", "artists": [{"name": "Cat Stevens"}], "album": {"name": "Tea 100%"}, "duration_seconds": 200},
+        {"videoId": "d", "title": "Delta", "artists": [{"name": "CAT EMPIRE"}]},
+    ]
+    asyncio.run(mirror.sync(MagicMock(), "user", "songs"))
+
+    def ids(**filters):
+        items, _ = asyncio.run(mirror.get_items("user", "songs", filters=LibraryFilters(**filters)))
+        return [item["videoId"] for item in items]
+
+    assert ids(artist="cat") == ["a", "c", "d"]
+    assert ids(album="100%") == ["c"]
+    assert ids(album="%") == ["c"]
+    assert ids(min_duration=200, sort="duration") == ["c", "a"]
+    assert ids(sort="title") == ["b", "a", "d", "c"]
+    assert ids(sort="-title") == ["c", "d", "a", "b"]
+    assert ids(sort="artist") == ["b", "d", "a", "c"]
+    assert ids(sort="recently_added") == ["a", "b", "c", "d"]
+    assert ids(sort="-recently_added") == ["d", "c", "b", "a"]
+
+    # Items missing the sort key come last either way, in the mirror and upstream alike
+    for filters in (
+        {"sort": "album"}, {"sort": "-album"}, {"sort": "duration"}, {"sort": "-duration"},
+        {"artist": "CAT", "sort": "title"}, {"min_duration": 0}
+    ):
+        expected = [item["videoId"] for item in filter_items(library.songs, LibraryFilters(**filters))]
+        assert ids(**filters) == expected, filters
+    assert ids(sort="-album")[-1] == "d"
+
+def test_filter_items_matches_mirror(library):
+    """Test upstream results are filtered and sorted the same way as the mirror"""
+    from app.services.library import LibraryFilters, filter_items
+    items = library.songs[:5]
+    filtered = filter_items(items, LibraryFilters(min_duration=248, sort="-duration"))
+    assert [item["videoId"] for item in filtered] == ["v250", "v249", "v248"]
+    assert filter_items(items, LibraryFilters(artist="nobody")) == []
+
+def test_change_feed_records_adds_and_removals(mirror, library):
+    """Test the change feed starts with a reset and then lists adds and removals in order"""
+    from app.services.library import get_changes
+    asyncio.run(mirror.sync(MagicMock(), "user", "songs"))
+    first = asyncio.run(get_changes("user"))
+    assert [(c["kind"], c["op"]) for c in first["changes"]] == [("songs", "reset")]
+
+    library.songs = [make_song(n) for n in range(252, 250, -1)] + library.songs
+    asyncio.run(mirror.sync(MagicMock(), "user", "songs"))
+    asyncio.run(mirror.remove("user", "songs", ["v10"]))
+    changes = asyncio.run(get_changes("user", since=first["version"]))
+    assert [(c["op"], c["id"]) for c in changes["changes"]] == [("add", "v251"), ("add", "v252"), ("remove", "v10")]
+    assert changes["changes"][0]["item"]["title"] == "Song 251"
+    assert changes["version"] == changes["changes"][-1]["version"]
+
+    # Nothing new, and other users see nothing
+    assert asyncio.run(get_changes("user", since=changes["version"]))["changes"] == []
+    assert asyncio.run(get_changes("other_user"))["changes"] == []
+
+def test_change_feed_pages_and_resets_after_pruning(mirror, library, monkeypatch):
+    """Test the change feed pages with has_more and asks for a reset once changes were pruned"""
+    import app.services.library as library_service
+    from app.services.library import get_changes
+    asyncio.run(mirror.sync(MagicMock(), "user", "songs"))
+    asyncio.run(mirror.remove("user", "songs", ["v1", "v2", "v3"]))
+    page = asyncio.run(get_changes("user", limit=2))
+    assert page["has_more"] and len(page["changes"]) == 2
+    rest = asyncio.run(get_changes("user", since=page["version"], limit=2))
+    assert not rest["has_more"] and [c["id"] for c in rest["changes"]] == ["v2", "v3"]
+
+    monkeypatch.setattr(library_service, "LIBRARY_CHANGES_RETENTION", -1)
+    asyncio.run(mirror.remove("user", "songs", ["v4"]))
+    pruned = asyncio.run(get_changes("user", since=page["version"]))
+    assert pruned["reset"] and pruned["changes"] == []
+    assert asyncio.run(get_changes("user", since=pruned["version"]))["reset"] is False
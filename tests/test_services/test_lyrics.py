@@ -0,0 +1,94 @@
+import asyncio
+import os
+import time
+from unittest.mock import MagicMock
+from app.services.lyrics import CODEC_ZSTD, LyricsCache, compress, decompress
+
+LYRICS = {"lyrics": "Line one\nLine two", "source": "Source: Test", "hasTimestamps": False}
+
+def test_compress_round_trip():
+    """Test entries are written with zstd and entries in any other codec are misses"""
+    data = b'{"lyrics": "la la la"}' * 50
+    blob = compress(data)
+    assert blob[:1] == CODEC_ZSTD and len(blob) < len(data)
+    assert decompress(blob) == data
+    assert decompress(b"?unknown") is None
+
+def test_unknown_codec_file_is_a_miss(tmp_path):
+    """Test a cache file in a codec this version does not write is fetched again"""
+    ytmusic = MagicMock()
+    ytmusic.get_lyrics.return_value = LYRICS
+    cache = LyricsCache(str(tmp_path))
+    os.makedirs(os.path.dirname(cache.path("MPLYt_1")))
+    with open(cache.path("MPLYt_1"), "wb") as f:
+        f.write(b"Zx\x9c")
+    assert cache.read("MPLYt_1") is None
+    assert asyncio.run(cache.get(ytmusic, "MPLYt_1")) == LYRICS
+    ytmusic.get_lyrics.assert_called_once_with("MPLYt_1")
+
+def test_lyrics_served_from_memory_then_disk(tmp_path):
+    """Test lyrics go upstream once and are then served locally, also by a new cache"""
+    ytmusic = MagicMock()
+    ytmusic.get_lyrics.return_value = LYRICS
+    cache = LyricsCache(str(tmp_path))
+
+    async def run(cache):
+        return await cache.get(ytmusic, "MPLYt_1"), await cache.get(ytmusic, "MPLYt_1")
+
+    assert asyncio.run(run(cache)) == (LYRICS, LYRICS)
+    assert os.path.exists(cache.path("MPLYt_1"))
+    # Another worker, or this one after a restart, finds the file
+    assert asyncio.run(run(LyricsCache(str(tmp_path)))) == (LYRICS, LYRICS)
+    ytmusic.get_lyrics.assert_called_once_with("MPLYt_1")
+
+def test_stale_and_missing_lyrics_fetched_again(tmp_path):
+    """Test expired files and songs without lyrics go upstream again"""
+    ytmusic = MagicMock()
+    ytmusic.get_lyrics.side_effect = lambda browse_id: LYRICS if browse_id == "MPLYt_1" else {}
+    cache = LyricsCache(str(tmp_path), max_age=60)
+    asyncio.run(cache.get(ytmusic, "MPLYt_1"))
+    old = time.time() - 120
+    os.utime(cache.path("MPLYt_1"), (old, old))
+    assert cache.read("MPLYt_1") is None
+    assert not os.path.exists(cache.path("MPLYt_1"))
+
+    fresh = LyricsCache(str(tmp_path), max_age=60)
+    assert asyncio.run(fresh.get(ytmusic, "MPLYt_1")) == LYRICS
+    assert asyncio.run(fresh.get(ytmusic, "MPLYt_2")) == {}
+    assert asyncio.run(fresh.get(ytmusic, "MPLYt_2")) == {}
+    assert ytmusic.get_lyrics.call_count == 4
+
+def test_memory_lru_eviction(tmp_path):
+    """Test the in-memory level keeps the most recently used lyrics"""
+    cache = LyricsCache("", size=2)
+    ytmusic = MagicMock()
+    ytmusic.get_lyrics.side_effect = lambda browse_id: {"lyrics": browse_id}
+
+    async def run():
+        for browse_id in ("a", "b", "a", "c", "a", "b"):
+            await cache.get(ytmusic, browse_id)
+
+    asyncio.run(run())
+    assert [c.args[0] for c in ytmusic.get_lyrics.call_args_list] == ["a", "b", "c", "b"]
+
+def test_stale_memory_entries_fetched_again():
+    """Test lyrics held in memory also expire after the maximum age"""
+    ytmusic = MagicMock()
+    ytmusic.get_lyrics.return_value = LYRICS
+    cache = LyricsCache("", max_age=60)
+    asyncio.run(cache.get(ytmusic, "MPLYt_1"))
+    cache._entries["MPLYt_1"] = (LYRICS, time.time() - 120)
+    assert asyncio.run(cache.get(ytmusic, "MPLYt_1")) == LYRICS
+    assert ytmusic.get_lyrics.call_count == 2
+
+def test_prune_deletes_expired_files(tmp_path):
+    """Test the sweep deletes expired files and keeps fresh ones"""
+    cache = LyricsCache(str(tmp_path), max_age=60)
+    cache.write("MPLYt_old", LYRICS)
+    cache.write("MPLYt_new", LYRICS)
+    old = time.time() - 120
+    os.utime(cache.path("MPLYt_old"), (old, old))
+    assert cache.prune() == 1
+    assert not os.path.exists(cache.path("MPLYt_old"))
+    assert os.path.exists(cache.path("MPLYt_new"))
+    assert LyricsCache("").prune() == 0
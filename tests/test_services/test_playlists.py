@@ -0,0 +1,113 @@
+import asyncio
+from unittest.mock import MagicMock
+import pytest
+from app.services.playlists import (
+    PlaylistCache, PlaylistEditError, dedupe_playlist, diff_playlist, merge_playlists, playlist_cache, sync_playlist,
+    track_keys
+)
+
+def make_tracks(*video_ids):
+    return [{"videoId": video_id, "setVideoId": f"set_{n}"} for n, video_id in enumerate(video_ids)]
+
+def fake_ytmusic(tracks):
+    """Upstream playlist that applies adds and removes to `tracks`"""
+    ytmusic = MagicMock()
+    ytmusic.get_playlist.side_effect = lambda playlist_id, limit: {"tracks": list(tracks)}
+
+    def add(playlist_id, video_ids, source_playlist, duplicates):
+        edits = [{"videoId": video_id, "setVideoId": f"new_{len(tracks) + n}"} for n, video_id in enumerate(video_ids)]
+        tracks.extend(edits)
+        return {"status": "STATUS_SUCCEEDED", "playlistEditResults": edits}
+
+    def remove(playlist_id, videos):
+        gone = {video["setVideoId"] for video in videos}
+        tracks[:] = [track for track in tracks if track["setVideoId"] not in gone]
+        return "STATUS_SUCCEEDED"
+
+    ytmusic.add_playlist_items.side_effect = add
+    ytmusic.remove_playlist_items.side_effect = remove
+    return ytmusic
+
+def test_diff_playlist_is_minimal():
+    """Test only missing videos are added and only unwanted tracks removed"""
+    diff = diff_playlist(make_tracks("a", "b", "c", "b"), ["c", "d", "a", "a"])
+    assert diff.add == ["d", "a"]
+    assert [track["setVideoId"] for track in diff.remove] == ["set_1", "set_3"]
+    assert diff.unchanged == 2
+
+def test_sync_playlist_chunks_edits_and_reuses_cache():
+    """Test edits are applied in chunks and the next sync diffs against the cached result"""
+    tracks = make_tracks(*[f"v{n}" for n in range(5)])
+    ytmusic = fake_ytmusic(tracks)
+    target = [f"v{n}" for n in range(2, 10)]
+
+    result = asyncio.run(sync_playlist(ytmusic, "user", "PL1", target, chunk_size=2))
+    assert result == {"added": 5, "removed": 2, "unchanged": 3, "requests": 4}
+    assert sorted(track["videoId"] for track in tracks) == sorted(target)
+    assert [len(c.args[1]) for c in ytmusic.add_playlist_items.call_args_list] == [2, 2, 1]
+
+    result = asyncio.run(sync_playlist(ytmusic, "user", "PL1", target[:-1], chunk_size=2))
+    assert result == {"added": 0, "removed": 1, "unchanged": 7, "requests": 1}
+    assert ytmusic.get_playlist.call_count == 1
+    assert "v9" not in {track["videoId"] for track in tracks}
+
+def test_sync_playlist_failure_invalidates_cache():
+    """Test a failed upstream edit reports progress and drops the cached playlist"""
+    ytmusic = fake_ytmusic(make_tracks("a", "b"))
+    ytmusic.add_playlist_items.side_effect = None
+    ytmusic.add_playlist_items.return_value = {"status": "STATUS_FAILED"}
+
+    with pytest.raises(PlaylistEditError) as error:
+        asyncio.run(sync_playlist(ytmusic, "user", "PL1", ["b", "c"]))
+    assert error.value.removed == 1 and error.value.added == 0
+    assert playlist_cache.get("user", "PL1") is None
+
+def test_playlist_locks_serialize_edits_and_are_dropped():
+    """Test edits to one playlist wait for each other and leave no lock behind"""
+    cache = PlaylistCache()
+    order = []
+
+    async def edit(name):
+        async with cache.lock("user", "PL1"):
+            order.append(f"{name} start")
+            await asyncio.sleep(0.01)
+            order.append(f"{name} end")
+
+    async def run():
+        await asyncio.gather(edit("a"), edit("b"))
+        await edit("c")
+
+    asyncio.run(run())
+    assert order == ["a start", "a end", "b start", "b end", "c start", "c end"]
+    assert cache._locks == {}
+
+def test_track_keys_normalize_title_and_artists():
+    """Test title keys ignore case, accents, punctuation and artist order"""
+    first = {"videoId": "a", "title": "Café del Mar!", "artists": [{"name": "B"}, {"name": "A"}]}
+    second = {"videoId": "b", "title": "cafe  DEL mar", "artists": [{"name": "a"}, {"name": "b"}]}
+    assert track_keys(first) == ["a"]
+    assert track_keys(first, by_title=True)[1] == track_keys(second, by_title=True)[1]
+
+def test_dedupe_playlist_keeps_first_occurrence():
+    """Test repeated videos are removed in one chunked pass, keeping the first of each"""
+    tracks = make_tracks("a", "b", "a", "c", "b", "a")
+    ytmusic = fake_ytmusic(tracks)
+
+    result = asyncio.run(dedupe_playlist(ytmusic, "user", "PL1", chunk_size=2))
+    assert result == {"added": 0, "removed": 3, "duplicates": 3, "requests": 2}
+    assert [track["videoId"] for track in tracks] == ["a", "b", "c"]
+
+def test_merge_playlists_adds_only_missing_tracks():
+    """Test merging fetches every source and appends each missing track once"""
+    playlists = {
+        "target": make_tracks("a", "b"),
+        "source1": make_tracks("b", "c", "d"),
+        "source2": make_tracks("d", "e", "a"),
+    }
+    ytmusic = fake_ytmusic(playlists["target"])
+    ytmusic.get_playlist.side_effect = lambda playlist_id, limit: {"tracks": list(playlists[playlist_id])}
+
+    result = asyncio.run(merge_playlists(ytmusic, "user", "target", ["source1", "source2"]))
+    assert result == {"added": 3, "removed": 0, "duplicates": 3, "requests": 1}
+    assert [track["videoId"] for track in playlists["target"]] == ["a", "b", "c", "d", "e"]
+    assert ytmusic.get_playlist.call_count == 3
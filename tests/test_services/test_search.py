@@ -0,0 +1,130 @@
+import asyncio
+from unittest.mock import MagicMock
+from app.services.search import (
+    SearchCache, batch_search, best_match, cached_search, federated_search, match_confidence, normalize_query, search_key
+)
+
+def results(n):
+    return [{"videoId": f"v{i}"} for i in range(n)]
+
+def test_normalize_query():
+    """Test queries differing only in case and spacing normalize alike"""
+    assert normalize_query("  Daft   PUNK\tAround ") == "daft punk around"
+    assert normalize_query("ＡＢＣ") == "abc"
+    assert normalize_query("Beyoncé") != normalize_query("Beyonce")
+
+def test_search_key_scopes():
+    """Test library and uploads searches are keyed per user and other searches are shared"""
+    assert search_key("alice", "q", None, None, False) == search_key("bob", "Q ", None, None, False)
+    assert search_key("alice", "q", None, "library", False) != search_key("bob", "q", None, "library", False)
+    assert search_key("alice", "q", None, "uploads", False).user == "alice"
+    assert search_key("alice", "q", "songs", None, False) != search_key("alice", "q", "albums", None, False)
+
+def test_cache_serves_smaller_limits():
+    """Test an entry answers smaller limits, and larger ones only when upstream ran out of results"""
+    cache = SearchCache()
+    full, short = search_key("u", "full", None, None, False), search_key("u", "short", None, None, False)
+    cache.put(full, 40, results(40))
+    cache.put(short, 40, results(12))
+    assert cache.get(full, 20) == results(20)
+    assert cache.get(full, 40) == results(40)
+    assert cache.get(full, 50) is None
+    assert cache.get(short, 100) == results(12)
+
+    # A smaller fetch does not replace a fresh larger one
+    cache.put(full, 10, results(10))
+    assert cache.get(full, 40) == results(40)
+
+def test_cache_expiry_and_eviction():
+    """Test entries expire after the TTL and the least recently used entry is evicted"""
+    key = lambda q: search_key("u", q, None, None, False)
+    cache = SearchCache(ttl=0)
+    cache.put(key("a"), 20, results(1))
+    assert cache.get(key("a"), 20) is None
+
+    cache = SearchCache(size=2)
+    cache.put(key("a"), 20, results(1))
+    cache.put(key("b"), 20, results(1))
+    cache.get(key("a"), 20)
+    cache.put(key("c"), 20, results(1))
+    assert cache.get(key("a"), 20) is not None
+    assert cache.get(key("b"), 20) is None
+
+def test_cached_search():
+    """Test repeated searches in other spellings are answered without upstream"""
+    ytmusic = MagicMock()
+    ytmusic.search.return_value = results(30)
+
+    async def run():
+        first = await cached_search(ytmusic, "alice", "Daft Punk", "songs", limit=30)
+        second = await cached_search(ytmusic, "bob", "daft  punk", "songs", limit=10)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == (results(30), False)
+    assert second == (results(10), True)
+    ytmusic.search.assert_called_once_with(
+        query="Daft Punk", filter="songs", scope=None, limit=30, ignore_spelling=False
+    )
+
+def test_federated_search_dedupes_across_filters():
+    """Test items found by several filters are only kept under the first"""
+    by_filter = {
+        "songs": [{"videoId": "v1"}, {"videoId": "v2"}],
+        "albums": [{"browseId": "b1"}, {"title": "No id"}],
+        "playlists": [{"videoId": "v2"}, {"browseId": "b1"}, {"browseId": "b2"}, {"title": "No id"}],
+    }
+    ytmusic = MagicMock()
+    ytmusic.search.side_effect = lambda query, filter, **kwargs: by_filter[filter]
+
+    async def run():
+        await cached_search(ytmusic, "alice", "query", "albums")
+        return await federated_search(ytmusic, "alice", "query", ["songs", "albums", "playlists", "songs"])
+
+    grouped, cached = asyncio.run(run())
+    assert grouped == {
+        "songs": [{"videoId": "v1"}, {"videoId": "v2"}],
+        "albums": [{"browseId": "b1"}, {"title": "No id"}],
+        "playlists": [{"browseId": "b2"}, {"title": "No id"}],
+    }
+    assert cached == {"songs": False, "albums": True, "playlists": False}
+    assert ytmusic.search.call_count == 3
+
+def song(video_id, title, *artists):
+    return {"videoId": video_id, "title": title, "artists": [{"name": name} for name in artists]}
+
+def test_match_confidence():
+    """Test artist - title queries match in either order and rank the right song first"""
+    right = song("v1", "Get Lucky", "Daft Punk", "Pharrell Williams")
+    wrong = song("v2", "Lucky", "Britney Spears")
+    assert match_confidence("Daft Punk - Get Lucky", right) > 0.8
+    assert match_confidence("Get Lucky - Daft Punk", right) == match_confidence("Daft Punk - Get Lucky", right)
+    assert match_confidence("daft punk get lucky", right) > match_confidence("daft punk get lucky", wrong)
+    assert best_match("Daft Punk - Get Lucky", [wrong, right, {"browseId": "b1"}]) == (
+        right, match_confidence("Daft Punk - Get Lucky", right)
+    )
+    assert best_match("anything", [{"browseId": "b1"}]) == (None, 0.0)
+
+def test_batch_search():
+    """Test batch queries are resolved once each, reusing the cache and isolating failures"""
+    ytmusic = MagicMock()
+
+    def search(query, **kwargs):
+        if query == "broken":
+            raise Exception("Upstream error")
+        return [song("v1", "Get Lucky", "Daft Punk")]
+
+    ytmusic.search.side_effect = search
+
+    async def run():
+        await cached_search(ytmusic, "alice", "Daft Punk - Get Lucky", "songs", limit=20)
+        return await batch_search(ytmusic, "alice", ["Daft Punk - Get Lucky", "broken", "Get Lucky", "get  LUCKY"])
+
+    batch = asyncio.run(run())
+    assert batch["matched"] == 3
+    first, broken, third, fourth = batch["results"]
+    assert first["cached"] and first["match"]["videoId"] == "v1" and first["confidence"] > 0.8
+    assert broken == {"query": "broken", "match": None, "confidence": 0.0, "cached": False, "error": "Upstream error"}
+    assert not third["cached"] and third["match"]["videoId"] == "v1"
+    assert fourth["query"] == "get  LUCKY" and fourth["match"] == third["match"]
+    assert ytmusic.search.call_count == 3
@@ -0,0 +1,71 @@
+from app.services.suggestions import PrefixIndex, SuggestionIndex
+
+def test_prefix_index_ranks_matches():
+    """Test a prefix matches only texts starting with it, highest weight first"""
+    index = PrefixIndex(size=100)
+    index.add("Daft Punk", 3)
+    index.add("daft punk get lucky", 5)
+    index.add("Dafne", 1)
+    index.add("Adele", 10)
+    index.add("DAFT PUNK", 1)  # Same normalized text, so the first entry ranks higher
+    assert [s.text for s in index.match("daft", 10)] == ["daft punk get lucky", "Daft Punk"]
+    assert [s.text for s in index.match("daf", 2)] == ["daft punk get lucky", "Daft Punk"]
+    assert index.match("zz", 10) == []
+    assert len(index) == 4
+
+def test_prefix_index_prunes_lowest_weights():
+    """Test the index keeps its highest ranked suggestions when it is full"""
+    index = PrefixIndex(size=10)
+    for n in range(11):
+        index.add(f"song {n:02}", n)
+    assert len(index) == 9
+    assert "song 00" not in index and "song 10" in index
+
+def test_short_prefixes_match_like_a_full_scan():
+    """Test the precomputed results of one and two character prefixes match a scan of the range"""
+    index = PrefixIndex(size=50, top_k=3)
+    for n in range(80):
+        index.add(f"{'abc'[n % 3]}{'xy'[n % 2]} song {n}", (n * 7) % 13)
+        index.add(f"{'abc'[n % 5 % 3]}x song {n // 2}", 1)  # Re-adding grows the weight of known texts
+    assert len(index) <= 50
+    for prefix in ["", "a", "b", "c", "ax", "by", "cx", "z"]:
+        scan = sorted(
+            (index._entries[key] for key in index._keys if key.startswith(prefix)),
+            key=lambda entry: (-entry.weight, entry.text)
+        )
+        assert index.match(prefix, 3) == scan[:3]
+        assert index.match(prefix, 2) == scan[:2]
+        assert index.match(prefix, 10) == scan[:10]
+
+def test_lookup_after_upstream_answer():
+    """Test a prefix answered upstream is answered locally, in upstream's order"""
+    index = SuggestionIndex(limit=3)
+    assert index.lookup("alice", "beat") is None
+    index.learn("alice", "beat", ["beatles", "beat it", "beach boys"])
+    assert [s.text for s in index.lookup("bob", "Beat ")] == ["beatles", "beat it"]
+    # An unseen prefix without a full page of suggestions still goes upstream
+    assert index.lookup("bob", "beatl") is None
+
+def test_history_suggestions_stay_personal():
+    """Test suggestions from a user's history are only suggested to that user"""
+    index = SuggestionIndex(limit=5)
+    index.learn("alice", "my", [
+        {"text": "my secret song", "fromHistory": True, "feedbackToken": "token"},
+        {"text": "my way", "fromHistory": False},
+    ])
+    alice = index.lookup("alice", "my")
+    assert [s.text for s in alice] == ["my secret song", "my way"]
+    assert alice[0].to_dict("my")["runs"] == [{"text": "my"}, {"text": " secret song", "bold": True}]
+    assert [s.text for s in index.lookup("bob", "my")] == ["my way"]
+
+    index.forget_user("alice")
+    assert [s.text for s in index.lookup("alice", "my")] == ["my way"]
+
+def test_popular_searches_become_shared():
+    """Test a searched query is suggested to everyone once enough users searched it"""
+    index = SuggestionIndex(limit=1, popular_users=2)
+    index.record_search("alice", "Obscure Band")
+    assert [s.text for s in index.lookup("alice", "obsc")] == ["Obscure Band"]
+    assert index.lookup("bob", "obsc") is None
+    index.record_search("bob", "obscure band")
+    assert [s.text.casefold() for s in index.lookup("carol", "obsc")] == ["obscure band"]
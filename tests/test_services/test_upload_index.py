@@ -0,0 +1,78 @@
+import asyncio
+from datetime import timedelta
+from unittest.mock import MagicMock
+from app.db import session as db_session
+from app.db.crud import utcnow
+from app.db.models import UploadedFile
+from app.services.upload_index import UploadIndex, title_key
+
+def song(entity_id, title, artist="Artist"):
+    return {"entityId": entity_id, "title": title, "artists": [{"name": artist}]}
+
+async def entries(user):
+    async with db_session.AsyncSessionLocal() as db:
+        rows = await db.run_sync(lambda s: s.query(UploadedFile).filter_by(user_key=user).all())
+    return {row.digest: row.entity_id for row in rows}
+
+def test_title_key():
+    """Test file names are reduced to the title their upload is listed under"""
+    assert title_key("01 - Song Title.mp3") == "song title"
+    assert title_key("07. Café.flac") == "cafe"
+    assert title_key("Artist - Song.ogg") == "artist song"
+    assert title_key("1999.mp3") == "1999"
+
+def test_rebuild_links_and_drops_entries():
+    """Test entries are linked to listed songs by title, and dropped when their song is gone"""
+    index = UploadIndex(link_grace=3600)
+    ytmusic = MagicMock()
+
+    async def run():
+        await index.record("alice", "a", "01 First.mp3", 10)
+        await index.record("alice", "b", "Artist - Second.mp3", 10)
+        await index.record("alice", "c", "Pending.mp3", 10)
+        await index.record("alice", "d", "Lost.mp3", 10)
+        async with db_session.AsyncSessionLocal() as db:
+            (await db.get(UploadedFile, ("alice", "d"))).uploaded_at = utcnow() - timedelta(hours=2)
+            await db.commit()
+        ytmusic.get_library_upload_songs.return_value = [song("e1", "First"), song("e2", "Second")]
+        first = await index.rebuild(ytmusic, "alice")
+        after_first = await entries("alice")
+
+        # The first song is deleted upstream
+        ytmusic.get_library_upload_songs.return_value = [song("e2", "Second")]
+        second = await index.rebuild(ytmusic, "alice")
+        return first, after_first, second, await entries("alice")
+
+    first, after_first, second, after_second = asyncio.run(run())
+    assert first == {"entries": 3, "linked": 2, "dropped": 1}
+    assert after_first == {"a": "e1", "b": "e2", "c": None}
+    assert second == {"entries": 2, "linked": 0, "dropped": 1}
+    assert after_second == {"b": "e2", "c": None}
+
+def test_lookup_rebuilds_stale_index():
+    """Test fresh entries are answered without upstream, and stale ones are checked first"""
+    index = UploadIndex(max_age=60)
+    ytmusic = MagicMock()
+    ytmusic.get_library_upload_songs.return_value = []
+
+    async def run():
+        await index.record("alice", "a", "Song.mp3", 10)
+        fresh = await index.lookup(ytmusic, "alice", "a")
+        other_user = await index.lookup(ytmusic, "bob", "a")
+        calls = ytmusic.get_library_upload_songs.call_count
+        await index.forget("alice", ["unknown"])
+        async with db_session.AsyncSessionLocal() as db:
+            entry = await db.get(UploadedFile, ("alice", "a"))
+            entry.entity_id = "e1"
+            entry.verified_at = utcnow() - timedelta(minutes=5)
+            await db.commit()
+        stale = await index.lookup(ytmusic, "alice", "a")
+        return fresh, other_user, calls, stale
+
+    fresh, other_user, calls, stale = asyncio.run(run())
+    assert fresh["filename"] == "Song.mp3"
+    assert other_user is None
+    assert calls == 0
+    # The song is no longer listed, so the file may be uploaded again
+    assert stale is None
+    ytmusic.get_library_upload_songs.assert_called_once_with(None)
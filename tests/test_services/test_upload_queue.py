@@ -0,0 +1,144 @@
+import asyncio
+import os
+from unittest.mock import patch
+from app.schemas.models import CredentialsModel
+from app.services.upload_queue import UploadQueue
+from app.services.uploads import SpooledUpload, file_digest
+
+def make_credentials(name):
+    return CredentialsModel(
+        token=f"{name}_token",
+        refresh_token=f"{name}_refresh_token",
+        token_uri="https://oauth2.googleapis.com/token",
+        client_id="test_client_id",
+        client_secret="test_client_secret",
+        scopes=[],
+        account_id=f"{name}_account"
+    )
+
+def spool(tmp_path, name):
+    (tmp_path / "spool").mkdir(exist_ok=True)
+    path = tmp_path / "spool" / name
+    data = b"fLaC" + name.encode()
+    path.write_bytes(data)
+    return SpooledUpload(str(path), name, len(data), file_digest(str(path)))
+
+def test_claims_respect_per_user_limit(tmp_path):
+    """Test a user's second upload waits while their first runs, without holding up other users"""
+    queue = UploadQueue(per_user=1)
+    alice, bob = make_credentials("alice"), make_credentials("bob")
+
+    async def run():
+        first = await queue.enqueue(alice, spool(tmp_path, "a1.flac"))
+        second = await queue.enqueue(alice, spool(tmp_path, "a2.flac"))
+        await queue.enqueue(bob, spool(tmp_path, "b1.flac"))
+        claims = [await queue.claim(), await queue.claim(), await queue.claim()]
+        return first, second, claims
+
+    first, second, claims = asyncio.run(run())
+    assert first["position"] == 0 and second["position"] == 1
+    assert [claim[0].filename if claim else None for claim in claims] == ["a1.flac", "b1.flac", None]
+
+def test_drain_uploads_and_records_results(tmp_path):
+    """Test queued files are uploaded with the owner's credentials, removed, and their results kept"""
+    queue = UploadQueue()
+    alice = make_credentials("alice")
+    uploaded = []
+
+    def upload(self, path):
+        uploaded.append((self.credentials.token, os.path.basename(path)))
+        return not path.endswith("bad.flac")
+
+    async def run():
+        good = await queue.enqueue(alice, spool(tmp_path, "good.flac"))
+        bad = await queue.enqueue(alice, spool(tmp_path, "bad.flac"))
+        processed = await queue.drain()
+        return processed, await queue.get(alice, good["id"]), await queue.get(alice, bad["id"])
+
+    with patch("app.services.ytmusic.YTMusicService.upload_song", upload):
+        processed, good, bad = asyncio.run(run())
+    assert processed == 2
+    assert uploaded == [("alice_token", "good.flac"), ("alice_token", "bad.flac")]
+    assert good["status"] == "completed" and good["finished_at"] is not None
+    assert bad["status"] == "failed" and bad["error"] == "Failed to upload song"
+    assert list((tmp_path / "spool").iterdir()) == []
+
+def test_jobs_wait_for_credentials_after_restart(tmp_path):
+    """Test requeued jobs only run once their owner's credentials are known again"""
+    queue = UploadQueue()
+    alice = make_credentials("alice")
+
+    async def run():
+        job = await queue.enqueue(alice, spool(tmp_path, "song.flac"))
+        await queue.claim()
+        with patch("app.db.leases.JOB_STALE_AFTER", -1):  # The worker that claimed it has stopped
+            requeued = await queue.recover()
+        queue.clear()  # A restarted process knows no credentials
+        before = await queue.claim()
+        await queue.get(alice, job["id"])
+        after = await queue.claim()
+        return requeued, before, after
+
+    requeued, before, after = asyncio.run(run())
+    assert requeued == 1
+    assert before is None
+    assert after is not None and after[0].filename == "song.flac"
+
+def test_duplicate_files_are_not_queued(tmp_path):
+    """Test a file already uploaded finishes as a duplicate without reaching a worker"""
+    queue = UploadQueue()
+    alice = make_credentials("alice")
+
+    async def run():
+        first = await queue.enqueue(alice, spool(tmp_path, "song.flac"))
+        await queue.drain()
+        second = await queue.enqueue(alice, spool(tmp_path, "song.flac"))
+        return first, second, await queue.drain()
+
+    with patch("app.services.ytmusic.YTMusicService.upload_song", return_value=True) as mock_upload:
+        first, second, processed = asyncio.run(run())
+    mock_upload.assert_called_once()
+    assert second["status"] == "duplicate" and second["finished_at"] is not None
+    assert processed == 0
+    assert list((tmp_path / "spool").iterdir()) == []
+
+def test_recover_leaves_jobs_of_live_workers(tmp_path):
+    """Test only jobs whose worker stopped sending heartbeats are requeued"""
+    from app.db.leases import job_leases
+    queue = UploadQueue()
+    alice = make_credentials("alice")
+
+    async def run():
+        job = await queue.enqueue(alice, spool(tmp_path, "song.flac"))
+        await queue.claim()
+        live = await queue.recover()
+        await job_leases.beat()
+        with patch("app.db.leases.JOB_STALE_AFTER", -1):
+            stale = await queue.recover()
+        return live, stale, await queue.get(alice, job["id"])
+
+    live, stale, job = asyncio.run(run())
+    assert live == 0
+    assert stale == 1 and job["status"] == "queued"
+
+def test_worker_marks_broken_jobs_failed(tmp_path):
+    """Test a job whose processing raises is failed instead of killing its worker"""
+    queue = UploadQueue(workers=1, poll_interval=0.01)
+    alice = make_credentials("alice")
+
+    async def run():
+        queue.start()
+        job = await queue.enqueue(alice, spool(tmp_path, "song.flac"))
+        for _ in range(100):
+            status = await queue.get(alice, job["id"])
+            if status["status"] == "failed":
+                break
+            await asyncio.sleep(0.01)
+        alive = not queue._tasks[0].done()
+        await queue.stop()
+        return status, alive
+
+    with patch.object(UploadQueue, "process", side_effect=RuntimeError("database is locked")):
+        status, alive = asyncio.run(run())
+    assert status["status"] == "failed" and status["error"] == "database is locked"
+    assert alive
@@ -0,0 +1,11 @@
+from app.services.uploads import sniff_audio
+
+def test_sniff_audio():
+    """Test file contents are matched against the type their extension claims"""
+    assert sniff_audio(b"ID3\x04" + b"\0" * 12, "mp3")
+    assert sniff_audio(b"\xff\xfb\x90\x00" + b"\0" * 12, "mp3")
+    assert sniff_audio(b"\0\0\0\x20ftypM4A " + b"\0" * 4, "m4a")
+    assert sniff_audio(b"fLaC" + b"\0" * 12, "flac")
+    assert sniff_audio(b"OggS" + b"\0" * 12, "ogg")
+    assert not sniff_audio(b"fLaC" + b"\0" * 12, "mp3")
+    assert not sniff_audio(b"<html>" + b"\0" * 10, "ogg")
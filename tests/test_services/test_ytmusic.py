@@ -1,6 +1,6 @@
 from unittest.mock import patch
 import pytest
-from app.services.ytmusic import YTMusicService
+from app.services.ytmusic import YTMusicService, UpstreamCancelled
 from app.schemas.models import CredentialsModel
 
 @pytest.fixture
@@ -244,3 +244,23 @@ def test_get_library_channels(ytmusic_service) -> None:
         channels = ytmusic_service.get_library_channels()
         assert isinstance(channels, list)
         assert channels == mock_channels 
+
+def test_cancelled_client_sends_nothing(ytmusic_service) -> None:
+    """Test a cancelled service raises instead of calling upstream"""
+    ytmusic_service.cancel_event.set()
+    with patch("requests.Session.post") as post:
+        with pytest.raises(UpstreamCancelled):
+            ytmusic_service.client._send_request("browse", {})
+    post.assert_not_called()
+
+def test_cancelled_response_discarded_before_parsing(ytmusic_service) -> None:
+    """Test a response arriving after cancellation is dropped"""
+    def cancel_during_request(*args, **kwargs):
+        ytmusic_service.cancel_event.set()
+        return {"contents": {}}
+
+    with patch("ytmusicapi.YTMusic._send_request", side_effect=cancel_during_request):
+        service = ytmusic_service
+        service.client = service._create_client()
+        with pytest.raises(UpstreamCancelled):
+            service.client._send_request("browse", {})